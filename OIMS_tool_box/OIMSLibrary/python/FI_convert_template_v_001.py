@@ -91,29 +91,12 @@ The processed and cleaned data for all sheets is written to a JSON file as the f
 #*! <%GTREE 1 initialization%>
 #*! <%GTREE 1.1 import libraries%>
 import pandas as pd
+import contextlib
 import sys
-import json
 import argparse
 import os
 
-#*! <%GTREE 1.2 Check command line arguments for settings file path%>
-#
-parser = argparse.ArgumentParser(description='Script to process Excel data.')
-parser.add_argument('--main_file_path', required=True, help='Path to the main file')
-parser.add_argument('--settings_file_path', help='Path to the settings file')
-parser.add_argument('--path_to_output_file', help='Path to the output file in json format ')
-
-args = parser.parse_args()
-
-main_file_path = args.main_file_path
-settings_file_path = args.settings_file_path
-
-if not args.path_to_output_file:
-    path_to_output_file = os.path.splitext(main_file_path)[0] + ".output.json"
-else:
-    path_to_output_file = args.path_to_output_file
-
-
+import OIMS_json_io
 
 #*! <%GTREE 2 define functions%>
 def excel_column_to_index(column):
@@ -148,168 +131,206 @@ def dataframe_to_dict_without_nans(df):
     ]
 
 
-#*! <%GTREE 3 get settings%>
-# Try reading the settings sheet from the main workbook
-try:
-    settings_df = pd.read_excel(main_file_path, sheet_name="settings")
-except Exception as e:
-    # If it fails, check if an external settings file is provided
-    if settings_file_path:
-        try:
-            settings_df = pd.read_excel(settings_file_path, sheet_name="settings")
-        except Exception as e:
-            print(f"Error reading the settings sheet from the external file: {e}")
-            sys.exit()
-    else:
-        print("The main workbook doesn't contain a 'settings' sheet, and no external settings file was provided.")
-        sys.exit()
-
-#*! <%GTREE 4 read the metadata from the template%>
-# Read other sheets based on the settings
-all_data = {}
-for _, row in settings_df.iterrows():
-    sheet = row['sheet_name']
-    skip_col = str(row['skip_col'])
-    skip_row = str(row['skip_row'])
-    data_format = row['format']
-    header_row = row['header_row']
-
-    data_range = get_range(row['data'], row['format'])
+#*! <%GTREE 2.4 read the filled in template%>
+def read_template(main_file_path, settings_file_path=None):
+    """Read the sheets of the filled in EXCEL template as described by its settings sheet.
 
-    # Read the entire sheet
-    # Read the sheet using the specified header row
+    Returns a dictionary of sheet name -> DataFrame. Raises ValueError if no settings sheet can be read.
+    """
+    #*! <%GTREE 3 get settings%>
+    # Try reading the settings sheet from the main workbook
     try:
-        if not pd.isna(header_row):
-            full_df = pd.read_excel(main_file_path, sheet_name=sheet, header=int(header_row)-1)
-        else:
-            full_df = pd.read_excel(main_file_path, sheet_name=sheet, header=None)
-        print(f"full_df.shape of sheet {sheet}:")
-        print(full_df.shape)
+        settings_df = pd.read_excel(main_file_path, sheet_name="settings")
     except Exception as e:
-        print(f"Error reading sheet {sheet}: {e}")
-        continue
-
-    if full_df.shape[0] == 0:
-       print(f"Sheet {sheet} is empty. Skipping...")
-       continue
-
-    # Drop ignored rows
-    if not pd.isna(skip_row):
-        ignore_rows = [int(float(x)) - 1 for x in skip_row.split(',') if x.strip().lower() != "nan"]  # Assuming 1-indexed rows
-        full_df = full_df.drop(ignore_rows).reset_index(drop=True)
-
-    # Drop ignored columns
-    if not pd.isna(skip_col):
-        ignore_cols = [excel_column_to_index(x.strip()) for x in skip_col.split(',') if x.strip().lower() != "nan"]
-        for idx, col in enumerate(ignore_cols):
-            if col >= len(full_df.columns):
-                print(f"Skipping invalid column index: {col} from input: {skip_col.split(',')[idx]}")
-                ignore_cols[idx] = -1  # set to an invalid value
-        col_names_to_drop = [full_df.columns[i] for i in ignore_cols if i != -1]  # filter out the invalid value
-        full_df = full_df.drop(columns=col_names_to_drop)
-
-    # Filter out invalid column indices:
-    data_range = [idx for idx in data_range if idx < full_df.shape[1]]
-
-    if not data_range:
-        print(f"No valid column indices for sheet {sheet}. Skipping...")
-        continue
-
-    if data_format == 'vars_in_cols':
-        valid_columns = full_df.columns.dropna().tolist()
-        data_df = full_df[valid_columns]
-
-    elif data_format == 'vars_in_rows':
-        print("Shape of full_df:", full_df.shape)
-        print("Head of full_df:", full_df.head())
-        valid_rows_mask = ~full_df[full_df.columns[1]].isna()
-        print("valid_rows_mask: ", valid_rows_mask)
-        print("Shape of valid_rows_mask:", valid_rows_mask.shape)
-        print("Head of valid_rows_mask:", valid_rows_mask.head())
-        data_df = full_df[valid_rows_mask]
-
-    all_data[sheet] = data_df
-
-#*! <%GTREE 5 write log%>
-
-# Define the log file path
-log_file_path = "summary.log"
-
-# Open the log file for writing
-with open(log_file_path, 'w') as log_file:
-
-    # Redirect standard output to log file
-    original_stdout = sys.stdout  # Store the original standard output
-    sys.stdout = log_file
-
-    # Now print the summaries (these will go to the log file instead of terminal)
-    for sheet_name, df in all_data.items():
-        print(f"Sheet: {sheet_name}")
-        print('- . ' * 10, '\n')  # Separator line for better readability
-        print(f"Shape: {df.shape[0]} rows, {df.shape[1]} columns")
-        print(f"Columns: {', '.join(map(str, df.columns))}")
-
-        print('- . ' * 10)  # Separator line for better readability
-        # Display basic statistics for numerical columns
-        print("Basic Statistics:")
-        print(df.describe())
+        # If it fails, check if an external settings file is provided
+        if settings_file_path:
+            try:
+                settings_df = pd.read_excel(settings_file_path, sheet_name="settings")
+            except Exception as e:
+                raise ValueError(f"Error reading the settings sheet from the external file: {e}")
+        else:
+            raise ValueError("The main workbook doesn't contain a 'settings' sheet, and no external settings file was provided.")
+
+    #*! <%GTREE 4 read the metadata from the template%>
+    # Read other sheets based on the settings
+    all_data = {}
+    for _, row in settings_df.iterrows():
+        sheet = row['sheet_name']
+        skip_col = str(row['skip_col'])
+        skip_row = str(row['skip_row'])
+        data_format = row['format']
+        header_row = row['header_row']
+
+        data_range = get_range(row['data'], row['format'])
+
+        # Read the entire sheet
+        # Read the sheet using the specified header row
+        try:
+            if not pd.isna(header_row):
+                full_df = pd.read_excel(main_file_path, sheet_name=sheet, header=int(header_row)-1)
+            else:
+                full_df = pd.read_excel(main_file_path, sheet_name=sheet, header=None)
+            print(f"full_df.shape of sheet {sheet}:")
+            print(full_df.shape)
+        except Exception as e:
+            print(f"Error reading sheet {sheet}: {e}")
+            continue
+
+        if full_df.shape[0] == 0:
+           print(f"Sheet {sheet} is empty. Skipping...")
+           continue
+
+        # Drop ignored rows
+        if not pd.isna(skip_row):
+            ignore_rows = [int(float(x)) - 1 for x in skip_row.split(',') if x.strip().lower() != "nan"]  # Assuming 1-indexed rows
+            full_df = full_df.drop(ignore_rows).reset_index(drop=True)
+
+        # Drop ignored columns
+        if not pd.isna(skip_col):
+            ignore_cols = [excel_column_to_index(x.strip()) for x in skip_col.split(',') if x.strip().lower() != "nan"]
+            for idx, col in enumerate(ignore_cols):
+                if col >= len(full_df.columns):
+                    print(f"Skipping invalid column index: {col} from input: {skip_col.split(',')[idx]}")
+                    ignore_cols[idx] = -1  # set to an invalid value
+            col_names_to_drop = [full_df.columns[i] for i in ignore_cols if i != -1]  # filter out the invalid value
+            full_df = full_df.drop(columns=col_names_to_drop)
+
+        # Filter out invalid column indices:
+        data_range = [idx for idx in data_range if idx < full_df.shape[1]]
+
+        if not data_range:
+            print(f"No valid column indices for sheet {sheet}. Skipping...")
+            continue
+
+        if data_format == 'vars_in_cols':
+            valid_columns = full_df.columns.dropna().tolist()
+            data_df = full_df[valid_columns]
+
+        elif data_format == 'vars_in_rows':
+            print("Shape of full_df:", full_df.shape)
+            print("Head of full_df:", full_df.head())
+            valid_rows_mask = ~full_df[full_df.columns[1]].isna()
+            print("valid_rows_mask: ", valid_rows_mask)
+            print("Shape of valid_rows_mask:", valid_rows_mask.shape)
+            print("Head of valid_rows_mask:", valid_rows_mask.head())
+            data_df = full_df[valid_rows_mask]
+
+        all_data[sheet] = data_df
+
+    return all_data
+
+#*! <%GTREE 2.5 write a summary log of the sheets that were read%>
+def write_summary_log(all_data, log_file_path="summary.log"):
+    #*! <%GTREE 5 write log%>
+
+    # Open the log file for writing and redirect standard output to it; the redirection is undone
+    # when the block ends, also when writing fails
+    with open(log_file_path, 'w') as log_file, contextlib.redirect_stdout(log_file):
+
+        # Now print the summaries (these will go to the log file instead of terminal)
+        for sheet_name, df in all_data.items():
+            print(f"Sheet: {sheet_name}")
+            print('- . ' * 10, '\n')  # Separator line for better readability
+            print(f"Shape: {df.shape[0]} rows, {df.shape[1]} columns")
+            print(f"Columns: {', '.join(map(str, df.columns))}")
+
+            print('- . ' * 10)  # Separator line for better readability
+            # Display basic statistics for numerical columns
+            print("Basic Statistics:")
+            print(df.describe())
+
+            print('- . ' * 10)  # Separator line for better readability
+            # Display first few rows
+            print("First 5 rows:")
+            print(df.head())
+
+            print('-' * 80, '\n')  # Separator line for better readability
+
+#*! <%GTREE 2.6 transform the sheets to records (vars_in_cols) or key -> values (vars_in_rows)%>
+def transform_template_data(all_data):
+    #*! <%GTREE 6 Transform data for sheets where data_format == 'vars_in_rows' %>
+
+    for sheet, df in all_data.items():
+        print(f"Checking sheet: {sheet}")
+
+        if isinstance(df, pd.DataFrame):
+            print(f"Sheet {sheet} is a DataFrame.")
+
+            if 0 in df.columns:
+                print(f"Sheet {sheet} has a column named '0'.")
+
+                transformed_data = {}
+                for _, row in df.iterrows():
+                    key = row[0]
+                    values = row.iloc[1:].dropna().tolist()
+                    transformed_data[key] = values
+
+                print(f"Transformed data for sheet {sheet}:")  # Debug statement
+                print(transformed_data)  # Debug statement
+
+                all_data[sheet] = transformed_data
+            else:
+                print(f"Sheet {sheet} does not have a column named '0'. Column names are: {df.columns}")
+        else:
+            print(f"Sheet {sheet} is not a DataFrame.")
 
-        print('- . ' * 10)  # Separator line for better readability
-        # Display first few rows
-        print("First 5 rows:")
-        print(df.head())
 
-        print('-' * 80, '\n')  # Separator line for better readability
+    #*! <%GTREE 7 remove the instances with no 'nans'' %>
 
-    # Restore standard output back to terminal
-    sys.stdout = original_stdout
+    for key, value in all_data.items():
+        if isinstance(value, pd.DataFrame):
+            all_data[key] = dataframe_to_dict_without_nans(value)
 
-#*! <%GTREE 6 Transform data for sheets where data_format == 'vars_in_rows' %>
+    return all_data
 
-for sheet, df in all_data.items():
-    print(f"Checking sheet: {sheet}")
+#*! <%GTREE 2.7 convert the template to a json file%>
+def convert_template(main_file_path, settings_file_path=None, path_to_output_file=None, log_file_path="summary.log", compact=False):
+    """Convert the filled in EXCEL template to a JSON file and return the path of the output file.
 
-    if isinstance(df, pd.DataFrame):
-        print(f"Sheet {sheet} is a DataFrame.")
+    With compact set the JSON file is written without indentation and whitespace.
+    """
+    if not path_to_output_file:
+        path_to_output_file = os.path.splitext(main_file_path)[0] + ".output.json"
 
-        if 0 in df.columns:
-            print(f"Sheet {sheet} has a column named '0'.")
+    all_data = read_template(main_file_path, settings_file_path)
+    write_summary_log(all_data, log_file_path)
+    all_data = transform_template_data(all_data)
 
-            transformed_data = {}
-            for _, row in df.iterrows():
-                key = row[0]
-                values = row.iloc[1:].dropna().tolist()
-                transformed_data[key] = values
+    #*! <%GTREE 8 write json output file%>
+    # Convert all DataFrame objects inside the dictionary to records
 
-            print(f"Transformed data for sheet {sheet}:")  # Debug statement
-            print(transformed_data)  # Debug statement
-
-            all_data[sheet] = transformed_data
-        else:
-            print(f"Sheet {sheet} does not have a column named '0'. Column names are: {df.columns}")
-    else:
-        print(f"Sheet {sheet} is not a DataFrame.")
+    print("All Data before writing to JSON:")
 
+    for sheet, data in all_data.items():
+        if isinstance(data, list):  # If data is a list
+            print(f"{sheet} (data is a list):", data[:2])  # Print the first two items
+        elif isinstance(data, dict):  # If data is a dictionary
+            first_two_keys = list(data.keys())[:2]
+            print(f"{sheet} (data is a dictionary):", {key: data[key] for key in first_two_keys})  # Print the data for the first two keys
 
-#*! <%GTREE 7 remove the instances with no 'nans'' %>
 
-for key, value in all_data.items():
-    if isinstance(value, pd.DataFrame):
-        all_data[key] = dataframe_to_dict_without_nans(value)
+    OIMS_json_io.dump_json_file(all_data, path_to_output_file, compact=compact)
+    return path_to_output_file
 
-#*! <%GTREE 8 write json output file%>
-# Convert all DataFrame objects inside the dictionary to records
+#*! <%GTREE 9 main definition%>
+def main():
+    #*! <%GTREE 9.1 Check command line arguments for settings file path%>
+    parser = argparse.ArgumentParser(description='Script to process Excel data.')
+    parser.add_argument('--main_file_path', required=True, help='Path to the main file')
+    parser.add_argument('--settings_file_path', help='Path to the settings file')
+    parser.add_argument('--path_to_output_file', help='Path to the output file in json format ')
+    parser.add_argument('--compact_output', action='store_true', help='Write the JSON file without indentation and whitespace')
 
-print("All Data before writing to JSON:")
+    args = parser.parse_args()
 
-for sheet, data in all_data.items():
-    if isinstance(data, list):  # If data is a list
-        print(f"{sheet} (data is a list):", data[:2])  # Print the first two items
-    elif isinstance(data, dict):  # If data is a dictionary
-        first_two_keys = list(data.keys())[:2]
-        print(f"{sheet} (data is a dictionary):", {key: data[key] for key in first_two_keys})  # Print the data for the first two keys
+    #*! <%GTREE 9.2 convert the template%>
+    try:
+        convert_template(args.main_file_path, args.settings_file_path, args.path_to_output_file, compact=args.compact_output)
+    except ValueError as e:
+        print(e)
+        sys.exit()
 
+if __name__ == "__main__":
+    main()
 
-with open(path_to_output_file, 'w') as outfile:
-    json.dump(all_data, outfile, indent=4)
 #*============================   End Of File   ================================
\ No newline at end of file
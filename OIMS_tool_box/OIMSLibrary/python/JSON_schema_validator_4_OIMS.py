@@ -2,7 +2,7 @@
 #=============================================================================
 # File      : JSON_schema_validator_4_OIMS.py
 # Author    : Gideon Kruseman <g.kruseman@cgiar.org>
-__version__ = "1.1.0"
+__version__ = "1.1.1"
 # Date      : 10/23/2023 9:27:16 AM
 # Changed   : 12/05/2023 3:27:27 PM
 # Changed by: Gideon Kruseman <g.kruseman@cgiar.org>
@@ -18,10 +18,12 @@ __version__ = "1.1.0"
 #*! <%GTREE 1.1 import libraries%>
 #*! <%GTREE 1.1.1 basics  library%>
 import os
+import sys
 import urllib.parse
 
 #*! <%GTREE 1.1.2 json schema library%>
 import jsonschema
+from OIMS_validator_registry import validator_registry
 
 #*! <%GTREE 1.1.3 command line parser linrary%>
 import argparse
@@ -29,16 +31,12 @@ import argparse
 #*! <%GTREE 1.1.4 read external sources library%>
 import json
 import io
-import requests
+from OIMS_schema_cache import schema_cache
+import OIMS_json_io
 
 
-#*! <%GTREE 1.1.5 libraries to enhance reporting%>
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
+#*! <%GTREE 1.1.5 libraries to enhance reporting: reportlab is only imported when a PDF report is written%>
+from OIMS_report_backends import write_report, report_formats, default_report_format
 
 #*! <%GTREE 1.1.6 enhanced error handling%>
 import logging
@@ -50,7 +48,7 @@ json_schema_url = 'C:\json_schema_2020_12\schema'
 #*! <%GTREE 1.3 standard text for reporting purposes%>
 report_contents_boiler_text = "report on issues with json schema under development or review"
 report_contents_title = "JSON_Schema_validation_report.pdf"
-report_file_name = "JSON_Schema_validation_report.pdf"
+report_file_name = "JSON_Schema_validation_report"
 
 #*! <%GTREE 2 function definitions%>
 #*! <%GTREE 2.1 function to load local json files%>
@@ -58,42 +56,27 @@ report_file_name = "JSON_Schema_validation_report.pdf"
 def load_json_file(file_path):
     """Load and return the JSON data from a file, handling potential errors."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file), None
+        return OIMS_json_io.load_json_file(file_path), None
     except FileNotFoundError as e:
         logging.error(f"File not found: {file_path}. Please check the file path.")
         return None, str(e)
     except json.JSONDecodeError as e:
         return None, f"Error parsing JSON file {file_path}: {e}"
 
-#*! <%GTREE 2.2 function to load json files from GitHub%>
+#*! <%GTREE 2.2 function to load json files from GitHub through the schema cache%>
 def load_json_url(url):
-    try:
-        response = requests.get(url, timeout=10)  # Set a reasonable timeout
-        if response.status_code == 200:
-            return response.json(), None
-        else:
-            logging.error(f"Failed to retrieve data from {url}. Status code: {response.status_code}")
-            return None, f"Failed to retrieve data from {url}. Status code: {response.status_code}"
-    except requests.exceptions.HTTPError as e:
-        logging.error(f"HTTP Error occurred while retrieving data from {url}: {e}")
-        return None, str(e)
-    except requests.exceptions.ConnectionError as e:
-        logging.error(f"Connection Error occurred while retrieving data from {url}: {e}")
-        return None, str(e)
-    except requests.exceptions.Timeout as e:
-        logging.error(f"Timeout occurred while retrieving data from {url}: {e}")
-        return None, str(e)
-    except requests.exceptions.RequestException as e:
-        logging.error(f"General Request Exception occurred while retrieving data from {url}: {e}")
-        return None, str(e)
+    """Load JSON from a URL through the on-disk schema cache, returning the data and an error message."""
+    data, err = schema_cache.get(url)
+    if err:
+        logging.error(err)
+    return data, err
 
 
 #*! <%GTREE 2.3 function to validate a json file against a json schema%>
 def validate_against_schema(data, schema, schema_name):
     """Validate data against a provided schema, returning status and message."""
     try:
-        jsonschema.validate(data, schema)
+        validator_registry.validate(data, schema)
         return True, "JSON data is valid against the {}.".format(schema_name)
     except jsonschema.exceptions.ValidationError as e:
         logging.error("Validation error occurred", exc_info=True)
@@ -108,35 +91,107 @@ def validate_against_schema(data, schema, schema_name):
     except jsonschema.exceptions.SchemaError as e:
         return False, "Error in the schema itself: {}".format(e)
 
-
-#*! <%GTREE 2.4 function to va;lidate parts %>
-def validate_schema_part(data, schema_part, path=''):
-    """Validate a part of the schema."""
-    try:
-        jsonschema.validate(data, schema_part)
-        logging.info(f"Schema part at '{path}' is valid.")
-        return True, None
-    except jsonschema.exceptions.ValidationError as e:
-        logging.error(f"Validation error in schema part at '{path}': {e}")
-        return False, str(e)
-
-#*! <%GTREE 2.5 function to va;lidate parts %>
+#*! <%GTREE 2.3.1 function to collect all validation errors in a single pass%>
+def collect_validation_errors(data, schema, max_errors_per_path=10):
+    """Validate data once and return every violation, capped per JSON path.
+
+    Returns a list of violations (dictionaries with message, json_path, schema_path and validator)
+    and a dictionary mapping JSON paths to the number of further errors that were not kept.
+    Raises jsonschema.exceptions.SchemaError if the schema itself is invalid.
+    """
+    validator = validator_registry.get_validator(schema)
+    violations = []
+    kept_per_path = {}
+    suppressed = {}
+    for error in validator.iter_errors(data):
+        json_path = error.json_path
+        if kept_per_path.get(json_path, 0) >= max_errors_per_path:
+            suppressed[json_path] = suppressed.get(json_path, 0) + 1
+            continue
+        kept_per_path[json_path] = kept_per_path.get(json_path, 0) + 1
+        violations.append({
+            'message': error.message,
+            'json_path': json_path,
+            'error_path': list(error.path),
+            'schema_path': "/".join(str(part) for part in error.schema_path),
+            'validator': error.validator,
+        })
+    return violations, suppressed
+
+#*! <%GTREE 2.3.2 function to turn collected violations into report messages%>
+def format_validation_errors(violations, suppressed, schema_name):
+    """Return one report message per violation plus one per JSON path with suppressed errors."""
+    messages = [f"JSON data is not valid against the {schema_name} at {violation['json_path']}: {violation['message']} "
+                f"(schema path: {violation['schema_path']})" for violation in violations]
+    messages.extend(f"{count} further errors at {json_path} not shown." for json_path, count in suppressed.items())
+    return messages
+
+#*! <%GTREE 2.4 function to list the schema parts %>
+def schema_part_paths(schema, path=''):
+    """Return the paths of all properties in the schema, recursing into object properties."""
+    paths = []
+    if isinstance(schema, dict) and 'properties' in schema:
+        for key, value in schema['properties'].items():
+            new_path = f"{path}/{key}" if path else key
+            paths.append(new_path)
+            if isinstance(value, dict) and value.get('type') == 'object':
+                paths.extend(schema_part_paths(value, path=new_path))
+    return paths
+
+#*! <%GTREE 2.5 function to attribute the errors of one validation pass to the schema parts %>
+def attribute_errors_to_parts(violations, schema):
+    """Return a per-part breakdown of the violations collected in one validation pass.
+
+    Every violation is attributed to each schema part whose path is a prefix of the violation's
+    instance path, so no subtree is validated more than once. Returns a dictionary mapping each
+    part path to its list of violations (empty when the part is valid), in traversal order, and
+    the violations that do not fall under any part, such as errors at the document root.
+    """
+    breakdown = {part_path: [] for part_path in schema_part_paths(schema)}
+    unattributed = []
+
+    for violation in violations:
+        attributed = False
+        prefix = ''
+        for part in violation['error_path']:
+            prefix = f"{prefix}/{part}" if prefix else str(part)
+            if prefix in breakdown:
+                breakdown[prefix].append(violation)
+                attributed = True
+        if not attributed:
+            unattributed.append(violation)
+
+    for part_path, part_violations in breakdown.items():
+        if part_violations:
+            logging.error(f"Validation error in schema part at '{part_path}': {part_violations[0]['message']}")
+        else:
+            logging.info(f"Schema part at '{part_path}' is valid.")
+    return breakdown, unattributed
+
+def count_errors_per_part(breakdown, suppressed):
+    """Return {part path: number of errors} including the errors that were not kept by the cap per JSON path.
+
+    All errors at one JSON path fall under the same parts, so the suppressed count of a JSON path is
+    added to every part that has a kept violation at that path.
+    """
+    counts = {}
+    for part_path, part_violations in breakdown.items():
+        json_paths = {violation['json_path'] for violation in part_violations}
+        counts[part_path] = len(part_violations) + sum(suppressed.get(json_path, 0) for json_path in json_paths)
+    return counts
+
+#*! <%GTREE 2.5.1 function returning the first failing schema part %>
 def traverse_and_validate(data, schema, path=''):
-    """Recursively traverse and validate each part of the schema."""
-    if isinstance(schema, dict):
-        if 'properties' in schema:
-            for key, value in schema['properties'].items():
-                new_path = f"{path}/{key}" if path else key
-                part_valid, error = validate_schema_part(data.get(key, {}), value, path=new_path)
-                if not part_valid:
-                    return False, error
-                # If the property is an object, recurse into it
-                if value.get('type') == 'object':
-                    deeper_valid, deeper_error = traverse_and_validate(data.get(key, {}), value, path=new_path)
-                    if not deeper_valid:
-                        return False, deeper_error
-        return True, None
-    return False, "Invalid schema structure"
+    """Return (True, None) if all schema parts at or below path are valid, else False and the error of the first failing part."""
+    if not isinstance(schema, dict):
+        return False, "Invalid schema structure"
+    violations, _ = collect_validation_errors(data, schema)
+    breakdown, _ = attribute_errors_to_parts(violations, schema)
+    for part_path, part_violations in breakdown.items():
+        # compare whole path segments, so path 'a/b' does not select the part 'a/bc'
+        if part_violations and (not path or part_path == path or part_path.startswith(path + '/')):
+            return False, part_violations[0]['message']
+    return True, None
 
 #*! <%GTREE 2.6 function to check locations%>
 def check_location_type(location):
@@ -152,44 +207,6 @@ def check_location_type(location):
 
     return "Unknown"
 
-#*! <%GTREE 2.7 function to generate a pdf report with provided messages%>
-def generate_pdf_report(messages, report_contents_title, boiler_text, filename):
-    """Generate a PDF report with the provided messages."""
-    doc = SimpleDocTemplate(filename, pagesize=letter)
-    story = []
-
-    # Add the report title
-    styles = getSampleStyleSheet()
-    story.append(Paragraph(report_contents_title, styles['Title']))
-
-    # Add a spacer
-    story.append(Spacer(1, 0.2*inch))
-
-    # Boilerplate text
-    boiler_paragraph = Paragraph(boiler_text, styles['Normal'])
-    story.append(boiler_paragraph)
-
-    # Add a spacer
-    story.append(Spacer(1, 0.2*inch))
-
-    # Add messages
-    for message in messages:
-        message_paragraph = Paragraph(message, styles['Normal'])
-        story.append(message_paragraph)
-        story.append(Spacer(1, 0.1*inch))
-
-    # Add a spacer
-    story.append(Spacer(1, 0.2*inch))
-
-    # Add messages
-    for message in messages:
-        message_paragraph = Paragraph(message, styles['Normal'])
-        story.append(message_paragraph)
-        story.append(Spacer(1, 0.1*inch))
-
-    # Build the PDF
-    doc.build(story)
-
 #*! <%GTREE 3 main definition%>
 def main():
 #*! <%GTREE 3.1 Check command line arguments for settings file path%>
@@ -201,6 +218,24 @@ def main():
     parser.add_argument('--debug_logging_mode',
                         default='w',
                         help='logging mode for debugging: w= write; a=append')
+    parser.add_argument('--validator_cache_dir',
+                        help='Optional directory to record schemas that passed the meta-schema check, so later runs skip that check.')
+    parser.add_argument('--schema_cache_dir',
+                        help='Directory of the on-disk schema cache (default is ~/.OIMS_cache/schemas).')
+    parser.add_argument('--schema_cache_ttl',
+                        type=int,
+                        help='Seconds before a cached schema is revalidated (default is one day).')
+    parser.add_argument('--offline',
+                        action='store_true',
+                        help='Only use cached schemas, never access the network.')
+    parser.add_argument('--max_errors_per_path',
+                        type=int,
+                        default=10,
+                        help='Maximum number of errors reported for a single JSON path (default is 10).')
+    parser.add_argument('--report_format',
+                        choices=report_formats,
+                        default=default_report_format,
+                        help='Format of the report: pdf, text, json, junit or none (default is pdf).')
 
     args = parser.parse_args()
 
@@ -217,6 +252,14 @@ def main():
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
 
+    #*! <%GTREE 3.2.1 configure the compiled validator registry%>
+    validator_registry.checked_schema_dir = args.validator_cache_dir
+
+    #*! <%GTREE 3.2.2 configure the schema cache%>
+    if args.schema_cache_dir: schema_cache.cache_dir = args.schema_cache_dir
+    if args.schema_cache_ttl is not None: schema_cache.ttl = args.schema_cache_ttl
+    schema_cache.offline = args.offline
+
     #*! <%GTREE 3.3 create container list for errors%>
     errors = []
 
@@ -234,26 +277,30 @@ def main():
         if err: errors.append(err)
 
 
-#*! <%GTREE 3.4 validate schema against base json schemas%>
+#*! <%GTREE 3.4 validate schema against base json schemas, collecting all errors in one pass%>
+    violations = []
     if not errors:
-        valid, msg = validate_against_schema(schema_to_validate, json_schema, "JSON Schema version draft/2020-12")
-        if not valid: errors.append(msg)
-
-
-#*! <%GTREE 3.5 validate schema step by step%>
-    if errors:
-        valid, msg = traverse_and_validate(schema_to_validate, json_schema)
-        if not valid:
-            errors.append(msg)
+        try:
+            violations, suppressed = collect_validation_errors(schema_to_validate, json_schema, args.max_errors_per_path)
+            errors.extend(format_validation_errors(violations, suppressed, "JSON Schema version draft/2020-12"))
+        except jsonschema.exceptions.SchemaError as e:
+            errors.append("Error in the schema itself: {}".format(e))
+
+#*! <%GTREE 3.5 per-part breakdown of the errors, attributed from the single validation pass%>
+    if errors and violations:
+        breakdown, _ = attribute_errors_to_parts(violations, json_schema)
+        error_counts = count_errors_per_part(breakdown, suppressed)
+        errors.extend(f"Schema part '{part_path}' is not valid: {error_counts[part_path]} errors."
+                      for part_path, part_violations in breakdown.items() if part_violations)
 
 #*! <%GTREE 3.6 error handling%>
+    logging.info(f"Validator registry: {validator_registry.stats()}")
     if errors:
         print("\n".join(errors))
-        generate_pdf_report(errors, report_contents_title, report_contents_boiler_text,  report_file_name)
     else:
-        success_message = "All validations passed successfully."
         print("All validations passed successfully.")
-        generate_pdf_report([success_message], report_contents_title, report_contents_boiler_text, report_file_name)
+    write_report(errors, args.report_format, report_file_name, report_contents_title, report_contents_boiler_text)
+    sys.exit(1 if errors else 0)
 
 #*! <%GTREE 4 run tests%>
 if __name__ == "__main__":
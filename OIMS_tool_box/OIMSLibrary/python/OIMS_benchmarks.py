@@ -0,0 +1,282 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_benchmarks.py
+__version__ = "1.0.0"
+# Remarks   :
+"""
+*! <%GTREE 0 documentation of the benchmarks%>
+*! <%GTREE 0.1 Introduction%>
+Benchmarks of the OIMS tools. The start-up benchmark runs the tools in fresh interpreters, so start-up
+costs are measured the way a user or a CI job pays them; throughput benchmarks run in this process.
+Every benchmark reports the median of the repeats.
+
+*! <%GTREE 0.2 benchmarks%>
+startup  : import time of the validation tools and of the optional heavy dependencies, and the wall
+           time of one small validation with --report_format none compared to pdf.
+           python OIMS_benchmarks.py startup --repeats 10
+json_io  : load and dump times of every installed JSON codec (OIMS_json_io.py) on
+           BasicSchemas/OIMS_base.json and on synthetic OIMS files of about 1 and 10 MB, dumped
+           both pretty-printed and compact.
+           python OIMS_benchmarks.py json_io
+schema_compaction : size, schema check time and validation time of the schemas generated from
+           BasicSchemas/OIMS_base.json and from a synthetic content object with shared vocabularies,
+           and of the schemas shipped in BasicSchemas/, as written and after compact_schema()
+           (OIMS_schema_compaction.py). Sizes are bytes written with indent 2. The schema check is
+           the metaschema check jsonschema.validate() runs before every validation; validation is
+           of OIMS_base.json with the validator compiled as OIMS_validator_registry.py does.
+           python OIMS_benchmarks.py schema_compaction
+vocabulary : validation of 5000 records against controlled vocabularies of 100, 1000 and 10000
+           codes with jsonschema and with the frozenset enum check of OIMS_validator_registry.py.
+           python OIMS_benchmarks.py vocabulary
+schema_inference : schema inference of json_schema_builder_base.py on a synthetic OIMS file of 100000
+           records with every sampling strategy, and on a document nested 10000 levels deep.
+           python OIMS_benchmarks.py schema_inference
+
+*! <%GTREE 0.3  command line parameters%>
+repeats        :  number of runs per measurement [optional, default is 5]
+output         :  JSON file to record the results in [optional]
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import OIMS_json_io
+
+#*! <%GTREE 1.2 defaults%>
+tool_dir = os.path.dirname(os.path.abspath(__file__))
+default_repeats = 5
+startup_modules = [
+    'JSON_schema_validator_4_OIMS',
+    'OIMS_schema_consistency_test_simple',
+    'OIMS_schema_consistency_test',
+]
+optional_dependencies = ['reportlab.platypus', 'requests']
+basic_schemas_dir = os.path.join(tool_dir, '..', '..', '..', 'BasicSchemas')
+oims_base_path = os.path.join(basic_schemas_dir, 'OIMS_base.json')
+synthetic_record_counts = {'synthetic_1MB.json': 1150, 'synthetic_10MB.json': 11500}
+
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.1 function to time a command in fresh interpreters%>
+def time_command(command, repeats, cwd=tool_dir):
+    """Return the median wall time in seconds of running command repeats times."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def time_import(module, repeats):
+    return time_command([sys.executable, '-c', f'import {module}'], repeats)
+
+#*! <%GTREE 2.1.1 function to time a call in this process%>
+def time_call(function, repeats):
+    """Return the median wall time in seconds of calling function repeats times."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+#*! <%GTREE 2.2 start-up benchmark%>
+def benchmark_startup(repeats=default_repeats):
+    """Measure import times and the wall time of a small validation per report format."""
+    results = {'interpreter': time_command([sys.executable, '-c', 'pass'], repeats)}
+    for module in startup_modules + optional_dependencies:
+        results[f'import {module}'] = time_import(module, repeats)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        schema_path = os.path.join(work_dir, 'schema.json')
+        metadata_path = os.path.join(work_dir, 'metadata.json')
+        with open(schema_path, 'w', encoding='utf-8') as schema_file:
+            json.dump({"type": "object", "required": ["OIMS"]}, schema_file)
+        with open(metadata_path, 'w', encoding='utf-8') as metadata_file:
+            json.dump({"OIMS": {"OIMS_header": {}, "OIMS_content": {}}}, metadata_file)
+        for report_format in ('none', 'pdf'):
+            command = [sys.executable, os.path.join(tool_dir, 'OIMS_schema_consistency_test_simple.py'),
+                       '--metadata_file_to_test_path', metadata_path,
+                       '--OIMS_structure_schema_path', schema_path,
+                       '--schema_path', schema_path, '--schema_name', 'benchmark schema',
+                       '--report_format', report_format]
+            results[f'validate one file, report_format {report_format}'] = time_command(command, repeats, cwd=work_dir)
+    return results
+
+#*! <%GTREE 2.3 JSON codec benchmark%>
+def synthetic_oims_document(record_count):
+    """Return an OIMS document with record_count variable records, about 900 bytes each when indented."""
+    records = [{
+        "variable_name": f"var_{number}",
+        "variable_label": f"Label of variable {number} with some descriptive text, kg/ha",
+        "data_type": "float" if number % 3 else "string",
+        "minimum": number * 0.25,
+        "maximum": number * 1.5 + 0.125,
+        "missing_values": [-99, -98],
+        "keywords": ["yield", "maize", "household survey"],
+        "is_key": number % 1000 == 0,
+        "notes": None,
+    } for number in range(record_count)]
+    return {"OIMS": {
+        "OIMS_header": {"metadata_version": "v_0.1", "OIMS_content_objects": [{"OIMS_content_object": "variables"}]},
+        "OIMS_content": [{"OIMS_content_object": "variables",
+                          "OIMS_content_object_properties": [{"metadata": records}]}],
+    }}
+
+def benchmark_json_io(repeats=default_repeats):
+    """Measure load and dump times per JSON codec on the OIMS base schema and on synthetic files."""
+    codec_names = ['stdlib'] + (['orjson'] if OIMS_json_io.orjson is not None else [])
+    results = {}
+    default_codec = OIMS_json_io.codec
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_paths = [os.path.normpath(oims_base_path)]
+        for file_name, record_count in synthetic_record_counts.items():
+            file_paths.append(os.path.join(work_dir, file_name))
+            OIMS_json_io.dump_json_file(synthetic_oims_document(record_count), file_paths[-1])
+        try:
+            for file_path in file_paths:
+                label = f"{os.path.basename(file_path)} ({os.path.getsize(file_path) / 1e6:.1f} MB)"
+                data = OIMS_json_io.load_json_file(file_path)
+                dump_path = os.path.join(work_dir, 'dump.json')
+                for codec_name in codec_names:
+                    OIMS_json_io.codec = OIMS_json_io.get_codec(codec_name)
+                    results[f'load {label}, {codec_name}'] = time_call(lambda: OIMS_json_io.load_json_file(file_path), repeats)
+                    results[f'dump {label}, {codec_name}'] = time_call(lambda: OIMS_json_io.dump_json_file(data, dump_path), repeats)
+                    results[f'dump compact {label}, {codec_name}'] = time_call(
+                        lambda: OIMS_json_io.dump_json_file(data, dump_path, compact=True), repeats)
+        finally:
+            OIMS_json_io.codec = default_codec
+    return results
+
+#*! <%GTREE 2.4 schema compaction benchmark%>
+def synthetic_metametadata_item(attribute_count=200, vocabulary_count=10, vocabulary_size=30):
+    """Return an OIMS_content item whose attributes share a few controlled vocabularies and value elements."""
+    vocabularies = [[{"vocabulary_element_name": f"term_{vocabulary}_{element}"} for element in range(vocabulary_size)]
+                    for vocabulary in range(vocabulary_count)]
+    metadata = []
+    for number in range(attribute_count):
+        attribute = {"attribute_name": f"attribute_{number}", "attribute_description": f"attribute {number}",
+                     "data_type": "string"}
+        if number % 2:
+            attribute["controlled_vocabulary"] = vocabularies[number % vocabulary_count]
+        elif number % 4 == 0:
+            attribute.update(data_type="compound_object", data_type_class="compound",
+                             attribute_value_elements=["name", "identifier", "identifier_scheme", "url"])
+        metadata.append(attribute)
+    return {"OIMS_content_object": "synthetic", "OIMS_content_object_properties": [{"metadata": metadata}]}
+
+def benchmark_schema_compaction(repeats=default_repeats):
+    """Compare size, compile time and validation time of schemas as written and after compaction."""
+    import jsonschema
+    from json_schema_builder import build_content_object_schema, index_content_objects
+    from OIMS_schema_compaction import compact_schema, inline_shared_subschemas
+
+    data = OIMS_json_io.load_json_file(oims_base_path)
+    schemas = {}
+    for name, item in index_content_objects(data).items():
+        try:
+            schemas[f'generated {name}'] = build_content_object_schema(item)
+        except ValueError:
+            continue  # the content object cannot be built by json_schema_builder
+    schemas['generated synthetic, 200 attributes, 10 vocabularies'] = build_content_object_schema(synthetic_metametadata_item())
+    for file_name in sorted(os.listdir(basic_schemas_dir)):
+        if file_name.endswith('.schema.json'):
+            schemas[f'shipped {file_name}'] = OIMS_json_io.load_json_file(os.path.join(basic_schemas_dir, file_name))
+
+    results = {}
+    for label, schema in schemas.items():
+        for variant, variant_schema in (('as written', schema), ('compacted', compact_schema(schema))):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)  # shipped schemas name an unknown $schema
+                validator_class = jsonschema.validators.validator_for(variant_schema, jsonschema.Draft202012Validator)
+            results[f'size {label}, {variant}'] = len(OIMS_json_io.dumps(variant_schema, indent=2))
+            metaschema_validator = validator_class(validator_class.META_SCHEMA)
+            results[f'check schema {label}, {variant}'] = time_call(
+                lambda: list(metaschema_validator.iter_errors(variant_schema)), repeats)
+            validator = validator_class(inline_shared_subschemas(variant_schema))  # as OIMS_validator_registry compiles it
+            results[f'errors {label}, {variant}'] = sum(1 for _ in validator.iter_errors(data))
+            results[f'validate {label}, {variant}'] = time_call(lambda: list(validator.iter_errors(data)), repeats)
+    return results
+
+#*! <%GTREE 2.5 controlled vocabulary benchmark%>
+def benchmark_vocabulary(repeats=default_repeats, record_count=5000):
+    """Compare the linear enum check of jsonschema with the frozenset check of the registry validators."""
+    import jsonschema
+    from OIMS_validator_registry import ValidatorRegistry
+
+    results = {}
+    for vocabulary_size in (100, 1000, 10000):
+        codes = [f"code_{number}" for number in range(vocabulary_size)]
+        schema = {"type": "array", "items": {"type": "object", "properties": {"code": {"type": "string", "enum": codes}}}}
+        data = [{"code": codes[(number * 7919) % vocabulary_size]} for number in range(record_count)]
+        for label, validator in (('jsonschema', jsonschema.Draft202012Validator(schema)),
+                                 ('registry', ValidatorRegistry().get_validator(schema))):
+            results[f'{vocabulary_size} codes, {label}'] = time_call(lambda: list(validator.iter_errors(data)), repeats)
+    return results
+
+#*! <%GTREE 2.6 schema inference benchmark%>
+def benchmark_schema_inference(repeats=default_repeats, record_count=100000, depth=10000):
+    """Time schema inference per sampling strategy on a wide document and on a deep one."""
+    from json_schema_builder_base import generate_json_schema, sampling_strategies
+
+    wide = synthetic_oims_document(record_count)
+    deep = {"value": 0}
+    for level in range(depth):
+        deep = {"level": level, "child": [deep]}
+    results = {}
+    for sampling in sampling_strategies:
+        results[f'{record_count} records, {sampling}'] = time_call(lambda: generate_json_schema(wide, sampling, seed=0), repeats)
+    results[f'nested {depth} levels'] = time_call(lambda: generate_json_schema({"root": deep}), repeats)
+    return results
+
+benchmarks = {
+    'startup': benchmark_startup,
+    'json_io': benchmark_json_io,
+    'schema_compaction': benchmark_schema_compaction,
+    'vocabulary': benchmark_vocabulary,
+    'schema_inference': benchmark_schema_inference,
+}
+
+#*! <%GTREE 2.7 function to print results%>
+def print_results(name, results):
+    """Print the results; floats are median wall times in seconds, integers are counts or sizes."""
+    print(f"{name} (median wall time):")
+    for label, value in results.items():
+        if isinstance(value, int):
+            print(f"  {label:<60} {value:8d}")
+        else:
+            print(f"  {label:<60} {value * 1000:8.1f} ms")
+
+
+#*! <%GTREE 3 main definition%>
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the OIMS tools.')
+    parser.add_argument('benchmark', choices=sorted(benchmarks), help='Benchmark to run.')
+    parser.add_argument('--repeats', type=int, default=default_repeats, help='Number of runs per measurement.')
+    parser.add_argument('--output', help='JSON file to record the results in.')
+    args = parser.parse_args()
+
+    results = benchmarks[args.benchmark](args.repeats)
+    print_results(args.benchmark, results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({args.benchmark: results}, output_file, indent=4)
+
+if __name__ == "__main__":
+    main()
+
+#*============================   End Of File   ================================
@@ -0,0 +1,138 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_document_cache.py
+__version__ = "1.1.1"
+# Remarks   : the cache holds at most max_entries documents, least recently used are evicted;
+#             preload() parses sequentially or in a bounded process pool
+"""
+*! <%GTREE 0 documentation of the parsed document cache%>
+*! <%GTREE 0.1 Introduction%>
+Parse-once cache of local JSON documents.
+
+The consistency checks first validate the OIMS structure of a file and then extract versions and
+content objects from the same file. With the cache every check reads the parsed document from
+memory, so each file is parsed once. Entries are keyed by the absolute path and invalidated when
+the modification time or size of the file changes. preload() parses several files up front, one
+after the other or, with max_workers > 1, in a process pool of at most max_workers processes
+(threads would not help: parsing holds the GIL).
+
+The cache holds at most max_entries documents; the least recently used document is evicted first,
+so a long-running process such as OIMS_validation_service.py does not keep every file it has seen.
+
+The cached documents are shared: callers must not modify them.
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import OIMS_json_io
+
+#*! <%GTREE 1.2 defaults%>
+default_max_entries = 32
+
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.1 signature of a file%>
+def _signature(file_path):
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+#*! <%GTREE 3 class definitions%>
+#*! <%GTREE 3.1 document cache%>
+class DocumentCache:
+    """Least recently used cache of parsed JSON documents keyed by path and invalidated on modification."""
+
+    def __init__(self, max_entries=default_max_entries):
+        self.max_entries = max_entries
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    #*! <%GTREE 3.1.1 cached documents%>
+    def _cached(self, key, signature):
+        with self._lock:
+            cached = self._documents.get(key)
+            if cached is not None and cached[0] == signature:
+                self._documents.move_to_end(key)
+                return cached
+        return None
+
+    def _store(self, key, signature, data):
+        with self._lock:
+            self._documents[key] = (signature, data)
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_entries:
+                self._documents.popitem(last=False)
+
+    #*! <%GTREE 3.1.2 load a document%>
+    def load(self, file_path):
+        """Return the parsed JSON document at file_path, parsing it only if it changed since the last load.
+
+        Raises the same exceptions as open() and OIMS_json_io.load_json_file().
+        """
+        key = os.path.abspath(file_path)
+        signature = _signature(key)
+        cached = self._cached(key, signature)
+        if cached is not None:
+            return cached[1]
+        data = OIMS_json_io.load_json_file(key)
+        self._store(key, signature, data)
+        return data
+
+    #*! <%GTREE 3.1.3 load several documents%>
+    def preload(self, file_paths, max_workers=1):
+        """Parse the documents that changed and return a dictionary of path -> error message for failures.
+
+        With max_workers > 1 the documents are parsed in a pool of at most max_workers processes.
+        """
+        errors = {}
+        file_paths = list(dict.fromkeys(file_paths))
+        if max_workers <= 1 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                try:
+                    self.load(file_path)
+                except (OSError, ValueError) as e:
+                    errors[file_path] = str(e)
+            return errors
+
+        pending = []
+        for file_path in file_paths:
+            key = os.path.abspath(file_path)
+            try:
+                signature = _signature(key)
+            except OSError as e:
+                errors[file_path] = str(e)
+                continue
+            if self._cached(key, signature) is None:
+                pending.append((file_path, key, signature))
+        if not pending:
+            return errors
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = [(file_path, key, signature, executor.submit(OIMS_json_io.load_json_file, key))
+                       for file_path, key, signature in pending]
+            for file_path, key, signature, future in futures:
+                try:
+                    self._store(key, signature, future.result())
+                except (OSError, ValueError) as e:
+                    errors[file_path] = str(e)
+        return errors
+
+    def clear(self):
+        """Forget all parsed documents."""
+        with self._lock:
+            self._documents.clear()
+
+
+#*! <%GTREE 4 module level cache shared by the tools%>
+document_cache = DocumentCache()
+
+#*============================   End Of File   ================================
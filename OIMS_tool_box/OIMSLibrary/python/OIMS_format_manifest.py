@@ -0,0 +1,93 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_format_manifest.py
+__version__ = "1.0.0"
+# Remarks   :
+"""
+*! <%GTREE 0 documentation of the format manifest%>
+*! <%GTREE 0.1 Introduction%>
+Manifest of the files formatted by format_json.py.
+
+For every file that format_json.py left in canonical form the manifest records the size and
+modification time of the file, the SHA-256 hash of its contents and the format options. A later run
+with the same options skips a file whose size and modification time are unchanged without reading
+it, and a file whose contents still have the recorded hash (for example after a checkout touched it)
+without parsing it. A run over an unchanged corpus therefore only stats the files.
+
+*! <%GTREE 0.2 manifest layout%>
+{"files": {<absolute path>: {"signature": [mtime_ns, size], "sha256": <hash>, "options": {...}}}}
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import os
+
+import OIMS_json_io
+from OIMS_schema_cache import _write_atomic
+
+#*! <%GTREE 1.2 defaults%>
+default_manifest_path = os.path.join(os.path.expanduser("~"), ".OIMS_cache", "format_json_manifest.json")
+
+
+#*! <%GTREE 2 function definitions%>
+def file_signature(file_path):
+    """Return [modification time in ns, size] of file_path, or None when it does not exist."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+#*! <%GTREE 3 class definitions%>
+#*! <%GTREE 3.1 format manifest%>
+class FormatManifest:
+    """On-disk record of the files in canonical form; call save() to write the changes."""
+
+    def __init__(self, manifest_path=default_manifest_path):
+        self.manifest_path = manifest_path
+        try:
+            self.files = OIMS_json_io.load_json_file(manifest_path).get('files', {})
+        except (OSError, ValueError, AttributeError):
+            self.files = {}
+        self._changed = False
+
+    #*! <%GTREE 3.1.1 look up a file%>
+    def known_hash(self, file_path, options):
+        """Return the hash recorded for file_path with these options, or None."""
+        entry = self.files.get(os.path.abspath(file_path))
+        if entry is None or entry.get('options') != options:
+            return None
+        return entry.get('sha256')
+
+    def is_unchanged(self, file_path, options):
+        """Return True when file_path was recorded with these options and its size and mtime are the same."""
+        entry = self.files.get(os.path.abspath(file_path))
+        return (entry is not None and entry.get('options') == options
+                and entry.get('signature') == file_signature(file_path))
+
+    #*! <%GTREE 3.1.2 record a file%>
+    def record(self, file_path, options, sha256):
+        """Record that file_path, as it is now on disk, is in canonical form with contents hash sha256."""
+        self.files[os.path.abspath(file_path)] = {
+            'signature': file_signature(file_path),
+            'sha256': sha256,
+            'options': options,
+        }
+        self._changed = True
+
+    def forget(self, file_path):
+        if self.files.pop(os.path.abspath(file_path), None) is not None:
+            self._changed = True
+
+    def save(self):
+        if self._changed:
+            _write_atomic(self.manifest_path, OIMS_json_io.dumps({'files': self.files}).encode('utf-8'))
+            self._changed = False
+
+#*============================   End Of File   ================================
@@ -0,0 +1,127 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_issues.py
+__version__ = "1.1.0"
+# Remarks   : iter_report_messages() formats the report messages one at a time
+"""
+*! <%GTREE 0 documentation of the issue model%>
+*! <%GTREE 0.1 Introduction%>
+Structured, aggregated issues for the OIMS consistency checks.
+
+A check that finds the same problem in every element of an array or in every record of a file
+used to append one string per occurrence. Issues are now aggregated when they are added: an issue
+is identified by its code, severity, path template and message, and every further occurrence only
+increments its count and, for the first few, records the concrete location as an example. Memory,
+report size and report render time therefore grow with the number of distinct problems.
+
+*! <%GTREE 0.2 issue fields%>
+code           :  short identifier of the kind of problem, e.g. data_type_mismatch
+severity       :  'error' or 'warning'
+path_template  :  location with the varying indexes replaced by [*], e.g. metadata[*].keywords[*]
+message        :  description without occurrence specific details
+count          :  number of occurrences
+examples       :  the first occurrences, e.g. metadata[3].keywords[0]
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 defaults%>
+default_max_examples = 5
+
+
+#*! <%GTREE 2 class definitions%>
+#*! <%GTREE 2.1 one distinct issue%>
+class Issue:
+    """A distinct problem with the number of times it occurred and the first example locations."""
+
+    def __init__(self, code, severity, path_template, message):
+        self.code = code
+        self.severity = severity
+        self.path_template = path_template
+        self.message = message
+        self.count = 0
+        self.examples = []
+
+    def report_message(self):
+        """Return the message with the number of occurrences and the examples, if it occurred more than once."""
+        message = self.message
+        if self.path_template:
+            message = f"{message} [{self.path_template}]"
+        if self.count > 1:
+            message = f"{message} ({self.count} occurrences"
+            if self.examples:
+                message = f"{message}, e.g. at {', '.join(str(example) for example in self.examples)}"
+            message = f"{message})"
+        return message
+
+    def to_dict(self):
+        return {
+            'code': self.code,
+            'severity': self.severity,
+            'path_template': self.path_template,
+            'message': self.message,
+            'count': self.count,
+            'examples': list(self.examples),
+        }
+
+#*! <%GTREE 2.2 aggregator of issues%>
+class IssueAggregator:
+    """Collects issues of one severity, merging repeated occurrences of the same issue as they are added.
+
+    The aggregator is falsy when no issue was added, so `if not issues:` keeps working as for a list.
+    """
+
+    def __init__(self, severity='error', max_examples=default_max_examples):
+        self.severity = severity
+        self.max_examples = max_examples
+        self._issues = {}
+
+    #*! <%GTREE 2.2.1 add an occurrence%>
+    def add(self, code, message, path_template=None, example=None):
+        """Record one occurrence of an issue and return the aggregated issue."""
+        key = (code, path_template, message)
+        issue = self._issues.get(key)
+        if issue is None:
+            issue = self._issues[key] = Issue(code, self.severity, path_template, message)
+        issue.count += 1
+        if example is not None and len(issue.examples) < self.max_examples:
+            issue.examples.append(example)
+        return issue
+
+    #*! <%GTREE 2.2.2 read the aggregated issues%>
+    def __len__(self):
+        return len(self._issues)
+
+    def __iter__(self):
+        return iter(self._issues.values())
+
+    @property
+    def occurrences(self):
+        """Total number of occurrences over all distinct issues."""
+        return sum(issue.count for issue in self._issues.values())
+
+    def iter_report_messages(self):
+        """Yield (category, message) pairs for the report backends, in order of first occurrence.
+
+        The category is the severity and the code, so reports group and truncate per kind of problem.
+        The messages are formatted as they are read, so a streaming report backend holds one at a time.
+        """
+        for issue in self._issues.values():
+            yield f"{issue.severity}: {issue.code}", issue.report_message()
+
+    def report_messages(self):
+        """Return the (category, message) pairs of iter_report_messages() as a list."""
+        return list(self.iter_report_messages())
+
+    def messages(self):
+        """Return the report message of every distinct issue, in order of first occurrence."""
+        return [issue.report_message() for issue in self._issues.values()]
+
+    def to_list(self):
+        return [issue.to_dict() for issue in self._issues.values()]
+
+#*============================   End Of File   ================================
@@ -0,0 +1,413 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_json_io.py
+__version__ = "1.2.0"
+# Remarks   : documents nested beyond the recursion limit are written with an iterative encoder;
+#             the standard library codec decodes memory-mapped files without an extra bytes copy;
+#             NaN and Infinity are written by the standard library codec instead of as null;
+#             reindent_stream() and replace_file() moved here from format_json.py
+"""
+*! <%GTREE 0 documentation of the shared JSON input and output%>
+*! <%GTREE 0.1 Introduction%>
+JSON reading and writing shared by the OIMS tools.
+
+All tools read and write JSON through load_json_file(), dump_json_file(), loads() and dumps(). These
+use a codec: orjson when it is installed, which parses and serializes several times faster, and the
+json module of the standard library otherwise. Files are read from a memory map, so a fast codec
+parses the file contents without first copying them into a Python object. The memory map gives no
+memory benefit with the standard library codec: json.loads() parses a str, so the whole file is
+decoded into one, as it would be after reading the file. It is decoded straight from the map, which
+saves only the copy into bytes that json.loads() would otherwise decode from. dump_json_file() writes
+pretty-printed JSON (indent=4, as before) or, with compact=True, JSON without any whitespace.
+
+*! <%GTREE 0.2 choosing the codec%>
+The codec is chosen once, at import. The environment variable OIMS_JSON_CODEC can force one:
+OIMS_JSON_CODEC=stdlib   always use the standard library
+OIMS_JSON_CODEC=orjson   use orjson (fails at import when it is not installed)
+
+The output of the two codecs is the same JSON text, except that orjson writes floats with an exponent
+without the plus sign and leading zero (1e16 instead of 1e+16) and reads integers beyond 64 bits as
+floats. When orjson cannot handle a value (integers beyond 64 bits when writing, keys that are not
+strings, NaN and Infinity in the input or in the data to write), the standard library codec is used
+for that call. orjson would write NaN and Infinity as null, so a document whose orjson output has a
+null is checked for them; documents without null are not walked.
+
+*! <%GTREE 0.3 deeply nested documents%>
+orjson writes at most 255 levels of nesting and the json module of the standard library stops at
+the recursion limit. dumps() and dump_json_file() then fall back to an iterative encoder that writes
+the same text as the standard library at any depth, only slower. Reading is limited by the parsers:
+the standard library reads about as many levels as the recursion limit (1000 by default) and raises
+RecursionError beyond it; recent orjson versions read at most 1024 levels, older ones any depth.
+
+*! <%GTREE 0.4 token streams and file replacement%>
+reindent_stream() copies JSON text from one binary file to another in chunks, checking the grammar
+token by token and writing it with a new indentation, so memory use does not depend on the size of
+the text. With canonical=True strings and numbers are written as dumps() writes them, so the result
+is the same text as dumps() of the parsed document; strings without escapes and non-ASCII characters
+and integers of up to 18 digits, the common tokens, are copied without being decoded. Objects with
+duplicate keys are the exception: parsing keeps only the last value of a key, the stream keeps all.
+replace_file() lets a function write a temporary file that then replaces a file in one rename.
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import json
+import math
+import mmap
+import os
+import re
+import tempfile
+
+#*! <%GTREE 1.1.1 optional fast codec%>
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#*! <%GTREE 1.2 defaults%>
+default_indent = 4
+_non_ascii = re.compile(r'[^\x00-\x7f]')
+default_chunk_size = 1 << 20
+# one token after optional whitespace: 1 punctuation, 2 string, 3 number or literal, 4 anything else
+_json_token = re.compile(
+    rb'[ \t\n\r]*(?:([{}\[\],:])'
+    rb'|("(?:[^"\\\x00-\x1f]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*")'
+    rb'|(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null|NaN|-?Infinity)'
+    rb'|([^ \t\n\r]))')
+# a number or literal ending this close to the end of a chunk may continue in the next one (12. or 1e)
+_token_margin = 64
+# what the stream expects next
+_VALUE, _VALUE_OR_END, _KEY, _KEY_OR_END, _COLON, _COMMA_OR_END, _DONE = range(7)
+
+
+#*! <%GTREE 2 class definitions: codecs%>
+#*! <%GTREE 2.1 standard library codec%>
+class StdlibCodec:
+    """Codec on the json module of the standard library."""
+    name = 'stdlib'
+
+    def loads(self, data):
+        if isinstance(data, (memoryview, mmap.mmap)):
+            # what json.loads() does with bytes, but decoding from the buffer without copying it to bytes first
+            data = str(data, json.detect_encoding(bytes(data[:4])), 'surrogatepass')
+        return json.loads(data)
+
+    def dumps(self, obj, indent=None, sort_keys=False, ensure_ascii=True):
+        """Return the JSON text as bytes; indent=None gives compact output without whitespace."""
+        separators = (',', ': ') if indent is not None else (',', ':')
+        try:
+            text = json.dumps(obj, indent=indent, sort_keys=sort_keys, ensure_ascii=ensure_ascii,
+                              separators=separators)
+        except RecursionError:
+            text = _iterative_dumps(obj, indent, sort_keys, ensure_ascii, separators)
+        return text.encode('utf-8')
+
+#*! <%GTREE 2.1.1 iterative encoder for deeply nested documents%>
+_end = object()
+
+def _float_text(value):
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return 'Infinity' if value > 0 else '-Infinity'
+    return float.__repr__(value)
+
+def _scalar_text(value, encode_string):
+    if isinstance(value, str):
+        return encode_string(value)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return _float_text(value)
+    raise TypeError(f'Object of type {value.__class__.__name__} is not JSON serializable')
+
+def _iterative_dumps(obj, indent, sort_keys, ensure_ascii, separators):
+    """Return the same JSON text as json.dumps(), walking the document with an explicit stack."""
+    item_separator, key_separator = separators
+    encode_string = json.encoder.encode_basestring_ascii if ensure_ascii else json.encoder.encode_basestring
+    parts = []
+    # open containers: [iterator over (key, value), closing bracket, id, no item written yet]
+    frames = []
+    open_ids = set()
+    value = obj
+    while True:
+        if isinstance(value, (dict, list, tuple)):
+            if id(value) in open_ids:
+                raise ValueError("Circular reference detected")
+            is_object = isinstance(value, dict)
+            if not value:
+                parts.append('{}' if is_object else '[]')
+            else:
+                if is_object:
+                    items = iter(sorted(value.items(), key=lambda item: item[0]) if sort_keys else value.items())
+                else:
+                    items = ((None, element) for element in value)
+                parts.append('{' if is_object else '[')
+                frames.append([items, '}' if is_object else ']', id(value), True])
+                open_ids.add(id(value))
+        else:
+            parts.append(_scalar_text(value, encode_string))
+        while frames:
+            frame = frames[-1]
+            item = next(frame[0], _end)
+            if item is _end:
+                frames.pop()
+                open_ids.discard(frame[2])
+                if indent is not None:
+                    parts.append('\n' + ' ' * (indent * len(frames)))
+                parts.append(frame[1])
+                continue
+            key, value = item
+            if not frame[3]:
+                parts.append(item_separator)
+            frame[3] = False
+            if indent is not None:
+                parts.append('\n' + ' ' * (indent * len(frames)))
+            if frame[1] == '}':
+                if not isinstance(key, str):
+                    key = _scalar_text(key, str)
+                parts.append(encode_string(key) + key_separator)
+            break
+        else:
+            return ''.join(parts)
+
+#*! <%GTREE 2.2 orjson codec%>
+def _reindent(text, indent):
+    """Change the two-space indentation of orjson output to indent spaces.
+
+    Raw newlines and control characters cannot occur inside JSON strings, so the spaces after a
+    newline are indentation, and \x01 can mark the indentation levels. Going from the deepest level
+    up, every level is replaced by markers in one bytes.replace(), which is much faster than a
+    regular expression substitution per line.
+    """
+    depth = 0
+    while b'\n' + b'  ' * (depth + 1) in text:
+        depth += 1
+    for level in range(depth, 0, -1):
+        text = text.replace(b'\n' + b'  ' * level, b'\n' + b'\x01' * level)
+    return text.replace(b'\x01', b' ' * indent)
+
+def _has_non_finite_float(obj):
+    """Return whether obj contains a float that is NaN or infinite, walking it with an explicit stack."""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+def _escape_non_ascii(match):
+    code_point = ord(match.group())
+    if code_point > 0xFFFF:
+        code_point -= 0x10000
+        return '\\u%04x\\u%04x' % (0xD800 | (code_point >> 10), 0xDC00 | (code_point & 0x3FF))
+    return '\\u%04x' % code_point
+
+class OrjsonCodec:
+    """Codec on orjson; falls back to the standard library for values orjson does not handle."""
+    name = 'orjson'
+
+    def __init__(self):
+        self._fallback = StdlibCodec()
+
+    def loads(self, data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN, Infinity and some encodings are accepted by the standard library; it also gives its usual messages
+            return self._fallback.loads(data)
+
+    def dumps(self, obj, indent=None, sort_keys=False, ensure_ascii=True):
+        """Return the JSON text as bytes; indent=None gives compact output without whitespace."""
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        if indent is not None:
+            option |= orjson.OPT_INDENT_2
+        try:
+            text = orjson.dumps(obj, option=option)
+        except TypeError:
+            return self._fallback.dumps(obj, indent, sort_keys, ensure_ascii)
+        if b'null' in text and _has_non_finite_float(obj):
+            # orjson writes NaN and Infinity as null; the standard library keeps them
+            return self._fallback.dumps(obj, indent, sort_keys, ensure_ascii)
+        if indent is not None and indent != 2:
+            text = _reindent(text, indent)
+        if ensure_ascii and not text.isascii():
+            text = _non_ascii.sub(_escape_non_ascii, text.decode('utf-8')).encode('ascii')
+        return text
+
+
+#*! <%GTREE 3 function definitions%>
+#*! <%GTREE 3.1 function to choose the codec%>
+def get_codec(name=None):
+    """Return the codec called name, or the fastest installed codec when name is None or 'auto'."""
+    name = name or os.environ.get('OIMS_JSON_CODEC', 'auto')
+    if name == 'stdlib' or (name == 'auto' and orjson is None):
+        return StdlibCodec()
+    if name in ('orjson', 'auto'):
+        if orjson is None:
+            raise ImportError("OIMS_JSON_CODEC=orjson but orjson is not installed")
+        return OrjsonCodec()
+    raise ValueError(f"Unknown JSON codec '{name}', expected auto, stdlib or orjson")
+
+codec = get_codec()
+
+#*! <%GTREE 3.2 functions for JSON text%>
+def loads(data):
+    """Parse JSON from str, bytes or a memory view."""
+    return codec.loads(data)
+
+def dumps(obj, indent=None, sort_keys=False, ensure_ascii=True):
+    """Return JSON text as str; compact unless indent is given."""
+    return codec.dumps(obj, indent, sort_keys, ensure_ascii).decode('utf-8')
+
+#*! <%GTREE 3.3 functions for JSON files%>
+def load_json_file(file_path):
+    """Parse the JSON file at file_path from a memory map.
+
+    Raises FileNotFoundError, json.JSONDecodeError and UnicodeDecodeError like open() and json.load().
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return codec.loads(b'')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if isinstance(codec, OrjsonCodec):
+                with memoryview(mapped) as view:
+                    return codec.loads(view)
+            return codec.loads(mapped)
+
+def dump_json_file(data, file_path, indent=default_indent, compact=False, sort_keys=False, ensure_ascii=True):
+    """Write data as JSON to file_path, pretty-printed with indent spaces or, with compact=True, without whitespace."""
+    text = codec.dumps(data, None if compact else indent, sort_keys, ensure_ascii)
+    with open(file_path, 'wb') as file:
+        file.write(text)
+
+
+#*! <%GTREE 3.4 functions for JSON token streams%>
+def _unexpected(token, offset):
+    return ValueError(f"Unexpected {token[:20].decode('utf-8', 'replace')!r} at byte {offset}")
+
+def _canonical_token(token, group):
+    """Return a string (group 2) or number or literal (group 3) token as dumps() writes its value."""
+    if group == 2:
+        if token.isascii() and b'\\' not in token:
+            return token
+    elif token in (b'true', b'false', b'null') or (len(token) <= 18 and token.lstrip(b'-').isdigit() and token != b'-0'):
+        return token
+    return codec.dumps(codec.loads(token))
+
+def reindent_stream(source, target, indent=default_indent, chunk_size=default_chunk_size, canonical=False):
+    """Copy the JSON text of binary file source to binary file target with indent spaces per level.
+
+    The grammar is checked while copying; ValueError is raised for invalid JSON. The layout is that of
+    dumps(..., indent=indent); strings and numbers are copied as written or, with canonical, written as
+    dumps() writes them, so the text is the same as that of the parsed document.
+    """
+    line_starts = [b'\n']  # newline and indentation per depth
+    stack = []
+    expect = _VALUE
+    buffer = b''
+    position = 0
+    offset = 0  # offset of buffer in the stream
+    eof = False
+    while True:
+        limit = len(buffer) if eof else len(buffer) - _token_margin
+        pieces = []
+        write = pieces.append
+        for match in _json_token.finditer(buffer, position):
+            group = match.lastindex
+            token = match.group(group)
+            if match.end() > limit or (group == 4 and token == b'"' and not eof):
+                # the token may continue in the next chunk
+                break
+            position = match.end()
+            if group == 1 and token == b',':
+                if expect != _COMMA_OR_END:
+                    raise _unexpected(token, offset + match.start(group))
+                write(b',' + line_starts[len(stack)])
+                expect = _KEY if stack[-1] == b'{' else _VALUE
+            elif group == 1 and token == b':':
+                if expect != _COLON:
+                    raise _unexpected(token, offset + match.start(group))
+                write(b': ')
+                expect = _VALUE
+            elif group == 1 and (token == b'}' or token == b']'):
+                if not stack or token != (b'}' if stack[-1] == b'{' else b']') or \
+                        expect not in (_COMMA_OR_END, _KEY_OR_END, _VALUE_OR_END):
+                    raise _unexpected(token, offset + match.start(group))
+                stack.pop()
+                # an empty container is closed on the same line
+                write(token if expect != _COMMA_OR_END else line_starts[len(stack)] + token)
+                expect = _COMMA_OR_END if stack else _DONE
+            elif group == 4:
+                raise _unexpected(token, offset + match.start(group))
+            else:
+                if expect == _KEY_OR_END or expect == _VALUE_OR_END:
+                    write(line_starts[len(stack)])
+                    expect = _KEY if expect == _KEY_OR_END else _VALUE
+                if expect == _KEY:
+                    if group != 2:
+                        raise _unexpected(token, offset + match.start(group))
+                    expect = _COLON
+                elif expect != _VALUE:
+                    raise _unexpected(token, offset + match.start(group))
+                elif group == 1:
+                    stack.append(token)
+                    if len(line_starts) <= len(stack):
+                        line_starts.append(b'\n' + b' ' * (indent * len(stack)))
+                    expect = _KEY_OR_END if token == b'{' else _VALUE_OR_END
+                else:
+                    expect = _COMMA_OR_END if stack else _DONE
+                write(_canonical_token(token, group) if canonical and group != 1 else token)
+        target.write(b''.join(pieces))
+        if eof:
+            if expect != _DONE:
+                raise ValueError("Unexpected end of the JSON text")
+            return
+        chunk = source.read(chunk_size)
+        eof = not chunk
+        offset += position
+        buffer = buffer[position:] + chunk
+        position = 0
+
+#*! <%GTREE 3.5 function to replace a file atomically%>
+def replace_file(json_file_path, write):
+    """Call write(temporary file) and, when it returns True, move the temporary file over json_file_path.
+
+    The permissions of json_file_path are kept. Returns whether the file was replaced.
+    """
+    directory = os.path.dirname(os.path.abspath(json_file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(json_file_path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            replace = write(temp_file)
+            if replace:
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+        if replace:
+            os.chmod(temp_path, os.stat(json_file_path).st_mode & 0o7777)
+            os.replace(temp_path, json_file_path)
+        else:
+            os.remove(temp_path)
+        return replace
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+#*============================   End Of File   ================================
@@ -0,0 +1,353 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_json_stream.py
+__version__ = "1.1.0"
+# Remarks   : records read before the name of their content object are kept until it is known;
+#             values are limited to max_value_size characters and malformed values fail early
+"""
+*! <%GTREE 0 documentation of the streaming JSON reader%>
+*! <%GTREE 0.1 Introduction%>
+Incremental reading of large OIMS files.
+
+json.load() builds the whole document in memory. Structural metadata of large survey datasets can
+hold hundreds of thousands of variable records under
+OIMS_content[*].OIMS_content_object_properties[*].metadata, so memory grows with the file. The
+reader below walks the containers of a document one key or element at a time while reading the file
+in chunks. Values the caller asks for, such as the OIMS header or one metadata record, are decoded
+whole by the json module; values the caller does not need are skipped without being built. The text
+kept in memory is bounded by the chunk size plus the largest value that is decoded. A value longer
+than max_value_size characters raises json.JSONDecodeError, and so does a value with a syntax error
+as soon as the error is read, so malformed input is not buffered up to the end of the file.
+
+*! <%GTREE 0.2 pull reader%>
+JsonStreamReader is a pull reader. iter_object() yields the keys of an object and iter_array() the
+indexes of an array; after each key or index the caller consumes the value with read_value(),
+skip_value(), iter_object() or iter_array() before asking for the next one.
+
+*! <%GTREE 0.3 OIMS events%>
+iter_oims_events(file_path) yields (event, location, value) tuples:
+('header', None, header)                 the complete OIMS_header
+('record', location, record)             one metadata record; location is (content index,
+                                         OIMS_content_object, property index, record number)
+('content_item', content index, item)    an OIMS_content item once it is complete; each metadata
+                                         list is replaced by its number of records, the records
+                                         themselves were yielded one by one
+('end', None, found)                     which of OIMS, OIMS_header and OIMS_content were present
+
+read_oims_header(file_path) reads only up to the OIMS_header, for fast triage of large corpora.
+
+The records carry the name of their content object. When the OIMS_content_object key precedes
+OIMS_content_object_properties in the item, as in the files written by the OIMS tools, each record is
+yielded as soon as it is read. Otherwise the name is not known yet, so the records of that item are
+kept and yielded, with the name, once the item is complete; only for such items does memory grow
+with the number of records.
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import json
+import re
+
+#*! <%GTREE 1.2 defaults and patterns%>
+default_chunk_size = 1 << 20
+default_header_chunk_size = 1 << 16
+default_max_value_size = 1 << 27
+_whitespace = re.compile(r'[ \t\n\r]*')
+_structural = re.compile(r'[{}\[\]"]')
+_scalar_end = re.compile(r'[ \t\n\r,\]}:]')
+_string_rest = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+
+#*! <%GTREE 2 class definitions%>
+#*! <%GTREE 2.1 pull reader over a text file%>
+class JsonStreamReader:
+    """Reads a JSON document from a text file in chunks, one key, element or value at a time."""
+
+    def __init__(self, file, chunk_size=default_chunk_size, max_value_size=default_max_value_size):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._max_value_size = max_value_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._offset = 0
+
+    #*! <%GTREE 2.1.1 buffer handling%>
+    def _fill(self, size=None):
+        """Drop the consumed text and append the next chunk; return False at the end of the file."""
+        if self._eof:
+            return False
+        if len(self._buffer) - self._pos > self._max_value_size:
+            raise self._error(f"Value longer than {self._max_value_size} characters")
+        chunk = self._file.read(max(size or 0, self._chunk_size))
+        if not chunk:
+            self._eof = True
+            return False
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _error(self, message):
+        return json.JSONDecodeError(f"{message} (character {self._offset + self._pos})", self._buffer, self._pos)
+
+    @property
+    def position(self):
+        """Number of characters consumed so far."""
+        return self._offset + self._pos
+
+    #*! <%GTREE 2.1.2 look at the next token%>
+    def peek(self):
+        """Return the next non-whitespace character without consuming it, or '' at the end of the file."""
+        while True:
+            self._pos = _whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char):
+        if self.peek() != char:
+            raise self._error(f"Expecting '{char}'")
+        self._pos += 1
+
+    #*! <%GTREE 2.1.3 decode a complete value%>
+    def read_value(self):
+        """Decode and return the next value."""
+        char = self.peek()
+        if not char:
+            raise self._error("Expecting value")
+        if char not in '{["':
+            # a number or literal is only complete once the character after it has been read
+            while not _scalar_end.search(self._buffer, self._pos) and self._fill():
+                pass
+        read_size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                # an error followed by a delimiter is in the text read, not in a token cut off by the end of the chunk;
+                # only an unterminated string needs more text to tell
+                if not e.msg.startswith('Unterminated string') and _scalar_end.search(self._buffer, e.pos):
+                    raise
+                if not self._fill(read_size):
+                    raise
+                read_size *= 2  # grow the reads so a value spanning many chunks is decoded in linear time
+                continue
+            self._pos = end
+            return value
+
+    #*! <%GTREE 2.1.4 skip a value without building it%>
+    def _skip_string_rest(self):
+        while True:
+            match = _string_rest.match(self._buffer, self._pos)
+            if match:
+                self._pos = match.end()
+                return
+            if not self._fill():
+                raise self._error("Unterminated string")
+
+    def skip_value(self):
+        """Move past the next value; containers are scanned, not decoded."""
+        char = self.peek()
+        if char == '"':
+            self._pos += 1
+            self._skip_string_rest()
+            return
+        if char not in ('{', '['):
+            self.read_value()
+            return
+        depth = 0
+        while True:
+            match = _structural.search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                if not self._fill():
+                    raise self._error("Unexpected end of file")
+                continue
+            self._pos = match.end()
+            char = match.group()
+            if char == '"':
+                self._skip_string_rest()
+            elif char in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    #*! <%GTREE 2.1.5 walk containers%>
+    def iter_object(self):
+        """Yield the keys of the next object; the caller consumes each value before the next key."""
+        self._expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error("Expecting property name enclosed in double quotes")
+            key = self.read_value()
+            self._expect(':')
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise self._error("Expecting ',' delimiter")
+
+    def iter_array(self):
+        """Yield the indexes of the next array; the caller consumes each element before the next index."""
+        self._expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            char = self.peek()
+            self._pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise self._error("Expecting ',' delimiter")
+
+
+#*! <%GTREE 3 function definitions%>
+#*! <%GTREE 3.1 events of one OIMS_content item%>
+def _iter_content_item(reader, content_index):
+    if reader.peek() != '{':
+        yield ('content_item', content_index, reader.read_value())
+        return
+    item = {}
+    # records read before OIMS_content_object: (property index, record number, record)
+    pending_records = []
+    for key in reader.iter_object():
+        if key != 'OIMS_content_object_properties' or reader.peek() != '[':
+            item[key] = reader.read_value()
+            continue
+        properties = item[key] = []
+        for property_index in reader.iter_array():
+            if reader.peek() != '{':
+                properties.append(reader.read_value())
+                continue
+            content_property = {}
+            for property_key in reader.iter_object():
+                if property_key == 'metadata' and reader.peek() == '[':
+                    named = 'OIMS_content_object' in item
+                    content_object = item.get('OIMS_content_object')
+                    record_count = 0
+                    for record_number in reader.iter_array():
+                        if named:
+                            yield ('record', (content_index, content_object, property_index, record_number), reader.read_value())
+                        else:
+                            pending_records.append((property_index, record_number, reader.read_value()))
+                        record_count += 1
+                    content_property[property_key] = record_count
+                else:
+                    content_property[property_key] = reader.read_value()
+            properties.append(content_property)
+    content_object = item.get('OIMS_content_object')
+    for property_index, record_number, record in pending_records:
+        yield ('record', (content_index, content_object, property_index, record_number), record)
+    yield ('content_item', content_index, item)
+
+#*! <%GTREE 3.2 events of an OIMS file%>
+def iter_oims_events(file_path, chunk_size=default_chunk_size):
+    """Yield the header, every metadata record and every content item of an OIMS file as they are read.
+
+    Raises json.JSONDecodeError for malformed JSON and OSError when the file cannot be read.
+    """
+    found = {'OIMS': False, 'OIMS_header': False, 'OIMS_content': False}
+    with open(file_path, 'r', encoding='utf-8') as file:
+        reader = JsonStreamReader(file, chunk_size)
+        if reader.peek() != '{':
+            reader.read_value()
+            yield ('end', None, found)
+            return
+        for key in reader.iter_object():
+            if key != 'OIMS' or reader.peek() != '{':
+                reader.skip_value()
+                continue
+            found['OIMS'] = True
+            for oims_key in reader.iter_object():
+                if oims_key == 'OIMS_header':
+                    found['OIMS_header'] = True
+                    yield ('header', None, reader.read_value())
+                elif oims_key == 'OIMS_content' and reader.peek() == '[':
+                    found['OIMS_content'] = True
+                    for content_index in reader.iter_array():
+                        yield from _iter_content_item(reader, content_index)
+                else:
+                    if oims_key == 'OIMS_content':
+                        found['OIMS_content'] = True
+                    reader.skip_value()
+    yield ('end', None, found)
+
+#*! <%GTREE 3.3 read only the header of an OIMS file%>
+def read_oims_header(file_path, scan_content=False, chunk_size=default_header_chunk_size):
+    """Read an OIMS file up to its OIMS_header and stop.
+
+    Returns a dictionary with
+    found               which of OIMS, OIMS_header and OIMS_content were seen
+    header              the OIMS_header, or None
+    content_objects     the OIMS_content_object identifiers in OIMS_content when scan_content is set, else None
+    characters_read     how far into the file reading went
+
+    Reading stops as soon as the header has been read and OIMS_content has been seen, so for the usual
+    key order (OIMS_header before OIMS_content) the time is proportional to the size of the header.
+    With scan_content the content items are scanned for their identifiers; everything else in them is
+    skipped without being decoded. Raises json.JSONDecodeError and OSError like iter_oims_events.
+    """
+    result = {'found': {'OIMS': False, 'OIMS_header': False, 'OIMS_content': False},
+              'header': None, 'content_objects': None, 'characters_read': 0}
+    found = result['found']
+    with open(file_path, 'r', encoding='utf-8') as file:
+        reader = JsonStreamReader(file, chunk_size)
+        if reader.peek() == '{':
+            for key in reader.iter_object():
+                if key != 'OIMS' or reader.peek() != '{':
+                    reader.skip_value()
+                    continue
+                found['OIMS'] = True
+                for oims_key in reader.iter_object():
+                    if oims_key == 'OIMS_header':
+                        found['OIMS_header'] = True
+                        result['header'] = reader.read_value()
+                    elif oims_key == 'OIMS_content':
+                        found['OIMS_content'] = True
+                        if scan_content and reader.peek() == '[':
+                            result['content_objects'] = _scan_content_objects(reader)
+                        elif found['OIMS_header']:
+                            break  # the content is only needed to find a header that follows it
+                        else:
+                            reader.skip_value()
+                    else:
+                        reader.skip_value()
+                    if found['OIMS_header'] and found['OIMS_content']:
+                        break
+                break
+        result['characters_read'] = reader.position
+    return result
+
+def _scan_content_objects(reader):
+    content_objects = []
+    for _ in reader.iter_array():
+        if reader.peek() != '{':
+            reader.skip_value()
+            continue
+        for key in reader.iter_object():
+            if key == 'OIMS_content_object':
+                content_objects.append(reader.read_value())
+            else:
+                reader.skip_value()
+    return content_objects
+
+#*============================   End Of File   ================================
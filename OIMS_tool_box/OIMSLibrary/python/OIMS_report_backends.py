@@ -0,0 +1,245 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_report_backends.py
+__version__ = "1.1.0"
+# Remarks   : messages are passed to the writers as iterables; only json and junit build lists
+"""
+*! <%GTREE 0 documentation of the report backends%>
+*! <%GTREE 0.1 Introduction%>
+Report writers shared by the OIMS validation tools.
+
+The format of the report is chosen per run with --report_format:
+text   : plain text file, one message per line
+json   : JSON document with the errors, the warnings and the overall result
+junit  : JUnit XML, one test case per error, for CI systems
+pdf    : PDF document (needs reportlab), drawn page by page with a bounded number of messages per
+         category and a summary table
+none   : no report, the exit code of the tool carries the result
+
+reportlab is only imported when a PDF is written, so runs with another format do not pay for
+importing it. A new format is added by writing a function with the signature of the writers
+below and registering it in report_backends with the file extension it uses.
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import xml.etree.ElementTree as ET
+
+import OIMS_json_io
+
+#*! <%GTREE 1.2 defaults%>
+default_report_format = 'pdf'
+success_message = "All validations passed successfully."
+
+#*! <%GTREE 1.3 layout of PDF reports%>
+default_max_messages_per_category = 1000
+default_max_lines_per_message = 12
+page_margin = 40
+line_height = 12
+title_font, title_font_size = 'Helvetica-Bold', 16
+heading_font, heading_font_size = 'Helvetica-Bold', 11
+body_font, body_font_size = 'Helvetica', 9
+
+
+#*! <%GTREE 2 function definitions: report writers%>
+"""
+Each writer receives the errors and the warnings as iterables of messages, which it reads once. A message
+is a string, filed under 'Errors' or 'Warnings', or a (category, message) pair. The text and PDF writers
+handle the messages one at a time; the JSON and JUnit writers need all of them and make lists themselves.
+"""
+#*! <%GTREE 2.0 function to pair every message with its category%>
+def categorized_messages(errors, warnings=()):
+    """Yield (category, message) for the warnings and then the errors."""
+    for default_category, messages in (('Warnings', warnings), ('Errors', errors)):
+        for message in messages:
+            if isinstance(message, tuple):
+                yield message
+            else:
+                yield default_category, message
+
+#*! <%GTREE 2.1 plain text report%>
+def write_text_report(errors, title, boiler_text, file_path, warnings=()):
+    """Write the report as plain text."""
+    with open(file_path, 'w', encoding='utf-8') as report_file:
+        report_file.write(f"{title}\n\n")
+        if boiler_text:
+            report_file.write(f"{boiler_text}\n\n")
+        current_category = None
+        error_count = 0
+        def counted_errors():
+            nonlocal error_count
+            for error in errors:
+                error_count += 1
+                yield error
+        for category, message in categorized_messages(counted_errors(), warnings):
+            if category != current_category:
+                if current_category is not None:
+                    report_file.write("\n")
+                report_file.write(f"{category}:\n")
+                current_category = category
+            report_file.write(f"{message}\n")
+        if not error_count:
+            if current_category is not None:
+                report_file.write("\n")
+            report_file.write(f"{success_message}\n")
+
+#*! <%GTREE 2.2 JSON report%>
+def write_json_report(errors, title, boiler_text, file_path, warnings=()):
+    """Write the report as a JSON document."""
+    errors = list(errors)
+    report = {
+        'title': title,
+        'description': boiler_text,
+        'valid': not errors,
+        'errors': [{'category': category, 'message': message} for category, message in categorized_messages(errors)],
+        'warnings': [{'category': category, 'message': message} for category, message in categorized_messages((), warnings)],
+    }
+    OIMS_json_io.dump_json_file(report, file_path)
+
+#*! <%GTREE 2.3 JUnit XML report%>
+def write_junit_report(errors, title, boiler_text, file_path, warnings=()):
+    """Write the report as JUnit XML: one failing test case per error, or one passing test case."""
+    errors = list(errors)
+    warnings = list(warnings)
+    testsuite = ET.Element('testsuite', name=title, tests=str(max(len(errors), 1)),
+                           failures=str(len(errors)), errors='0', skipped='0')
+    for number, (category, error) in enumerate(categorized_messages(errors), start=1):
+        testcase = ET.SubElement(testsuite, 'testcase', classname=category, name=f"error {number}")
+        failure = ET.SubElement(testcase, 'failure', message=error.splitlines()[0] if error else '')
+        failure.text = error
+    if not errors:
+        ET.SubElement(testsuite, 'testcase', classname=title, name=success_message)
+    if warnings:
+        ET.SubElement(testsuite, 'system-out').text = "\n".join(f"{category}: {warning}"
+                                                                for category, warning in categorized_messages((), warnings))
+    ET.ElementTree(testsuite).write(file_path, encoding='utf-8', xml_declaration=True)
+
+#*! <%GTREE 2.4 PDF report%>
+#*! <%GTREE 2.4.1 streaming PDF report: pages are drawn as the messages arrive%>
+class StreamingPdfReport:
+    """PDF report that is drawn page by page while the messages arrive.
+
+    Messages are wrapped to the page width and drawn straight onto the canvas; nothing is kept per
+    message except a counter per category. At most max_messages_per_category messages are drawn
+    for each category and at most max_lines_per_message lines for each message, so the size of the
+    document, and the memory used to build it, is bounded however many issues there are. close()
+    adds a summary table with the number of messages per category and how many were not shown.
+    """
+
+    def __init__(self, file_path, title, boiler_text='', max_messages_per_category=default_max_messages_per_category,
+                 max_lines_per_message=default_max_lines_per_message):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.utils import simpleSplit
+        from reportlab.pdfgen import canvas
+
+        self._simple_split = simpleSplit
+        self._canvas = canvas.Canvas(file_path, pagesize=letter)
+        self._width, self._height = letter
+        self._y_position = self._height - page_margin
+        self.max_messages_per_category = max_messages_per_category
+        self.max_lines_per_message = max_lines_per_message
+        self.category_counts = {}
+        self._current_category = None
+
+        self._draw_text(title, title_font, title_font_size)
+        self._y_position -= line_height
+        if boiler_text:
+            self._draw_text(boiler_text, body_font, body_font_size)
+            self._y_position -= line_height
+
+    #*! <%GTREE 2.4.1.1 drawing primitives%>
+    def _draw_line(self, text, font, font_size, x_offset=0):
+        if self._y_position < page_margin:
+            self._canvas.showPage()
+            self._y_position = self._height - page_margin
+        self._canvas.setFont(font, font_size)
+        self._canvas.drawString(page_margin + x_offset, self._y_position, text)
+        self._y_position -= max(line_height, font_size + 3)
+
+    def _draw_text(self, text, font, font_size, max_lines=None):
+        lines = self._simple_split(str(text), font, font_size, self._width - 2 * page_margin) or ['']
+        if max_lines is not None and len(lines) > max_lines:
+            lines = lines[:max_lines - 1] + [f"... ({len(lines) - max_lines + 1} more lines not shown)"]
+        for line in lines:
+            self._draw_line(line, font, font_size)
+
+    #*! <%GTREE 2.4.1.2 add a message%>
+    def add(self, message, category='Errors'):
+        """Draw a message under its category heading, unless the category has reached its limit."""
+        count = self.category_counts.get(category, 0) + 1
+        self.category_counts[category] = count
+        if count > self.max_messages_per_category:
+            return
+        if category != self._current_category:
+            self._y_position -= line_height / 2
+            self._draw_text(f"{category}:", heading_font, heading_font_size)
+            self._current_category = category
+        self._draw_text(message, body_font, body_font_size, self.max_lines_per_message)
+
+    #*! <%GTREE 2.4.1.3 summary table and save%>
+    def close(self):
+        """Draw the summary table and write the document."""
+        self._y_position -= line_height
+        if not self.category_counts:
+            self._draw_text(success_message, body_font, body_font_size)
+            self._y_position -= line_height
+        self._draw_text("Summary:", heading_font, heading_font_size)
+        columns = (0, 280, 360, 440)
+        rows = [("Category", "Messages", "Shown", "Not shown")]
+        for category, count in self.category_counts.items():
+            shown = min(count, self.max_messages_per_category)
+            rows.append((category, str(count), str(shown), str(count - shown)))
+        for row_number, row in enumerate(rows):
+            font = heading_font if row_number == 0 else body_font
+            if self._y_position < page_margin:
+                self._canvas.showPage()
+                self._y_position = self._height - page_margin
+            self._canvas.setFont(font, body_font_size)
+            for x_offset, cell in zip(columns, row):
+                self._canvas.drawString(page_margin + x_offset, self._y_position, cell[:60])
+            self._y_position -= line_height
+        self._canvas.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+#*! <%GTREE 2.4.2 PDF report writer%>
+def write_pdf_report(errors, title, boiler_text, file_path, warnings=()):
+    """Write the report as a PDF document with the streaming writer."""
+    with StreamingPdfReport(file_path, title, boiler_text) as report:
+        for category, message in categorized_messages(errors, warnings):
+            report.add(message, category)
+
+#*! <%GTREE 2.5 registry of report backends: format -> (writer, file extension)%>
+report_backends = {
+    'text': (write_text_report, '.txt'),
+    'json': (write_json_report, '.json'),
+    'junit': (write_junit_report, '.xml'),
+    'pdf': (write_pdf_report, '.pdf'),
+}
+report_formats = sorted(report_backends) + ['none']
+
+#*! <%GTREE 2.6 function to write a report in the chosen format%>
+def write_report(errors, report_format, file_path_base, title, boiler_text='', warnings=()):
+    """Write the report to file_path_base plus the extension of the format and return the path.
+
+    Returns None for the format 'none'.
+    """
+    if report_format == 'none':
+        return None
+    if report_format not in report_backends:
+        raise ValueError(f"Unknown report format '{report_format}', expected one of {', '.join(report_formats)}")
+    writer, extension = report_backends[report_format]
+    file_path = file_path_base + extension
+    writer(errors, title, boiler_text, file_path, warnings=warnings)
+    return file_path
+
+#*============================   End Of File   ================================
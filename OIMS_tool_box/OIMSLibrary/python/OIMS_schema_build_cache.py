@@ -0,0 +1,104 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_schema_build_cache.py
+__version__ = "1.0.0"
+# Remarks   :
+"""
+*! <%GTREE 0 documentation of the schema build cache%>
+*! <%GTREE 0.1 Introduction%>
+Build cache for json_schema_builder.py.
+
+A schema is generated from one OIMS_content item of a metametadata file. The build key is the
+content hash of that item together with the OIMS_content_object name, the version of the builder
+and the output options. When the key of a run equals the key recorded for the output file, and the
+output file has not been changed or removed since it was written, the schema is assembled from the
+cached attribute entries and the write is skipped. The check of the JSON file against the schema
+reads more than the content item, so it is run on every build.
+
+Within a build the property entry of every attribute is cached by the content hash of its
+metametadata record, so when only some attributes changed only their entries are regenerated.
+
+*! <%GTREE 0.2 cache layout%>
+<cache_dir>/builds/<sha256 of the output path>.json  : per-output record with the build key, the
+                                                       size and modification time of the output
+                                                       file and the attribute entries
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import hashlib
+import os
+
+import OIMS_json_io
+from OIMS_schema_cache import _write_atomic
+from OIMS_validator_registry import schema_content_hash
+
+#*! <%GTREE 1.2 defaults%>
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".OIMS_cache", "schema_builds")
+
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.1 function to compute the build key%>
+def build_key(content_item, oims_content_object, builder_version, options=None):
+    """Return the key of a build of content_item for oims_content_object by builder_version with the output options."""
+    return schema_content_hash([content_item, oims_content_object, builder_version, options or {}])
+
+def _file_signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+#*! <%GTREE 3 class definitions%>
+#*! <%GTREE 3.1 schema build cache%>
+class SchemaBuildCache:
+    """On-disk record of the last build of every output schema file."""
+
+    def __init__(self, cache_dir=default_cache_dir):
+        self.cache_dir = cache_dir
+
+    #*! <%GTREE 3.1.1 per-output records%>
+    def _record_path(self, output_path):
+        output_hash = hashlib.sha256(os.path.abspath(output_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "builds", output_hash + ".json")
+
+    def _read_record(self, output_path):
+        try:
+            return OIMS_json_io.load_json_file(self._record_path(output_path))
+        except (OSError, ValueError):
+            return None
+
+    #*! <%GTREE 3.1.2 check a build%>
+    def is_current(self, output_path, key):
+        """Return True when output_path was written by a build with this key and is unchanged since."""
+        record = self._read_record(output_path)
+        return (record is not None and record.get('build_key') == key
+                and record.get('output_signature') == _file_signature(output_path))
+
+    def attribute_schemas(self, output_path, builder_version):
+        """Return the cached {attribute hash: property entry} of the last build by this builder version."""
+        record = self._read_record(output_path)
+        if record is None or record.get('builder_version') != builder_version:
+            return {}
+        return record.get('attributes', {})
+
+    #*! <%GTREE 3.1.3 record a build%>
+    def store(self, output_path, key, builder_version, attribute_schemas):
+        """Record the build of output_path; call after the output file has been written."""
+        record = {
+            'output_path': os.path.abspath(output_path),
+            'build_key': key,
+            'builder_version': builder_version,
+            'output_signature': _file_signature(output_path),
+            'attributes': attribute_schemas,
+        }
+        _write_atomic(self._record_path(output_path), OIMS_json_io.dumps(record).encode('utf-8'))
+
+#*============================   End Of File   ================================
@@ -0,0 +1,249 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_schema_cache.py
+__version__ = "1.1.1"
+# Remarks   : fetch() retrieves documents without the cache; seeded documents do not expire and
+#             unreadable cached documents are fetched again
+"""
+*! <%GTREE 0 documentation of the offline schema cache%>
+*! <%GTREE 0.1 Introduction%>
+On-disk, content-addressed cache for schemas and other JSON files retrieved from a URL.
+
+The validation tools fetch the OIMS structure schema from GitHub on every run. With the cache a
+URL is fetched once; later runs read the cached copy while it is younger than the time-to-live
+(TTL) and afterwards revalidate it with a conditional request (ETag / Last-Modified), so an
+unchanged schema costs a 304 response instead of a download. In offline mode no request is made.
+Documents seeded from a local directory have no ETag to revalidate with; they do not expire and
+stay valid until they are replaced by seeding or storing the URL again. A cached document that
+cannot be read is removed and treated as not cached.
+requests is only imported when a request is actually made. fetch() retrieves a document without
+the cache, for documents such as the metadata to be validated that should not be kept.
+
+*! <%GTREE 0.2 cache layout%>
+<cache_dir>/objects/<sha256 of the content>.json   : the cached documents, stored once per content
+<cache_dir>/urls/<sha256 of the url>.json          : per-URL record with the content hash, ETag,
+                                                     Last-Modified, the time of the last check and
+                                                     whether the document was seeded
+
+*! <%GTREE 0.3  command line parameters%>
+Pre-seed the cache with the schemas in BasicSchemas/ so the tools never need the network:
+python OIMS_schema_cache.py --seed_from ../../../BasicSchemas
+
+seed_from      :  directory with JSON files to put in the cache
+base_url       :  URL under which the files are published
+                      [optional, default is the BasicSchemas folder of the foresight initiative GitHub repo]
+cache_dir      :  cache directory [optional, default is ~/.OIMS_cache/schemas]
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import OIMS_json_io
+
+#*! <%GTREE 1.2 defaults%>
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".OIMS_cache", "schemas")
+default_ttl = 24 * 3600
+default_timeout = 10
+default_seed_base_url = 'https://raw.githubusercontent.com/ForesightInitiative/OIMS/main/BasicSchemas/'
+
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.1 function to write a file atomically%>
+def _write_atomic(file_path, content):
+    """Write bytes to a temporary file in the target directory and rename it into place."""
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(content)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+#*! <%GTREE 3 class definitions%>
+#*! <%GTREE 3.1 schema cache%>
+class SchemaCache:
+    """Content-addressed on-disk cache of JSON documents retrieved from URLs.
+
+    get() returns (data, None) or (None, error message), like the load functions of the tools.
+    """
+
+    def __init__(self, cache_dir=default_cache_dir, ttl=default_ttl, offline=False, timeout=default_timeout):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.offline = offline
+        self.timeout = timeout
+
+    #*! <%GTREE 3.1.1 locations in the cache%>
+    def _object_path(self, content_hash):
+        return os.path.join(self.cache_dir, "objects", content_hash + ".json")
+
+    def _record_path(self, url):
+        url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "urls", url_hash + ".json")
+
+    #*! <%GTREE 3.1.2 per-URL records%>
+    def _read_record(self, url):
+        try:
+            with open(self._record_path(url), 'r', encoding='utf-8') as record_file:
+                record = json.load(record_file)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._object_path(record.get('sha256', ''))):
+            return None
+        return record
+
+    def _write_record(self, url, record):
+        _write_atomic(self._record_path(url), json.dumps(record, indent=4).encode('utf-8'))
+
+    def _read_object(self, record):
+        """Return the cached document of record, or None after removing it when it cannot be read."""
+        object_path = self._object_path(record['sha256'])
+        try:
+            return OIMS_json_io.load_json_file(object_path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding the unreadable cached copy of {record.get('url')}: {e}")
+            try:
+                os.remove(object_path)
+            except OSError:
+                pass
+            return None
+
+    #*! <%GTREE 3.1.3 store a document%>
+    def store(self, url, content, etag=None, last_modified=None, seeded=False):
+        """Store the raw bytes of a JSON document as the cached copy of url and return its content hash.
+
+        A seeded copy does not expire.
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(content_hash)
+        if not os.path.exists(object_path):
+            _write_atomic(object_path, content)
+        self._write_record(url, {
+            'url': url,
+            'sha256': content_hash,
+            'etag': etag,
+            'last_modified': last_modified,
+            'checked_at': time.time(),
+            'seeded': seeded,
+        })
+        return content_hash
+
+    #*! <%GTREE 3.1.4 retrieve a document%>
+    def get(self, url, session=None):
+        """Return the JSON document at url from the cache, revalidating or fetching it when needed."""
+        record = self._read_record(url)
+        cached = self._read_object(record) if record is not None else None
+        if cached is None:
+            record = None
+        elif self.offline or record.get('seeded') or time.time() - record['checked_at'] < self.ttl:
+            return cached, None
+        if self.offline:
+            return None, f"Failed to retrieve data from {url}: not in the schema cache and offline mode is on"
+
+        import requests  # only runs that go to the network pay for importing requests
+
+        headers = {}
+        if record is not None:
+            if record.get('etag'):
+                headers['If-None-Match'] = record['etag']
+            if record.get('last_modified'):
+                headers['If-Modified-Since'] = record['last_modified']
+
+        try:
+            response = (session or requests).get(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            if record is not None:
+                logging.warning(f"Could not revalidate {url}, using the cached copy: {e}")
+                return cached, None
+            return None, f"Failed to retrieve data from {url}: {e}"
+
+        if response.status_code == 304 and record is not None:
+            record['checked_at'] = time.time()
+            self._write_record(url, record)
+            return cached, None
+        if response.status_code != 200:
+            return None, f"Failed to retrieve data from {url}. Status code: {response.status_code}"
+
+        try:
+            data = OIMS_json_io.loads(response.content)
+        except ValueError as e:
+            return None, f"Error parsing JSON retrieved from {url}: {e}"
+        self.store(url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return data, None
+
+    #*! <%GTREE 3.1.5 retrieve a document without the cache%>
+    def fetch(self, url, session=None):
+        """Return the JSON document at url, without reading it from or storing it in the cache."""
+        if self.offline:
+            return None, f"Failed to retrieve data from {url}: offline mode is on"
+
+        import requests
+
+        try:
+            response = (session or requests).get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            return None, f"Failed to retrieve data from {url}: {e}"
+        if response.status_code != 200:
+            return None, f"Failed to retrieve data from {url}. Status code: {response.status_code}"
+        try:
+            return OIMS_json_io.loads(response.content), None
+        except ValueError as e:
+            return None, f"Error parsing JSON retrieved from {url}: {e}"
+
+    #*! <%GTREE 3.1.6 pre-seed the cache from a local directory%>
+    def seed_from_directory(self, directory, base_url=default_seed_base_url):
+        """Store every JSON file in directory as the cached copy of base_url + file name; return the URLs."""
+        seeded = []
+        for file_name in sorted(os.listdir(directory)):
+            file_path = os.path.join(directory, file_name)
+            if not (file_name.endswith('.json') and os.path.isfile(file_path)):
+                continue
+            with open(file_path, 'rb') as seed_file:
+                content = seed_file.read()
+            try:
+                OIMS_json_io.loads(content)
+            except ValueError as e:
+                logging.warning(f"Not seeding {file_path}, it is not valid JSON: {e}")
+                continue
+            url = base_url.rstrip('/') + '/' + file_name
+            self.store(url, content, seeded=True)
+            seeded.append(url)
+        return seeded
+
+
+#*! <%GTREE 4 module level cache shared by the tools%>
+schema_cache = SchemaCache()
+
+#*! <%GTREE 5 main definition: pre-seed command%>
+def main():
+    parser = argparse.ArgumentParser(description='Pre-seed the OIMS schema cache from a local directory.')
+    parser.add_argument('--seed_from', required=True, help='Directory with JSON files to put in the cache, e.g. BasicSchemas.')
+    parser.add_argument('--base_url', default=default_seed_base_url, help='URL under which the files are published.')
+    parser.add_argument('--cache_dir', default=default_cache_dir, help='Cache directory.')
+    args = parser.parse_args()
+
+    cache = SchemaCache(cache_dir=args.cache_dir)
+    for url in cache.seed_from_directory(args.seed_from, args.base_url):
+        print(f"cached {url}")
+
+if __name__ == "__main__":
+    main()
+
+#*============================   End Of File   ================================
@@ -0,0 +1,166 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_schema_compaction.py
+__version__ = "1.0.0"
+# Remarks   :
+"""
+*! <%GTREE 0 documentation of the schema compaction%>
+*! <%GTREE 0.1 Introduction%>
+Compaction of generated JSON schemas without changing what they accept.
+
+json_schema_builder.py writes a properties block for the attribute_value_elements of every compound
+attribute and a full enum list for every controlled vocabulary, and keeps the empty if/then/else
+placeholders of its default schema. compact_schema() rewrites such a schema in two steps:
+
+1. Empty conditionals are dropped. An if whose subschema is empty always holds, so a then that is
+   also empty adds nothing and the else is never used.
+2. Identical enum and properties keywords that occur more than once are hash-consed: the keyword is
+   moved once into $defs under a name derived from its content hash, and every occurrence is
+   replaced by a $ref to it. In draft 2020-12 a $ref applies next to its sibling keywords, so
+   {"type": "string", "enum": [...]} and {"type": "string", "$ref": "#/$defs/enum_..."} accept the
+   same instances.
+
+*! <%GTREE 0.2 what is left alone%>
+- keywords whose value is data rather than a schema (enum values, const, default, examples)
+- properties next to additionalProperties or patternProperties, which only see sibling properties
+- subschemas with their own $id, where #/$defs would resolve against another resource
+- keywords smaller than min_size characters, for which a $ref would not be shorter
+
+*! <%GTREE 0.3 validation%>
+jsonschema resolves a $ref every time it is evaluated, which is slower than checking an inlined enum.
+The validator registry therefore compiles validators from inline_shared_subschemas(schema), which
+puts the shared keywords back in place as references to the same objects: the file stays small and
+validation is as fast as with the inlined schema.
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import copy
+import hashlib
+import json
+import re
+
+#*! <%GTREE 1.2 defaults and JSON schema keywords%>
+default_shared_keywords = ('enum', 'properties')
+default_min_size = 64
+_schema_keywords = ('items', 'not', 'if', 'then', 'else', 'contains', 'propertyNames', 'additionalProperties',
+                    'additionalItems', 'unevaluatedItems', 'unevaluatedProperties')
+_schema_list_keywords = ('allOf', 'anyOf', 'oneOf', 'prefixItems', 'items')
+_schema_map_keywords = ('properties', 'patternProperties', 'dependentSchemas', '$defs', 'definitions')
+_shared_definition_name = re.compile(r'([A-Za-z]+)_[0-9a-f]{12}')
+
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.0 function to hash a keyword value%>
+def _content_hash(value):
+    # the canonical serialization of OIMS_validator_registry.schema_content_hash, which imports this module
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+#*! <%GTREE 2.1 function to walk the subschemas of a schema%>
+def _subschemas(schema):
+    """Yield the direct subschemas of a schema, not the data in enum, const, default or examples."""
+    for keyword, value in schema.items():
+        if keyword in _schema_map_keywords and isinstance(value, dict):
+            yield from (subschema for subschema in value.values() if isinstance(subschema, dict))
+        elif keyword in _schema_list_keywords and isinstance(value, list):
+            yield from (subschema for subschema in value if isinstance(subschema, dict))
+        elif keyword in _schema_keywords and isinstance(value, dict):
+            yield value
+
+#*! <%GTREE 2.2 function to drop empty conditionals%>
+def _is_empty_schema(schema):
+    return schema is True or schema == {} or schema == {'properties': {}}
+
+def drop_empty_conditionals(schema):
+    """Remove if/then/else keywords that cannot change the result of validation, in place."""
+    if 'if' in schema and _is_empty_schema(schema['if']) and _is_empty_schema(schema.get('then', {})):
+        for keyword in ('if', 'then', 'else'):
+            schema.pop(keyword, None)
+    elif 'if' not in schema:
+        schema.pop('then', None)
+        schema.pop('else', None)
+    for subschema in _subschemas(schema):
+        drop_empty_conditionals(subschema)
+    return schema
+
+#*! <%GTREE 2.3 function to share identical keywords through $defs%>
+def _shareable(schema, keyword):
+    if keyword == 'properties':
+        return 'additionalProperties' not in schema and 'patternProperties' not in schema
+    return True
+
+def _keyword_occurrences(schema, keywords, occurrences, is_root=True):
+    if '$id' in schema and not is_root:
+        return
+    if '$ref' not in schema:
+        for keyword in keywords:
+            if keyword in schema and _shareable(schema, keyword):
+                occurrences.setdefault((keyword, _content_hash(schema[keyword])), []).append(schema)
+    for subschema in _subschemas(schema):
+        _keyword_occurrences(subschema, keywords, occurrences, is_root=False)
+
+def share_subschemas(schema, keywords=default_shared_keywords, min_size=default_min_size):
+    """Move enum and properties keywords that occur more than once into $defs and refer to them, in place.
+
+    Returns the number of keywords replaced by a $ref.
+    """
+    occurrences = {}
+    _keyword_occurrences(schema, keywords, occurrences)
+    definitions = schema.setdefault('$defs', {})
+    replaced = 0
+    for (keyword, content_hash), nodes in occurrences.items():
+        # a node can hold two shareable keywords; only the first of them gets the $ref
+        nodes = [node for node in nodes if '$ref' not in node]
+        if len(nodes) < 2 or len(json.dumps(nodes[0][keyword])) < min_size:
+            continue
+        name = f"{keyword}_{content_hash[:12]}"
+        definitions[name] = {keyword: nodes[0][keyword]}
+        for node in nodes:
+            del node[keyword]
+            node['$ref'] = f"#/$defs/{name}"
+            replaced += 1
+    if not definitions:
+        del schema['$defs']
+    return replaced
+
+#*! <%GTREE 2.4 function to compact a schema%>
+def compact_schema(schema, keywords=default_shared_keywords, min_size=default_min_size):
+    """Return a compacted copy of schema: empty conditionals dropped and repeated keywords shared via $defs."""
+    schema = drop_empty_conditionals(copy.deepcopy(schema))
+    share_subschemas(schema, keywords, min_size)
+    return schema
+
+#*! <%GTREE 2.5 function to undo the sharing for validation%>
+def _inline_references(schema, definitions):
+    reference = schema.get('$ref')
+    if isinstance(reference, str) and reference.startswith('#/$defs/'):
+        name = reference[len('#/$defs/'):]
+        match = _shared_definition_name.fullmatch(name)
+        definition = definitions.get(name)
+        if match and isinstance(definition, dict) and list(definition) == [match.group(1)] and match.group(1) not in schema:
+            del schema['$ref']
+            schema[match.group(1)] = definition[match.group(1)]
+    for subschema in _subschemas(schema):
+        _inline_references(subschema, definitions)
+
+def inline_shared_subschemas(schema):
+    """Return schema with the $refs made by share_subschemas() replaced by the keywords they refer to.
+
+    jsonschema resolves a $ref on every evaluation, which costs more than checking the keyword itself,
+    so validators are compiled from the inlined schema. The inlined keywords are the same objects as
+    in $defs, so memory is still shared. A schema without shared definitions is returned unchanged.
+    """
+    definitions = schema.get('$defs') if isinstance(schema, dict) else None
+    if not isinstance(definitions, dict) or not any(_shared_definition_name.fullmatch(name) for name in definitions):
+        return schema
+    schema = copy.deepcopy(schema)
+    _inline_references(schema, schema['$defs'])
+    return schema
+
+#*============================   End Of File   ================================
@@ -30,11 +30,21 @@ OIMS_content_object_schema_path  :
 
 *! <%GTREE 0.3.2 optional command line paremers%>
 OIMS_to_python_type_mapping_path :
+report_format                    : pdf, text, json, junit or none [default is pdf]
+streaming                        : flag: read the file to be tested incrementally, one metadata record at a time
 *! <%GTREE 0.4  description of the script%>
 *_ Initialization:
 
 The script starts by initializing necessary libraries and checking command-line arguments
 
+*_ Library use:
+
+The checks are available in-process through check_oims_consistency(...), which returns the fatal issues and
+the warnings as aggregated issues (see OIMS_issues.py), and write_report(...), which writes the report:
+    from OIMS_schema_consistency_test import check_oims_consistency
+    issues, warning_issues = check_oims_consistency(schema_to_test_path, OIMS_basic_path, OIMS_content_object,
+                                                    OIMS_content_object_schema_path)
+
 *! <%GTREE 0.99  notes%>
 
 """
@@ -51,28 +61,33 @@ import os
 
 #*! <%GTREE 1.1.2 import json libraries%>
 import json
+from OIMS_document_cache import document_cache
+from OIMS_json_stream import iter_oims_events, read_oims_header
 
-#*! <%GTREE 1.1.3 import pdf write libraries%>
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-print("line 51")
+#*! <%GTREE 1.1.3 import the issue model: repeated occurrences are aggregated as they are found%>
+from OIMS_issues import IssueAggregator
+
+#*! <%GTREE 1.1.4 import report writers: reportlab is only imported when a PDF report is written%>
+import OIMS_report_backends
 
 #*! <%GTREE 1.2 Check command line arguments for settings file path%>
-def local_commandlineparser:
+def local_commandlineparser():
     parser = argparse.ArgumentParser(description='check consistency of an OIMS compatible metadata file against its underlying schemas')
     parser.add_argument('--schema_to_test_path', required=True, help='Path to the OIMS compatible emetadata schema that needs to be tested')
     parser.add_argument('--OIMS_basic_path', required=True, help='Path to the OIMS basic self describing metadata schema version used')
     parser.add_argument('--OIMS_content_object', required=True, help='OIMS_content_object to be tested')
     parser.add_argument('--OIMS_content_object_schema_path', required=True, help='Path to schema describing the OIMS_content_object to be tested')
     parser.add_argument('--OIMS_to_python_type_mapping_path',  help='path to json file with OIMS to python data type mappings')
+    parser.add_argument('--streaming', action='store_true',
+                        help='read the file to be tested incrementally: the header once, then one metadata record at a time')
+    parser.add_argument('--report_format', choices=OIMS_report_backends.report_formats, default=OIMS_report_backends.default_report_format,
+                        help='format of the report: pdf, text, json, junit or none (default is pdf)')
 
     args = parser.parse_args()
     return args
 
-#*! <%GTREE 1.3 initialize an issues list%>
-# Initialize an empty list to store issues
-issues = []
-warning_issues = []
+#*! <%GTREE 1.3 issues lists%>
+# the issues and warning_issues aggregators (OIMS_issues.py) are created per run in check_oims_consistency
 
 #*! <%GTREE 1.4 data type mappings%>
 #*! <%GTREE 1.4.1 json to python data type mappings%>
@@ -84,7 +99,6 @@ json_to_python_type_mapping = {
     "boolean": "bool",
     "null": "NoneType"
 }
-print("line 78")
 
 #*! <%GTREE 1.4.1 OIMS to python data type mappings%>
 OIMS_to_python_type_mapping = {
@@ -108,13 +122,20 @@ OIMS_to_python_type_mapping = {
 """
 to be expanded
 """
-print("line 102")
 #*! <%GTREE 2.1.1 validate file for general OIMS structure %>
-def validate_oims_structure(file_path):
+def validate_oims_structure(file_path, header_only=False, data=None):
+    """Return 'OIMS file is valid.' or a message describing the structure error.
+
+    With header_only the file is only read up to its header (triage, see triage_oims_structure).
+    data is the parsed file when the caller has it already; otherwise the file is read through the
+    document cache, which is meant for reference files such as the OIMS base schema.
+    """
+    if header_only:
+        return triage_oims_structure(file_path)['result']
     try:
-        # Load the JSON file
-        with open(file_path, 'r') as file:
-            data = json.load(file)
+        # Load the JSON file, parsed once and shared with the other checks
+        if data is None:
+            data = document_cache.load(file_path)
 
         # Validate root element
         if not data.get("OIMS"):
@@ -143,7 +164,67 @@ def validate_oims_structure(file_path):
     except Exception as e:
         return f"An error occurred: {e}"
 
-print("line 137")
+def load_and_validate_oims_structure(file_path):
+    """Parse the file once through the document cache and return (data, result of validate_oims_structure); data is None when it could not be parsed."""
+    try:
+        data = document_cache.load(file_path)
+    except json.JSONDecodeError:
+        return None, "Invalid file: File is not a valid JSON."
+    except Exception as e:
+        return None, f"An error occurred: {e}"
+    return data, validate_oims_structure(file_path, data=data)
+
+#*! <%GTREE 2.1.1.1 triage: check the OIMS structure from the header only%>
+def triage_oims_structure(file_path, scan_content=False):
+    """Check the OIMS structure of a file from its header only and return what is needed to route it.
+
+    The file is read incrementally and reading stops after the OIMS_header (OIMS_json_stream.read_oims_header),
+    so the time is proportional to the size of the header, not of the file. JSON syntax errors after the
+    header are therefore not detected; the full check or the streaming check finds them. Returns a dictionary with
+    file                the file checked
+    result              'OIMS file is valid.' or the error message, as returned by validate_oims_structure
+    header              the OIMS_header, or None
+    metadata_version    file_descriptors.metadata_version.current_version of the header
+    schema_versions     per content object declared in metadata_schema: the schema names, versions and URLs
+    content_objects     with scan_content, the OIMS_content_object identifiers found in OIMS_content
+    """
+    triage = {'file': file_path, 'result': None, 'header': None, 'metadata_version': None,
+              'schema_versions': {}, 'content_objects': None}
+    try:
+        head = read_oims_header(file_path, scan_content)
+    except json.JSONDecodeError:
+        triage['result'] = "Invalid file: File is not a valid JSON."
+        return triage
+    except Exception as e:
+        triage['result'] = f"An error occurred: {e}"
+        return triage
+
+    header = head['header']
+    if not head['found']['OIMS']:
+        triage['result'] = "Invalid file: Root element 'OIMS' not found."
+    elif not head['found']['OIMS_header'] or not head['found']['OIMS_content']:
+        triage['result'] = "Invalid file: 'OIMS_header' or 'OIMS_content' not found."
+    elif not isinstance(header, dict):
+        triage['result'] = "Invalid OIMS header: 'OIMS_header' is not an object."
+    else:
+        triage['result'] = validate_oims_header(header) or "OIMS file is valid."
+
+    if isinstance(header, dict):
+        triage['header'] = header
+        metadata_version = (header.get("file_descriptors") or {}).get("metadata_version") or {}
+        if isinstance(metadata_version, dict):
+            triage['metadata_version'] = metadata_version.get("current_version")
+        for metadata_schema in header.get("metadata_schema") or []:
+            if not isinstance(metadata_schema, dict):
+                continue
+            triage['schema_versions'][metadata_schema.get("OIMS_content_object")] = [
+                {'schema_name': schema_property.get("schema_name"),
+                 'schema_version': schema_property.get("schema_version"),
+                 'schema_url': schema_property.get("schema_url")}
+                for schema_property in metadata_schema.get("schema_properties") or [] if isinstance(schema_property, dict)]
+    triage['content_objects'] = head['content_objects']
+    return triage
+
 #*! <%GTREE 2.1.2 validate header section%>
 def validate_oims_header(header_data):
     required_components = ["mapping_info", "metadata_schema", "file_descriptors"]
@@ -172,61 +253,155 @@ def file_exists(file_path):
     """
     return os.path.exists(file_path) and os.path.isfile(file_path)
 
-#*! <%GTREE 2.1.5 function toUse ReportLab to generate a PDF from the combined list%>
-def generate_pdf(report, filename="report.pdf"):
-    c = canvas.Canvas(filename, pagesize=letter)
-    width, height = letter  # Get width and height of the page
-    y_position = height - 40  # Start position for the first line
-
-    for line in report:
-        c.drawString(40, y_position, line)
-        y_position -= 20  # Move to the next line
-        if y_position < 40:  # Check for new page
-            c.showPage()
-            y_position = height - 40
-
-    c.save()
-print("line 180")
-#*! <%GTREE 3 read files%>
-#*! <%GTREE 3.1 OIMS compatible metadata file to be tested%>
-#*! <%GTREE 3.1.1 test file existence%>
-"""
-File path is in args.schema_to_test_path
-check if file exists
+#*! <%GTREE 2.1.5 function to check data types of metametadata attributes against a data type mapping%>
+def test_datatypemapping(mapping_id, metametadata, valid_oims_types):
+    require_data_type_mapping = False
+    warnings = []
+    invalid_types = set()
 
-for each check if not valid return an error and append the error or warning with key information to a list of issues
-"""
-# Check for the existence of the OIMS compatible metadata file
-if not file_exists(args.schema_to_test_path):
-    print(f"Error: OIMS compatible metadata file to be tested'{args.schema_to_test_path}' does not exist.")
-    issues.append(f"Error: OIMS compatible metadata file to be tested'{args.schema_to_test_path}' does not exist.")
-#*! <%GTREE 3.1.2 test if OIMS compatible emtadata file at structure level%>
-else:
-    # Validate the OIMS structure of the file
-    validation_result = validate_oims_structure(args.schema_to_test_path)
-    if validation_result != "OIMS file is valid.":
-        issues.append(validation_result)
-print("line 200")
-#*! <%GTREE 3.1.3 extract some key information from the file%>
-"""
-for the OIMS_content_object to be tested get the identifier from args.OIMS_content_object
-find the version of the underlying metadata schema in the array of compond objects [OIMS][OIMS_header][metadata_schema] where version is in
-[OIMS][OIMS_header][metadata_schema][schema_properties][schema_version] and where [OIMS][OIMS_header][metadata_schema][OIMS_content_object] == args.OIMS_content_object
-store this version id in a container OIMS_content_object_metadata_version
-also store [OIMS][OIMS_header][metadata_schema][schema_properties][OIMS_content_object] in a container OIMS_content_object_metadata_OIMS_content_object
+    # Iterate over attributes in metametadata
+    for attribute in metametadata:
+        oims_type = attribute.get("data_type")
 
-"""
-# # Extracting and storing metadata schema information
-if not issues:
-    with open(args.schema_to_test_path, 'r') as file:
-        oims_data_to_test = json.load(file)["OIMS"]
+        # Check if the data_type is a valid OIMS type
+        if oims_type not in valid_oims_types:
+            warnings.append(f"Invalid OIMS data type '{oims_type}' in metametadata for attribute '{attribute['attribute_name']}' using {mapping_id}.")
+            invalid_types.add(oims_type)
+            require_data_type_mapping = True
+
+    return require_data_type_mapping, warnings, invalid_types
+
+#*! <%GTREE 2.1.6 function to check one metadata record against the metametadata%>
+def check_metadata_record(record_number, compound_object, metametadata_index, type_mapping, issues):
+    """Check every field of one metadata record against its metametadata attribute and add the problems to issues."""
+    # Iterate over key-value pairs in each compound object
+    for key, value in compound_object.items():
+        # 'key' is the attribute name in the compound object
+        # 'value' is the value of that attribute
+        path_template = f"metadata[*].{key}"
+        location = f"metadata[{record_number}].{key}"
+        meta_attribute = metametadata_index.get(key)
+        if meta_attribute is None:
+            issues.add('unknown_field', f"Error: Metadata field '{key}' not found in metametadata.", path_template, location)
+            continue
+
+        expected_data_type = meta_attribute["data_type"]
+        python_types = type_mapping.get(expected_data_type, [])
+
+        """
+        1.  what is the data type of metadata_field_value?
+            is that compatible with the data type identifier in attributes["atrribute_name"]?
+        """
+        """
+        2.  if  attributes["multiple"] is true then metadata_field_value is an array
+        """
+        # Check if 'multiple' is true and value is a list
+        if meta_attribute["multiple"]:
+            if not isinstance(value, list):
+                issues.add('not_an_array', f"Error: '{key}' should be an array as per metametadata.", path_template, location)
+            else:
+                # Check the data type of each element in the list
+                for item_number, item in enumerate(value):
+                    item_location = f"{location}[{item_number}]"
+                    if type(item).__name__ not in python_types:
+                        issues.add('data_type_mismatch', f"Data type mismatch in array '{key}': Expected element of type {python_types}, found {type(item).__name__}.",
+                                   path_template + "[*]", item_location)
+                    """
+                    3.  if "data_type_class":"primitive" then the value is a simple value if "data_type_class":"compound" then the value is a compound object
+                    """
+                    if meta_attribute ["data_type_class"] == "compound" and not isinstance(item, dict):
+                        issues.add('not_compound', f"Error: '{key}' should be a compound object as per metametadata.", path_template + "[*]", item_location)
+                    elif meta_attribute ["data_type_class"] == "primitive" and isinstance(item, dict):
+                        issues.add('not_primitive', f"Error: '{key}' should be a primitive value as per metametadata.", path_template + "[*]", item_location)
+        else:
+            # For non-array values, check the data type directly
+            if type(value).__name__ not in python_types:
+                issues.add('data_type_mismatch', f"Data type mismatch for '{key}': Expected {python_types}, found {type(value).__name__}.", path_template, location)
+
+            """
+            3.  if "data_type_class":"primitive" then the value is a simple value if "data_type_class":"compound" then the value is a compound object
+            """
+            if meta_attribute ["data_type_class"] == "compound" and not isinstance(value, dict):
+                issues.add('not_compound', f"Error: '{key}' should be a compound object as per metametadata.", path_template, location)
+            elif meta_attribute ["data_type_class"] == "primitive" and isinstance(value, dict):
+                issues.add('not_primitive', f"Error: '{key}' should be a primitive value as per metametadata.", path_template, location)
+
+#*! <%GTREE 3 read files: the consistency check as a function%>
+def check_oims_consistency(schema_to_test_path, OIMS_basic_path, OIMS_content_object, OIMS_content_object_schema_path,
+                           OIMS_to_python_type_mapping_path=None, streaming=False):
+    """Check an OIMS compatible metadata file against the OIMS base schema and its metametadata.
+
+    Returns the fatal issues and the warnings as IssueAggregator objects (OIMS_issues.py): every distinct
+    problem is one issue with its number of occurrences and example locations. The reference files (OIMS base,
+    metametadata and type mapping) and the file to be tested are read through the shared document cache, so
+    repeated calls on unchanged files, e.g. for several content objects of one file, do not parse them again.
+
+    With streaming=True the file to be tested is not loaded: its header is read once and its metadata
+    records are checked one at a time as they are parsed (OIMS_json_stream.py), so memory is bounded by
+    the largest record. Problems in OIMS_content are then found in the final pass over the records.
+    """
+    #*! <%GTREE 3.0 initialize the issues lists and the values extracted from the files%>
+    issues = IssueAggregator('error')
+    warning_issues = IssueAggregator('warning')
+    type_mapping = OIMS_to_python_type_mapping
+    oims_content_object = OIMS_content_object
+    oims_content_object_metadata_version = None
+    oims_content_object_metadata_OIMS_content_object = None
+    oims_data_to_test_metadata = []
+    oims_header_to_test = None
+    metametadata = []
+    validation_result = None
+    oims_document_to_test = None
+
+    #*! <%GTREE 3.0.1 parse the reference files and the file to be tested once, for all checks%>
+    preload_paths = (OIMS_basic_path, OIMS_content_object_schema_path) + (() if streaming else (schema_to_test_path,))
+    document_cache.preload([path for path in preload_paths if file_exists(path)])
+
+    #*! <%GTREE 3.1 OIMS compatible metadata file to be tested%>
+    #*! <%GTREE 3.1.1 test file existence%>
+    """
+    File path is in schema_to_test_path
+    check if file exists
+
+    for each check if not valid return an error and append the error or warning with key information to a list of issues
+    """
+    # Check for the existence of the OIMS compatible metadata file
+    if not file_exists(schema_to_test_path):
+        print(f"Error: OIMS compatible metadata file to be tested'{schema_to_test_path}' does not exist.")
+        issues.add('file_not_found', f"Error: OIMS compatible metadata file to be tested'{schema_to_test_path}' does not exist.")
+    #*! <%GTREE 3.1.2 test if OIMS compatible emtadata file at structure level%>
+    elif streaming:
+        # Validate the OIMS structure up to the header, without loading the content
+        triage = triage_oims_structure(schema_to_test_path)
+        oims_header_to_test = triage['header']
+        if triage['result'] != "OIMS file is valid.":
+            issues.add('invalid_structure', triage['result'])
+    else:
+        # Validate the OIMS structure of the file
+        oims_document_to_test, validation_result = load_and_validate_oims_structure(schema_to_test_path)
+        if validation_result != "OIMS file is valid.":
+            issues.add('invalid_structure', validation_result)
+    #*! <%GTREE 3.1.3 extract some key information from the file%>
+    """
+    for the OIMS_content_object to be tested get the identifier from OIMS_content_object
+    find the version of the underlying metadata schema in the array of compond objects [OIMS][OIMS_header][metadata_schema] where version is in
+    [OIMS][OIMS_header][metadata_schema][schema_properties][schema_version] and where [OIMS][OIMS_header][metadata_schema][OIMS_content_object] == OIMS_content_object
+    store this version id in a container OIMS_content_object_metadata_version
+    also store [OIMS][OIMS_header][metadata_schema][schema_properties][OIMS_content_object] in a container OIMS_content_object_metadata_OIMS_content_object
+
+    """
+    # # Extracting and storing metadata schema information
+    if not issues:
+        if not streaming:
+            oims_data_to_test = oims_document_to_test["OIMS"]
+            oims_header_to_test = oims_data_to_test["OIMS_header"]
 
         # Extract the OIMS_content_object identifier
-        oims_content_object = args.OIMS_content_object
+        oims_content_object = OIMS_content_object
 
         # Find the matching content object in the metadata schema array
         found = False
-        for content_object in oims_data_to_test["OIMS_header"]["metadata_schema"]:
+        for content_object in oims_header_to_test["metadata_schema"]:
             if content_object["OIMS_content_object"] == oims_content_object:
                 # Extract and store the version and other details of the metadata schema
                 for schema_property in content_object["schema_properties"]:
@@ -240,112 +415,110 @@ if not issues:
                     break
 
         if not found:
-            issues.append(f"Error: OIMS_content_object '{oims_content_object}' not found in the OIMS_header metadata_schema.")
+            issues.add('content_object_not_in_header', f"Error: OIMS_content_object '{oims_content_object}' not found in the OIMS_header metadata_schema.")
         elif not oims_content_object_metadata_version or not oims_content_object_metadata_OIMS_content_object:
-            issues.append(f"Error: Missing metadata version or OIMS_content_object in the OIMS schema for '{oims_content_object}'.")
+            issues.add('missing_schema_version', f"Error: Missing metadata version or OIMS_content_object in the OIMS schema for '{oims_content_object}'.")
 
-found = False
-if not issues:
     found = False
-    for content_object in oims_data_to_test["OIMS_content"]:
-        if content_object["OIMS_content_object"] == oims_content_object:
-            if found:
-                issues.append(f"Error: multiple instances of OIMS_content_object: {oims_content_object} found in metadata file to test.")
-                break
-            else:
-                for prop in content_object["OIMS_content_object_properties"]:
-                    if "metadata" in prop:
-                        oims_data_to_test_metadata = prop["metadata"]
-                        found = True
-                        break
-
+    # in streaming mode the content is searched while the records are checked (GTREE 4.2.2.2)
+    if not issues and not streaming:
+        found = False
+        for content_object in oims_data_to_test["OIMS_content"]:
+            if content_object["OIMS_content_object"] == oims_content_object:
+                if found:
+                    issues.add('duplicate_content_object', f"Error: multiple instances of OIMS_content_object: {oims_content_object} found in metadata file to test.")
+                    break
+                else:
+                    for prop in content_object["OIMS_content_object_properties"]:
+                        if "metadata" in prop:
+                            oims_data_to_test_metadata = prop["metadata"]
+                            found = True
+                            break
+        if not found:
+            issues.add('content_object_not_in_content', f"Error: OIMS_content_object '{oims_content_object}' not found in the OIMS_content section of the metadata file to test.")
 
-print("line 254")
 
-#*! <%GTREE 3.2 OIMS base self describing metadata %>#*! <%GTREE 3.1.1 test file existence%>
-#*! <%GTREE 3.2.1 test file existence%>
-"""
-File path is in args.OIMS_basic_path
-check if file exists if not return an error and append the error with key information to a list of issues
-"""
-# Check for the existence of the OIMS compatible metadata file
-if not file_exists(args.OIMS_basic_path):
-    print(f"Error: OIMS basic self-describing metadata file '{args.OIMS_basic_path}' does not exist.")
-    issues.append(f"Error: OIMS basic self-describing metadata file '{args.OIMS_basic_path}' does not exist.")
-#*! <%GTREE 3.2.2 test if OIMS compatible emtadata file at structure level%>
-else:
-    # Validate the OIMS structure of the file
-    validation_result = validate_oims_structure(args.OIMS_basic_path)
-    if validation_result != "OIMS file is valid.":
-        issues.append(validation_result)
-
-#*! <%GTREE 3.2.3 extract some key information from the file%>
-"""
-extract the version of the OIMS_basic.json file from [OIMS][OIMS_header][file_descriptors][metadata_version][current_version]
-warning if version is not in valid version list:
-    2.3.0.0
-    2.3.1.0
-    2.3.2.0
-    2.3.3.0
-    2.4.0.0
 
-"""
-print("line 282")
-# Valid versions list
-valid_versions = ["2.3.1.0", "2.3.2.0", "2.3.3.0","2.4.0.0"]
-obsolete_versions = ["2.3.0.0"]
-
-if not issues:
-     with open(args.OIMS_basic_path, 'r') as file:
-        oims_basic_data = json.load(file)["OIMS"]
-        current_version = oims_basic_data["OIMS_header"]["file_descriptors"]["metadata_version"]["current_version"]
-
-        # Check if the current version is in the valid versions list
-        if current_version in obsolete_versions:
-            warning_issues.append(f"Warning: The version '{current_version}' of the OIMS_basic.json file is in the list of obsolete versions.")
-        if current_version not in valid_versions:
-            issues.append(f"Warning: The version '{current_version}' of the OIMS_basic.json file is not in the list of valid versions.")
-
-#*! <%GTREE 3.3 underlying metametadata schema %>
-#*! <%GTREE 3.3.1 test file existence%>
-"""
-File path is in args.OIMS_content_object_schema_path
-check if file exists if not return an error and append the error with key information to a list of issues
-"""
-print("line 304")
-# Check for the existence of the content object schema file
-if not file_exists(args.OIMS_content_object_schema_path):
-    print(f"Error: OIMS content object schema file '{args.OIMS_content_object_schema_path}' does not exist.")
-    issues.append(f"Error: OIMS content object schema file '{args.OIMS_content_object_schema_path}' does not exist.")
-
-else:
-    #*! <%GTREE 3.3.2 test if OIMS compatible emtadata file at structure level%>
+    #*! <%GTREE 3.2 OIMS base self describing metadata %>#*! <%GTREE 3.1.1 test file existence%>
+    #*! <%GTREE 3.2.1 test file existence%>
     """
-    validate file for OIMS structure using the function  validate_oims_structure(file_path)
+    File path is in OIMS_basic_path
+    check if file exists if not return an error and append the error with key information to a list of issues
     """
-    # Validate the OIMS structure of the file
-    validation_result = validate_oims_structure(args.OIMS_content_object_schema_path)
-    if validation_result != "OIMS file is valid.":
-        issues.append(validation_result)
+    # Check for the existence of the OIMS compatible metadata file
+    if not file_exists(OIMS_basic_path):
+        print(f"Error: OIMS basic self-describing metadata file '{OIMS_basic_path}' does not exist.")
+        issues.add('file_not_found', f"Error: OIMS basic self-describing metadata file '{OIMS_basic_path}' does not exist.")
+    #*! <%GTREE 3.2.2 test if OIMS compatible emtadata file at structure level%>
+    else:
+        # Validate the OIMS structure of the file
+        validation_result = validate_oims_structure(OIMS_basic_path)
+        if validation_result != "OIMS file is valid.":
+            issues.add('invalid_structure', validation_result)
 
     #*! <%GTREE 3.2.3 extract some key information from the file%>
     """
-    extract the version of the OIMS_basic.json file from [OIMS][OIMS_header][file_descriptors][metadata_version][current_version] and test if equal to value of OIMS_content_object_metadata_version
-
-    check [OIMS][OIMS_content] for instances in the array of compound objects where "OIMS_content_object" == OIMS_content_object_metadata_OIMS_content_object. This requires iterating through the OIMS_content array.
+    extract the version of the OIMS_basic.json file from [OIMS][OIMS_header][file_descriptors][metadata_version][current_version]
+    warning if version is not in valid version list:
+        2.3.0.0
+        2.3.1.0
+        2.3.2.0
+        2.3.3.0
+        2.4.0.0
 
     """
-    # If the metametadata file is valid, proceed to extract information
-    if validation_result == "OIMS file is valid.":
-        with open(args.OIMS_content_object_schema_path, 'r') as file:
-            metametadata_data = json.load(file)["OIMS"]
+    # Valid versions list
+    valid_versions = ["2.3.1.0", "2.3.2.0", "2.3.3.0","2.4.0.0"]
+    obsolete_versions = ["2.3.0.0"]
+
+    if not issues:
+         oims_basic_data = document_cache.load(OIMS_basic_path)["OIMS"]
+         current_version = oims_basic_data["OIMS_header"]["file_descriptors"]["metadata_version"]["current_version"]
+
+         # Check if the current version is in the valid versions list
+         if current_version in obsolete_versions:
+             warning_issues.add('obsolete_version', f"Warning: The version '{current_version}' of the OIMS_basic.json file is in the list of obsolete versions.")
+         if current_version not in valid_versions:
+             issues.add('invalid_version', f"Warning: The version '{current_version}' of the OIMS_basic.json file is not in the list of valid versions.")
+
+    #*! <%GTREE 3.3 underlying metametadata schema %>
+    #*! <%GTREE 3.3.1 test file existence%>
+    """
+    File path is in OIMS_content_object_schema_path
+    check if file exists if not return an error and append the error with key information to a list of issues
+    """
+    # Check for the existence of the content object schema file
+    if not file_exists(OIMS_content_object_schema_path):
+        print(f"Error: OIMS content object schema file '{OIMS_content_object_schema_path}' does not exist.")
+        issues.add('file_not_found', f"Error: OIMS content object schema file '{OIMS_content_object_schema_path}' does not exist.")
+
+    else:
+        #*! <%GTREE 3.3.2 test if OIMS compatible emtadata file at structure level%>
+        """
+        validate file for OIMS structure using the function  validate_oims_structure(file_path)
+        """
+        # Validate the OIMS structure of the file
+        validation_result = validate_oims_structure(OIMS_content_object_schema_path)
+        if validation_result != "OIMS file is valid.":
+            issues.add('invalid_structure', validation_result)
+
+        #*! <%GTREE 3.2.3 extract some key information from the file%>
+        """
+        extract the version of the OIMS_basic.json file from [OIMS][OIMS_header][file_descriptors][metadata_version][current_version] and test if equal to value of OIMS_content_object_metadata_version
+
+        check [OIMS][OIMS_content] for instances in the array of compound objects where "OIMS_content_object" == OIMS_content_object_metadata_OIMS_content_object. This requires iterating through the OIMS_content array.
+
+        """
+        # If the metametadata file is valid, proceed to extract information
+        if validation_result == "OIMS file is valid.":
+            metametadata_data = document_cache.load(OIMS_content_object_schema_path)["OIMS"]
 
             # Extract current version from the file
             extracted_version = metametadata_data["OIMS_header"]["file_descriptors"]["metadata_version"]["current_version"]
 
             # Check if extracted version matches with OIMS_content_object_metadata_version
             if extracted_version != oims_content_object_metadata_version:
-                issues.append(f"Error: Metametadata file version mismatch. Extracted version {extracted_version} does not match version in the metadata schema defined in the header ofv the OIMS compatible metadata file that is tested  {oims_content_object_metadata_version}.")
+                issues.add('version_mismatch', f"Error: Metametadata file version mismatch. Extracted version {extracted_version} does not match version in the metadata schema defined in the header ofv the OIMS compatible metadata file that is tested  {oims_content_object_metadata_version}.")
 
             found = False
             for content_object in metametadata_data["OIMS_content"]:
@@ -356,170 +529,152 @@ else:
                             metametadata = prop["metadata"]
                         break
 
-        if not found:
-            issues.append(f"Error: the OIMS_content_object '{oims_content_object_metadata_OIMS_content_object}' not found in the OIMS_content section of the metametadata file.")
-
-
-print("line 352")
-
-
-
-#*! <%GTREE 4 test schema%>
-#*! <%GTREE 4.1 test header%>
-"""
-Use the metadata contents of OIMS base self describing metadata schema in the instance in the array of compound objects [OIMS][OIMS_content] where "OIMS_content_object" == "OIMS_Header_Metadata"
-the metadata_contents are found in [OIMS][OIMS_content][metadata]
-check the consistency of the OIMS_header section of the file we are testing [in args.OIMS_content_object_schema_path] with the information from the self-describing metadata schema.
-
-for each check if not valid return an error and append the error or warning with key information to a list of issues
-"""
-#*! <%GTREE 4.2 test contents%>
-"""
-In the underlying metametadata schema the metadata attributes that we can find the file that is being tested in the following way:
-[OIMS][OIMS_content][metadata] is an array of compound_objects that have at least the following attributes
-                                "attribute_name": "<name of the metadata attribute",
-                                "attribute_description": "description of the metadata attribute",
-                                "data_type": "the data type of the metadata attribute",
-                                "requirement_level": element from a contyrolled environment,
-                                "data_type_class": "primitive" or "compound",
-                                "multiple": true or false
-for each metadata element in the OIMS_contents section of the file that is being tested where "OIMS_content_object" == args.OIMS_content_object that corresponds to a value of "attribute_name" in the underlyinh schema
-"""
-#*! <%GTREE 4.2.1 test preparetory checks%>
-#*! <%GTREE 4.2.1.1.1 get standard valid OIMS data types from  OIMS_to_python_type_mapping%>
-"""
-To ensure that the data_type specified in each attribute of your metametadata is a valid OIMS data type, you can perform a check against the keys of your OIMS_to_python_type_mapping dictionary.
-This will validate that each data_type is one of the recognized OIMS data types.
-"""
-valid_oims_types = OIMS_to_python_type_mapping.keys()
-
-#*! <%GTREE 4.2.1.1.2 Iterate over attributes in metametadata and check if valid standard OIMS metadata%>
-
-def test_datatypemapping(mapping_id, metametadata, valid_oims_types):
-    require_data_type_mapping = False
-    warnings = []
-    invalid_types = set()
-
-    # Iterate over attributes in metametadata
-    for attribute in metametadata:
-        oims_type = attribute.get("data_type")
+            if not found:
+                issues.add('content_object_not_in_metametadata', f"Error: the OIMS_content_object '{oims_content_object_metadata_OIMS_content_object}' not found in the OIMS_content section of the metametadata file.")
 
-        # Check if the data_type is a valid OIMS type
-        if oims_type not in valid_oims_types:
-            warnings.append(f"Invalid OIMS data type '{oims_type}' in metametadata for attribute '{attribute['attribute_name']}' using {mapping_id}.")
-            invalid_types.add(oims_type)
-            require_data_type_mapping = True
 
-    return require_data_type_mapping, warnings, invalid_types
 
-require_data_type_mapping, warnings, invalid_types = test_datatypemapping("OIMS standard mapping", metametadata, valid_oims_types)
-warning_issues.extend(warnings)
 
 
-#*! <%GTREE 4.2.1.1.3 if external mapping is required make sure it is loaded%>
-if require_data_type_mapping:
-    # Check for the existence of the external data type mapping file
-    if not file_exists(args.OIMS_to_python_type_mapping_path):
-        issues.append(f"Error: External data type mapping file '{args.OIMS_to_python_type_mapping_path}' does not exist.")
-    #*! <%GTREE 3.1.2 test if OIMS compatible emtadata file at structure level%>
-    else:
-        with open(args.args.OIMS_to_python_type_mapping_path, 'r') as file:
-            OIMS_to_python_type_mapping = json.load(file)
-            valid_oims_types = OIMS_to_python_type_mapping.keys()
-
-        # Re-check with the external mapping
-        require_data_type_mapping, new_warnings, new_invalid_types = test_datatypemapping("provided data type mapping", metametadata, valid_oims_types)
-        warning_issues.extend(new_warnings)
-
-        #*! <%GTREE 4.2.1.1.4 the data check %>
-        if require_data_type_mapping:
-            issues.append(f"Invalid OIMS data types found in file to be tested, see warnings for details.")
-
-print("line 427")
-#*! <%GTREE 4.2.2 actual test%>
-if not issues:
-    # Iterate over key-value pairs in oims_data_to_test_metadata
-    for compound_object in oims_data_to_test_metadata:
-        # Iterate over key-value pairs in each compound object
-        for key, value in compound_object.items():
-            # 'key' is the attribute name in the compound object
-            # 'value' is the value of that attribute
-            found = False
+    #*! <%GTREE 4 test schema%>
+    #*! <%GTREE 4.1 test header%>
+    """
+    Use the metadata contents of OIMS base self describing metadata schema in the instance in the array of compound objects [OIMS][OIMS_content] where "OIMS_content_object" == "OIMS_Header_Metadata"
+    the metadata_contents are found in [OIMS][OIMS_content][metadata]
+    check the consistency of the OIMS_header section of the file we are testing [in OIMS_content_object_schema_path] with the information from the self-describing metadata schema.
 
+    for each check if not valid return an error and append the error or warning with key information to a list of issues
+    """
+    #*! <%GTREE 4.2 test contents%>
+    """
+    In the underlying metametadata schema the metadata attributes that we can find the file that is being tested in the following way:
+    [OIMS][OIMS_content][metadata] is an array of compound_objects that have at least the following attributes
+                                    "attribute_name": "<name of the metadata attribute",
+                                    "attribute_description": "description of the metadata attribute",
+                                    "data_type": "the data type of the metadata attribute",
+                                    "requirement_level": element from a contyrolled environment,
+                                    "data_type_class": "primitive" or "compound",
+                                    "multiple": true or false
+    for each metadata element in the OIMS_contents section of the file that is being tested where "OIMS_content_object" == OIMS_content_object that corresponds to a value of "attribute_name" in the underlyinh schema
+    """
+    #*! <%GTREE 4.2.1 test preparetory checks%>
+    #*! <%GTREE 4.2.1.1.1 get standard valid OIMS data types from  OIMS_to_python_type_mapping%>
+    """
+    To ensure that the data_type specified in each attribute of your metametadata is a valid OIMS data type, you can perform a check against the keys of your OIMS_to_python_type_mapping dictionary.
+    This will validate that each data_type is one of the recognized OIMS data types.
+    """
+    valid_oims_types = type_mapping.keys()
+
+    #*! <%GTREE 4.2.1.1.2 Iterate over attributes in metametadata and check if valid standard OIMS metadata%>
+
+    require_data_type_mapping, warnings, invalid_types = test_datatypemapping("OIMS standard mapping", metametadata, valid_oims_types)
+    for warning in warnings:
+        warning_issues.add('invalid_data_type', warning)
+
+
+    #*! <%GTREE 4.2.1.1.3 if external mapping is required make sure it is loaded%>
+    if require_data_type_mapping:
+        # Check for the existence of the external data type mapping file
+        if not OIMS_to_python_type_mapping_path or not file_exists(OIMS_to_python_type_mapping_path):
+            issues.add('file_not_found', f"Error: External data type mapping file '{OIMS_to_python_type_mapping_path}' does not exist.")
+        #*! <%GTREE 3.1.2 test if OIMS compatible emtadata file at structure level%>
+        else:
+            type_mapping = document_cache.load(OIMS_to_python_type_mapping_path)
+            valid_oims_types = type_mapping.keys()
+
+            # Re-check with the external mapping
+            require_data_type_mapping, new_warnings, new_invalid_types = test_datatypemapping("provided data type mapping", metametadata, valid_oims_types)
+            for warning in new_warnings:
+                warning_issues.add('invalid_data_type', warning)
+
+            #*! <%GTREE 4.2.1.1.4 the data check %>
+            if require_data_type_mapping:
+                issues.add('invalid_data_types', f"Invalid OIMS data types found in file to be tested, see warnings for details.")
+
+    #*! <%GTREE 4.2.2 actual test%>
+    if not issues:
+        #*! <%GTREE 4.2.2.1 index the metametadata by attribute name and the tested records by field name%>
+        """
+        Both indexes are built once, so every field lookup and every required-field check is a dictionary
+        or set lookup instead of a scan over all attributes or all records.
+        """
+        metametadata_index = {}
         for meta_attribute in metametadata:
-            if meta_attribute["attribute_name"] == key:
-                found = True
-                expected_data_type = meta_attribute["data_type"]
-                python_types = OIMS_to_python_type_mapping.get(expected_data_type, [])
-
-                """
-                1.  what is the data type of metadata_field_value?
-                    is that compatible with the data type identifier in attributes["atrribute_name"]?
-                """
-                """
-                2.  if  attributes["multiple"] is true then metadata_field_value is an array
-                """
-                # Check if 'multiple' is true and value is a list
-                if meta_attribute["multiple"]:
-                    if not isinstance(value, list):
-                        issues.append(f"Error: '{key}' should be an array as per metametadata.")
-                    else:
-                        # Check the data type of each element in the list
-                        for item in value:
-                            if type(item).__name__ not in python_types:
-                                issues.append(f"Data type mismatch in array '{key}': Expected element of type {python_types}, found {type(item).__name__}.")
-                        """
-                        3.  if "data_type_class":"primitive" then the value is a simple value if "data_type_class":"compound" then the value is a compound object
-                        """
-                        if meta_attribute ["data_type_class"] == "compound" and not isinstance(item, dict):
-                            issues.append(f"Error: '{key}' should be a compound object as per metametadata.")
-                        elif meta_attribute ["data_type_class"] == "primitive" and isinstance(item, dict):
-                            issues.append(f"Error: '{key}' should be a primitive value as per metametadata.")
-                else:
-                    # For non-array values, check the data type directly
-                    if type(value).__name__ not in python_types:
-                        issues.append(f"Data type mismatch for '{key}': Expected {python_types}, found {type(value).__name__}.")
-
-                    """
-                    3.  if "data_type_class":"primitive" then the value is a simple value if "data_type_class":"compound" then the value is a compound object
-                    """
-                    if meta_attribute ["data_type_class"] == "compound" and not isinstance(value, dict):
-                        issues.append(f"Error: '{key}' should be a compound object as per metametadata.")
-                    elif meta_attribute ["data_type_class"] == "primitive" and isinstance(value, dict):
-                        issues.append(f"Error: '{key}' should be a primitive value as per metametadata.")
+            # the first definition of an attribute wins, as in a linear search
+            metametadata_index.setdefault(meta_attribute["attribute_name"], meta_attribute)
+
+        present_fields = set()
+
+        #*! <%GTREE 4.2.2.2 check each field of each record against its metametadata%>
+        """
+        Every occurrence is added to the aggregator with its location as example; the same problem in other
+        records or array elements only increments the count of the issue.
+        """
+        if not streaming:
+            for compound_object in oims_data_to_test_metadata:
+                present_fields.update(compound_object.keys())
+            for record_number, compound_object in enumerate(oims_data_to_test_metadata):
+                check_metadata_record(record_number, compound_object, metametadata_index, type_mapping, issues)
+        else:
+            """
+            Only the records of the first metadata list of the first instance of the content object are
+            checked, as in the in-memory search above; each record is discarded once it is checked.
+            """
+            checked_list = None
+            instances = 0
+            try:
+                for event, location, value in iter_oims_events(schema_to_test_path):
+                    if event == 'record' and location[1] == oims_content_object:
+                        if checked_list is None:
+                            checked_list = location[:3]
+                        if location[:3] == checked_list and isinstance(value, dict):
+                            present_fields.update(value.keys())
+                            check_metadata_record(location[3], value, metametadata_index, type_mapping, issues)
+                    elif event == 'content_item' and isinstance(value, dict) and value.get("OIMS_content_object") == oims_content_object:
+                        instances += 1
+                        if instances == 1 and not any(isinstance(prop, dict) and "metadata" in prop
+                                                      for prop in value.get("OIMS_content_object_properties", [])):
+                            instances = 0
+            except json.JSONDecodeError:
+                issues.add('invalid_structure', "Invalid file: File is not a valid JSON.")
+            if instances > 1:
+                issues.add('duplicate_content_object', f"Error: multiple instances of OIMS_content_object: {oims_content_object} found in metadata file to test.")
+            elif instances == 0:
+                issues.add('content_object_not_in_content', f"Error: OIMS_content_object '{oims_content_object}' not found in the OIMS_content section of the metadata file to test.")
+
+        #*! <%GTREE 4.2.2.3 check that required fields are present%>
+        for meta_attribute  in metametadata:
+            # For each element in the underlying metadata schema where "requirement_level":"required" the metadata attribute identified in "attribute_name" should be checked in the relevant metadata section in file hat is tested if it is present and has a value
+            if (meta_attribute ["requirement_level"] == "required") :
+                required_field = meta_attribute["attribute_name"]
+                if required_field not in present_fields:
+                    issues.add('required_field_missing', f"Error: Required metadata field '{required_field}' not found in file: {schema_to_test_path}.")
+
+    return issues, warning_issues
 
-                break  # Exit loop as the field is found
-
-        if not found:
-            issues.append(f"Error: Metadata field '{key}' not found in metametadata.")
-    for meta_attribute  in metametadata:
-        # For each element in the underlying metadata schema where "requirement_level":"required" the metadata attribute identified in "attribute_name" should be checked in the relevant metadata section in file hat is tested if it is present and has a value
-        if (meta_attribute ["requirement_level"] == "required") :
-            required_field = meta_attribute["attribute_name"]
-            if not any(required_field in compound_object for compound_object in oims_data_to_test_metadata):
-                issues.append(f"Error: Required metadata field '{required_field}' not found in file: {args.schema_to_test_path}.")
-
-print("line 491")
 #*! <%GTREE 5 write report%>
-"""
-Generate a report in pdf format from the warnings list and the issues list.
-1. combine the two list with clear demarcation between warnings (warning_issue) and fatal errors (issues).
-2. export to pdf
-"""
-combined_report = []
-
-# Add warnings to the combined report
-if warning_issues:
-    combined_report.append("Warnings:")
-    combined_report.extend(warning_issues)
-    combined_report.append("\n")  # Add a newline for separation
-
-# Add issues to the combined report
-if issues:
-    combined_report.append("Fatal issues:")
-    combined_report.extend(issues)
-
-path_to_output_file = os.path.splitext(args.schema_to_test_path)[0] +  "_OIMS_test_Report.pdf"
-generate_pdf(combined_report,path_to_output_file)
-print("line 513")
+def write_report(issues, warning_issues, schema_to_test_path, report_format=OIMS_report_backends.default_report_format):
+    """
+    Generate a report from the warnings and the issues aggregators, with clear demarcation between
+    warnings (warning_issues) and fatal errors (issues), in the format chosen (see OIMS_report_backends.py).
+    Each distinct issue is reported once with its number of occurrences.
+    Returns the path of the report, or None for the format 'none'.
+    """
+    path_to_output_file_base = os.path.splitext(schema_to_test_path)[0] +  "_OIMS_test_Report"
+    return OIMS_report_backends.write_report(issues.iter_report_messages(), report_format, path_to_output_file_base,
+                                             "OIMS consistency test report", f"File tested: {schema_to_test_path}",
+                                             warnings=warning_issues.iter_report_messages())
+
+#*! <%GTREE 6 main definition%>
+def main():
+    args = local_commandlineparser()
+    issues, warning_issues = check_oims_consistency(args.schema_to_test_path, args.OIMS_basic_path, args.OIMS_content_object,
+                                                    args.OIMS_content_object_schema_path, args.OIMS_to_python_type_mapping_path,
+                                                    args.streaming)
+    write_report(issues, warning_issues, args.schema_to_test_path, args.report_format)
+    sys.exit(1 if issues else 0)
+
+if __name__ == "__main__":
+    main()
+
 #*============================   End Of File   ================================
\ No newline at end of file
@@ -2,7 +2,7 @@
 #=============================================================================
 # File      : OIMS_schema_consistency_test_simple.py
 # Author    : Gideon Kruseman <g.kruseman@cgiar.org>
-__version__ = "1.1.0"
+__version__ = "1.1.1"
 # Date      : 10/23/2023 9:27:16 AM
 # Changed   : 12/05/2023 3:27:27 PM
 # Changed by: Gideon Kruseman <g.kruseman@cgiar.org>
@@ -38,6 +38,18 @@ OIMS_structure_schema_path     :  Path to the OIMS structure JSON schema file
                                       [optional, default is the schema of the foresight initiative]
 schema_path                    :  Path to the underlying JSON schema file
 schema_name                    :  Name of the schema for reporting purposes
+validator_cache_dir            :  [optional] directory recording schemas that passed the meta-schema check
+schema_cache_dir               :  [optional] directory of the on-disk schema cache, default is ~/.OIMS_cache/schemas
+schema_cache_ttl               :  [optional] seconds before a cached schema is revalidated, default is one day
+offline                        :  [optional] flag: only use cached schemas, never access the network
+report_format                  :  [optional] pdf, text, json, junit or none, default is pdf
+
+*! <%GTREE 0.3.2 batch mode command line paremers%>
+batch_inputs                   :  directories, globs or files with metadata files to test (replaces metadata_file_to_test_path)
+batch_manifest                 :  text file with one metadata file path or glob per line
+workers                        :  number of worker processes [optional, default is the number of cores]
+batch_report_dir               :  directory for the combined report and per_file_results.jsonl
+                                      [optional, default is OIMS_batch_reports]
 
 
 *! <%GTREE 0.4  description of the script%>
@@ -55,7 +67,7 @@ the integrity and standardization of metadata in systems or projects utilizing O
 *! <%GTREE 0.4.1  initialization (GTREE 1)%>
 Import Libraries (GTREE 1.1): The script begins by importing necessary libraries. json for handling JSON
 data, jsonschema for validating JSON against a schema, argparse for parsing command-line arguments, and
-reportlab modules for generating PDF reports.
+the report backends of OIMS_report_backends.py. reportlab is only imported when a PDF report is written.
 Import standard url locations of underlying files
 
 *! <%GTREE 0.4.2 Function Definitions (GTREE 2)%>
@@ -64,36 +76,47 @@ A function load_json_file is defined to read JSON data from a specified file pat
 errors like file not found or JSON parsing issues.
 
 Loading JSON files from URL (GTREE 2.2):
-A function load_json_url is defined to read JSON data from a specified url. It handles potential
-errors like file not found or JSON parsing issues.
+A function load_json_github is defined to read JSON data from a specified url. It reads through the
+on-disk schema cache of OIMS_schema_cache.py, so repeated runs do not download the schema again.
+It handles potential errors like file not found or JSON parsing issues.
 
 Validating JSON Data (GTREE 2.3):
 The validate_against_schema function is responsible for checking if the JSON data conforms to a given schema.
-It reports validation success or details any errors encountered.
+It reports validation success or details any errors encountered. Compiled validators are taken from the shared
+registry in OIMS_validator_registry.py, so a schema is only checked and compiled once per process.
 
-Generating PDF Report (GTREE 2.4):
-The generate_pdf_report function creates a PDF document. This document lists all messages (errors or success)
-generated during the validation process.
+Generating the Report (GTREE 2.4):
+The generate_report function writes the report in the format chosen with --report_format: pdf (default), text,
+json, junit or none. The report lists all messages (errors or success) generated during the validation process.
 
 *! <%GTREE 0.4.3 Main Function Definition (GTREE 3)%>
 Parsing Command Line Arguments (GTREE 3.1):
 The main function starts by setting up a parser for command-line arguments to receive file paths and schema
 names.
 
-Error Container (GTREE 3.2):
+Batch Mode (GTREE 3.2):
+When batch inputs or a manifest are given, the schemas are loaded once and the metadata files are validated on
+a pool of worker processes (GTREE 2.6). Each worker receives the schemas and the settings of the validator
+registry and the schema cache once at start-up, so they also hold when workers are started with spawn, and
+compiles the validators before the first file. An unexpected error in one file is reported as the result of
+that file and does not stop the batch. Per-file results are written as JSON Lines and one combined PDF report
+is generated.
+
+Error Container (GTREE 3.3):
 An empty list is created to store any errors encountered during the script execution.
 
-Loading Metadata and Schemas (GTREE 3.3):
+Loading Metadata and Schemas (GTREE 3.4):
 The script loads the OIMS metadata, the OIMS structure schema, and the specific JSON schema, recording any
 errors in the process.
 
-Validating Metadata Against Schemas (GTREE 3.4):
+Validating Metadata Against Schemas (GTREE 3.5):
 Provided there are no loading errors, it proceeds to validate the metadata against the loaded schemas.
 Validation failures are added to the error list.
 
-Error Handling and Report Generation (GTREE 3.5):
-The script checks for errors. If found, they are printed and compiled into a PDF report. If no errors are
-found, a success message is printed and included in the PDF report.
+Error Handling and Report Generation (GTREE 3.6):
+The script checks for errors. If found, they are printed and compiled into the report. If no errors are
+found, a success message is printed and included in the report. The exit code is 1 when errors were found
+and 0 otherwise, so CI can use --report_format none and rely on the exit code alone.
 
 *! <%GTREE 0.4.4 Execution (GTREE 4)%>
 Run Tests:
@@ -113,23 +136,25 @@ GTREE is used for tagging sections of the code and create an easily manageable t
 #*! <%GTREE 1 initialization%>
 #*! <%GTREE 1.1 import libraries%>
 import json
-import requests
 import io
 import jsonschema
 import argparse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
+import os
+import sys
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from OIMS_validator_registry import validator_registry
+from OIMS_schema_cache import schema_cache
+import OIMS_json_io
+from OIMS_report_backends import write_report, report_formats, default_report_format
 
 
 #*! <%GTREE 1.2 define standard file locations in the Foresight Initiative GitHub Repository%>
 oims_structure_url = 'https://raw.githubusercontent.com/ForesightInitiative/OIMS/main/BasicSchemas/OIMS_structure.schema.json'
 logo_url = 'https://raw.githubusercontent.com/ForesightInitiative/OIMS/main/CGIAR%20Initiative%20-%20Foresight%20and%20Metrics-03.jpg'
 logo_path = "foresight_logo.png"
-#*! <%GTREE 1.3 boiler text for reporting purposes%>
+#*! <%GTREE 1.3 title and boiler text for reporting purposes%>
+report_title = "OIMS Schema Validation Report"
 boiler_text_report = "This report is generated by the OIMS schema validation tool. OIMS stands for Open Ontology-Based Interoperable Information Asset Metadata Schema. The Python script OIMS_schema_consistency_test_simple.py uses the JSON Schema approach to validate if metadata files are OIMS-compatible amnd meet the requirements of the underlying schema."
 
 #*! <%GTREE 2 function definitions%>
@@ -138,27 +163,22 @@ boiler_text_report = "This report is generated by the OIMS schema validation too
 def load_json_file(file_path):
     """Load and return the JSON data from a file, handling potential errors."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file), None
+        return OIMS_json_io.load_json_file(file_path), None
     except FileNotFoundError:
         return None, f"File not found: {file_path}. Please check the file path."
     except json.JSONDecodeError as e:
         return None, f"Error parsing JSON file {file_path}: {e}"
 
-#*! <%GTREE 2.2 function to load json files from GitHub%>
+#*! <%GTREE 2.2 function to load json files from GitHub through the schema cache%>
 def load_json_github(url):
-    response = requests.get(url)
-    # Check if the request was successful
-    if response.status_code == 200:
-        return response.json(), None  # This will directly parse the JSON content
-    else:
-        return None, f"Failed to retrieve data from {url}"
+    """Load JSON from a URL through the on-disk schema cache, returning the data and an error message."""
+    return schema_cache.get(url)
 
 #*! <%GTREE 2.3 function to validate a json file against a json schema%>
 def validate_against_schema(data, schema, schema_name):
     """Validate data against a provided schema, returning status and message."""
     try:
-        jsonschema.validate(data, schema)
+        validator_registry.validate(data, schema)
         return True, "JSON data is valid against the {}.".format(schema_name)
     except jsonschema.exceptions.ValidationError as e:
         error_details = {
@@ -173,64 +193,152 @@ def validate_against_schema(data, schema, schema_name):
         return False, "Error in the schema itself: {}".format(e)
 
 
-#*! <%GTREE 2.4 function to generate a pdf report with provided messages%>
-def generate_pdf_report(messages, logo_url, boiler_text, filename="OIMS_validation_report.pdf", logo_path=logo_path):
-    """Generate a PDF report with the provided messages."""
-    doc = SimpleDocTemplate(filename, pagesize=letter)
-    story = []
-
-    """
-    # Add the logo
-
-    # download and add a logo
-    try:
-        logo_image = ImageReader(logo_url)
-        logo = Image(logo_image, 2*inch, inch)  # Adjust size as needed
-        story.append(logo)
-    except Exception as e:
-        logo_size = 50
-        logo = Image(logo_path, 72*inch, inch)
-        print(f"Failed to retrieve logo from {logo_url}: {e}")
-    """
+#*! <%GTREE 2.4 function to write the validation report in the chosen format%>
+def generate_report(errors, report_format=default_report_format, file_path_base="OIMS_validation_report", boiler_text=boiler_text_report):
+    """Write the validation report in the chosen format (see OIMS_report_backends.py) and return its path."""
+    return write_report(errors, report_format, file_path_base, report_title, boiler_text)
 
-    # Add the report title
-    story.append(Paragraph("OIMS Schema Validation Report", styles['Title']))
+#*! <%GTREE 2.5 functions shared by single file and batch mode%>
+#*! <%GTREE 2.5.1 function to load the OIMS structure schema and the underlying schema%>
+def load_validation_schemas(oims_structure_schema_path, schema_path):
+    """Load the high-level OIMS structure schema and the underlying schema, returning both and a list of errors."""
+    errors = []
+    if oims_structure_schema_path == 'GitHub_foresight_initiative_OIMS':
+        oims_structure_schema, err = load_json_github(oims_structure_url)
+    else:
+        oims_structure_schema, err = load_json_file(oims_structure_schema_path)
+    if err: errors.append(err)
 
-    # Add a spacer
-    story.append(Spacer(1, 0.2*inch))
+    schema, err = load_json_file(schema_path)
+    if err: errors.append(err)
+    return oims_structure_schema, schema, errors
 
-    # Boilerplate text
-    styles = getSampleStyleSheet()
-    boiler_paragraph = Paragraph(boiler_text, styles['Normal'])
-    story.append(boiler_paragraph)
+#*! <%GTREE 2.5.2 function to validate loaded metadata against both schemas%>
+def validate_metadata(oims_metadata, oims_structure_schema, schema, schema_name):
+    """Validate OIMS metadata against the structure schema and the underlying schema, returning a list of errors."""
+    errors = []
+    valid, msg = validate_against_schema(oims_metadata, oims_structure_schema, "high-level OIMS structure schema")
+    if not valid: errors.append(msg)
 
-    # Add a spacer
-    story.append(Spacer(1, 0.2*inch))
+    valid, msg = validate_against_schema(oims_metadata, schema, schema_name)
+    if not valid: errors.append(msg)
+    return errors
 
-    # Add messages
-    for message in messages:
-        message_paragraph = Paragraph(message, styles['Normal'])
-        story.append(message_paragraph)
-        story.append(Spacer(1, 0.1*inch))
+#*! <%GTREE 2.6 batch mode%>
+#*! <%GTREE 2.6.1 function to collect the metadata files of a batch%>
+def collect_batch_files(batch_inputs=None, batch_manifest=None):
+    """Return the sorted, de-duplicated list of metadata files given by directories, globs, files and a manifest.
 
-    # Add a spacer
-    story.append(Spacer(1, 0.2*inch))
+    Directories are searched recursively for *.json files; generated *.schema.json files are skipped.
+    The manifest is a text file with one path or glob per line; empty lines and lines starting with # are ignored.
+    """
+    patterns = list(batch_inputs or [])
+    if batch_manifest:
+        with open(batch_manifest, 'r', encoding='utf-8') as manifest:
+            patterns.extend(line.strip() for line in manifest if line.strip() and not line.lstrip().startswith('#'))
+
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = glob.glob(os.path.join(pattern, '**', '*.json'), recursive=True)
+        elif os.path.isfile(pattern):
+            candidates = [pattern]
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        for candidate in candidates:
+            if os.path.isfile(candidate) and not candidate.endswith('.schema.json'):
+                files.add(os.path.normpath(candidate))
+    return sorted(files)
+
+#*! <%GTREE 2.6.2 worker state: schemas and settings are sent once per worker, not once per file%>
+_batch_worker_state = {}
+
+def batch_worker_settings():
+    """Return the settings of the validator registry and the schema cache to apply in the workers."""
+    return {
+        'checked_schema_dir': validator_registry.checked_schema_dir,
+        'schema_cache_dir': schema_cache.cache_dir,
+        'schema_cache_ttl': schema_cache.ttl,
+        'offline': schema_cache.offline,
+    }
+
+def _init_batch_worker(oims_structure_schema, schema, schema_name, settings=None):
+    if settings is not None:
+        # workers started with spawn do not inherit the settings made in main()
+        validator_registry.checked_schema_dir = settings['checked_schema_dir']
+        schema_cache.cache_dir = settings['schema_cache_dir']
+        schema_cache.ttl = settings['schema_cache_ttl']
+        schema_cache.offline = settings['offline']
+    _batch_worker_state['oims_structure_schema'] = oims_structure_schema
+    _batch_worker_state['schema'] = schema
+    _batch_worker_state['schema_name'] = schema_name
+    # compile both validators before the first file arrives; schema errors are reported per file
+    for loaded_schema in (oims_structure_schema, schema):
+        try:
+            validator_registry.get_validator(loaded_schema)
+        except jsonschema.exceptions.SchemaError:
+            pass
+
+def _validate_batch_file(file_path):
+    try:
+        oims_metadata, err = load_json_file(file_path)
+        if err:
+            errors = [err]
+        else:
+            errors = validate_metadata(oims_metadata,
+                                       _batch_worker_state['oims_structure_schema'],
+                                       _batch_worker_state['schema'],
+                                       _batch_worker_state['schema_name'])
+    except Exception as e:
+        # e.g. UnicodeDecodeError or PermissionError; the results of the other files are kept
+        errors = [f"Error validating {file_path}: {e!r}"]
+    return {'file': file_path, 'valid': not errors, 'errors': errors}
 
-    # Add messages
-    for message in messages:
-        message_paragraph = Paragraph(message, styles['Normal'])
-        story.append(message_paragraph)
-        story.append(Spacer(1, 0.1*inch))
+#*! <%GTREE 2.6.3 function to validate a batch of files on a pool of worker processes%>
+def run_batch(files, oims_structure_schema, schema, schema_name, workers=None, report_dir="OIMS_batch_reports",
+              report_format=default_report_format):
+    """Validate all files, write per-file results and one combined report, and return the list of results.
 
-    # Build the PDF
-    doc.build(story)
+    Per-file results are written as JSON Lines to <report_dir>/per_file_results.jsonl and the combined
+    report to <report_dir>/OIMS_batch_validation_report.<extension of the report format>.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(report_dir, exist_ok=True)
+
+    results = []
+    with open(os.path.join(report_dir, "per_file_results.jsonl"), 'w', encoding='utf-8') as results_file:
+        if workers == 1 or len(files) < 2:
+            _init_batch_worker(oims_structure_schema, schema, schema_name, batch_worker_settings())
+            result_iterator = map(_validate_batch_file, files)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           initializer=_init_batch_worker,
+                                           initargs=(oims_structure_schema, schema, schema_name,
+                                                     batch_worker_settings()))
+            chunksize = max(1, len(files) // (workers * 4))
+            result_iterator = executor.map(_validate_batch_file, files, chunksize=chunksize)
+        try:
+            for result in result_iterator:
+                results_file.write(json.dumps(result) + "\n")
+                results.append(result)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    failed = [result for result in results if not result['valid']]
+    summary = (f"Batch validation against the {schema_name}: {len(results)} files checked, "
+               f"{len(results) - len(failed)} valid, {len(failed)} with errors.")
+    errors = [f"{result['file']}: {error}" for result in failed for error in result['errors']]
+    generate_report(errors, report_format, os.path.join(report_dir, "OIMS_batch_validation_report"),
+                    boiler_text=f"{boiler_text_report} {summary}")
+    return results
 
 #*! <%GTREE 3 main definition%>
 def main():
 #*! <%GTREE 3.1 Check command line arguments for settings file path%>
     parser = argparse.ArgumentParser(description='Script to validate OIMS-compatible metadata schemas.')
     parser.add_argument('--metadata_file_to_test_path',
-                        required=True,
                         help='Absolute or relative path to the OIMS metadata JSON file to be tested. Example: /path/to/metadata.json.')
     parser.add_argument('--OIMS_structure_schema_path',
                         default='GitHub_foresight_initiative_OIMS',
@@ -241,46 +349,79 @@ def main():
     parser.add_argument('--schema_name',
                         required=True,
                         help='Name of the schema for reporting purposes.')
+    parser.add_argument('--validator_cache_dir',
+                        help='Optional directory to record schemas that passed the meta-schema check, so later runs skip that check.')
+    parser.add_argument('--schema_cache_dir',
+                        help='Directory of the on-disk schema cache (default is ~/.OIMS_cache/schemas).')
+    parser.add_argument('--schema_cache_ttl',
+                        type=int,
+                        help='Seconds before a cached schema is revalidated (default is one day).')
+    parser.add_argument('--offline',
+                        action='store_true',
+                        help='Only use cached schemas, never access the network.')
+    parser.add_argument('--batch_inputs',
+                        nargs='+',
+                        help='Batch mode: directories, globs or files with OIMS metadata JSON files to be tested.')
+    parser.add_argument('--batch_manifest',
+                        help='Batch mode: text file listing one metadata file path or glob per line.')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='Batch mode: number of worker processes (default is the number of cores).')
+    parser.add_argument('--batch_report_dir',
+                        default='OIMS_batch_reports',
+                        help='Batch mode: directory for the combined report and the per-file results.')
+    parser.add_argument('--report_format',
+                        choices=report_formats,
+                        default=default_report_format,
+                        help='Format of the report: pdf, text, json, junit or none (default is pdf).')
 
     args = parser.parse_args()
-
-    #*! <%GTREE 3.2 create container list for errors%>
+    validator_registry.checked_schema_dir = args.validator_cache_dir
+    if args.schema_cache_dir: schema_cache.cache_dir = args.schema_cache_dir
+    if args.schema_cache_ttl is not None: schema_cache.ttl = args.schema_cache_ttl
+    schema_cache.offline = args.offline
+    batch_mode = bool(args.batch_inputs or args.batch_manifest)
+    if not batch_mode and not args.metadata_file_to_test_path:
+        parser.error("either --metadata_file_to_test_path or --batch_inputs/--batch_manifest is required")
+
+    #*! <%GTREE 3.2 batch mode%>
+    if batch_mode:
+        oims_structure_schema, schema, errors = load_validation_schemas(args.OIMS_structure_schema_path, args.schema_path)
+        if errors:
+            print("\n".join(errors))
+            generate_report(errors, args.report_format)
+            sys.exit(1)
+        files = collect_batch_files(args.batch_inputs, args.batch_manifest)
+        results = run_batch(files, oims_structure_schema, schema, args.schema_name, args.workers, args.batch_report_dir,
+                            args.report_format)
+        failed = sum(1 for result in results if not result['valid'])
+        print(f"{len(results)} files checked, {failed} with errors. Reports written to '{args.batch_report_dir}'.")
+        sys.exit(1 if failed else 0)
+
+    #*! <%GTREE 3.3 create container list for errors%>
     errors = []
 
-    #*! <%GTREE 3.3 load metadata and schemas%>
-    #*! <%GTREE 3.3.1 load oims metadata file to be validated%>
+    #*! <%GTREE 3.4 load metadata and schemas%>
+    #*! <%GTREE 3.4.1 load oims metadata file to be validated%>
     oims_metadata, err = load_json_file(args.metadata_file_to_test_path)
     if err: errors.append(err)
 
-    #*! <%GTREE 3.3.2 load high-level OIMS structure JSON Schema validator file%>
-    if args.OIMS_structure_schema_path == 'GitHub_foresight_initiative_OIMS':
-        oims_structure_schema, err = load_json_github(oims_structure_url)
-        if err: errors.append(err)
-
-    else:
-        oims_structure_schema, err = load_json_file(args.OIMS_structure_schema_path)
-        if err: errors.append(err)
+    #*! <%GTREE 3.4.2 load high-level OIMS structure JSON Schema validator file and the specific JSON Schema validator file%>
+    oims_structure_schema, schema, schema_errors = load_validation_schemas(args.OIMS_structure_schema_path, args.schema_path)
+    errors.extend(schema_errors)
 
-    #*! <%GTREE 3.3.3 load the specific JSON Schema validator file%>
-    schema, err = load_json_file(args.schema_path)
-    if err: errors.append(err)
-
-#*! <%GTREE 3.4 validate metadata against schemas%>
+#*! <%GTREE 3.5 validate metadata against schemas%>
     if not errors:
-        valid, msg = validate_against_schema(oims_metadata, oims_structure_schema, "high-level OIMS structure schema")
-        if not valid: errors.append(msg)
-
-        valid, msg = validate_against_schema(oims_metadata, schema, args.schema_name)
-        if not valid: errors.append(msg)
+        errors.extend(validate_metadata(oims_metadata, oims_structure_schema, schema, args.schema_name))
 
-#*! <%GTREE 3.5 error handling%>
+#*! <%GTREE 3.6 error handling%>
     if errors:
         print("\n".join(errors))
-        generate_pdf_report(errors, logo_url, boiler_text_report)
     else:
-        success_message = "All validations passed successfully."
         print("All validations passed successfully.")
-        generate_pdf_report([success_message], logo_url, boiler_text_report)
+    generate_report(errors, args.report_format)
+    sys.exit(1 if errors else 0)
 
 #*! <%GTREE 4 run tests%>
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_schema_resolver.py
+__version__ = "1.1.1"
+# Remarks   : page and raw URLs of one schema are fetched once; malformed headers are reported;
+#             a corpus is read up to the header of each file
+"""
+*! <%GTREE 0 documentation of the schema resolver%>
+*! <%GTREE 0.1 Introduction%>
+Resolve the underlying schemas referenced by OIMS compatible metadata files.
+
+Every OIMS file lists its underlying schemas under
+OIMS_header.metadata_schema[*].schema_properties[*].schema_url. The resolver collects the distinct
+URLs of one file or of a whole corpus, reading each file only up to its OIMS_header
+(OIMS_json_stream.read_oims_header), and fetches them concurrently over one pooled HTTP session
+with a limit on the number of simultaneous requests. All fetches go through the schema cache of
+OIMS_schema_cache.py, so a corpus that references dozens of schema versions costs one parallel
+fetch wave, and nothing at all once the cache is warm.
+
+GitHub page URLs (https://github.com/<owner>/<repo>/blob/<branch>/<path>) are resolved through
+their raw.githubusercontent.com equivalent, which serves the JSON itself. URLs are deduplicated after
+this mapping, so the page URL and the raw URL of the same schema cost one fetch.
+
+*! <%GTREE 0.2  command line parameters%>
+metadata_files     :  OIMS metadata files, directories or globs to collect schema URLs from
+max_concurrency    :  maximum number of simultaneous requests [optional, default is 8]
+schema_cache_dir   :  directory of the on-disk schema cache [optional]
+offline            :  flag: only report what is in the cache, never access the network
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import argparse
+import glob
+import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from OIMS_schema_cache import schema_cache
+from OIMS_json_stream import read_oims_header
+
+#*! <%GTREE 1.2 defaults%>
+default_max_concurrency = 8
+
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.1 function to map GitHub page URLs to raw content URLs%>
+def raw_github_url(url):
+    """Return the raw.githubusercontent.com URL of a github.com/<owner>/<repo>/blob/... URL, else the URL itself."""
+    parsed = urllib.parse.urlparse(url)
+    parts = parsed.path.strip('/').split('/')
+    if parsed.netloc == 'github.com' and len(parts) > 4 and parts[2] == 'blob':
+        return 'https://raw.githubusercontent.com/' + '/'.join(parts[:2] + parts[3:])
+    return url
+
+#*! <%GTREE 2.2 function to collect the schema URLs of one OIMS document%>
+def collect_schema_urls(oims_data, problems=None):
+    """Return the schema_url values in OIMS_header.metadata_schema, in order of appearance.
+
+    Parts of the header that do not have the OIMS structure are skipped; when problems is a list,
+    a message for each of them is appended to it.
+    """
+    def report(message):
+        if problems is not None:
+            problems.append(message)
+
+    urls = []
+    oims = oims_data.get("OIMS") if isinstance(oims_data, dict) else None
+    header = oims.get("OIMS_header") if isinstance(oims, dict) else None
+    if header is None:
+        # not an OIMS file, such as a schema next to the metadata files
+        return urls
+    if not isinstance(header, dict):
+        report("OIMS.OIMS_header is not an object")
+        return urls
+    metadata_schemas = header.get("metadata_schema") or []
+    if not isinstance(metadata_schemas, list):
+        report("OIMS_header.metadata_schema is not a list")
+        return urls
+    for schema_number, metadata_schema in enumerate(metadata_schemas):
+        schema_properties = metadata_schema.get("schema_properties") or [] if isinstance(metadata_schema, dict) else None
+        if not isinstance(schema_properties, list):
+            report(f"OIMS_header.metadata_schema[{schema_number}] is not an object with a schema_properties list")
+            continue
+        for property_number, schema_property in enumerate(schema_properties):
+            if not isinstance(schema_property, dict):
+                report(f"OIMS_header.metadata_schema[{schema_number}].schema_properties[{property_number}] is not an object")
+                continue
+            url = schema_property.get("schema_url")
+            if isinstance(url, str) and urllib.parse.urlparse(url).scheme in ('http', 'https'):
+                urls.append(url)
+    return urls
+
+#*! <%GTREE 2.3 function to collect the distinct schema URLs of a corpus%>
+def collect_corpus_schema_urls(file_paths):
+    """Return the distinct schema URLs of all files and a list of errors for files that could not be read.
+
+    Each file is read up to its OIMS_header only, so JSON errors after the header are not reported.
+    """
+    urls = {}
+    errors = []
+    for file_path in file_paths:
+        try:
+            header = read_oims_header(file_path)
+        except (OSError, ValueError) as e:
+            errors.append(f"Could not read {file_path}: {e}")
+            continue
+        problems = []
+        oims_data = {'OIMS': {'OIMS_header': header['header']}} if header['found']['OIMS_header'] else {}
+        for url in collect_schema_urls(oims_data, problems):
+            urls.setdefault(url, None)
+        errors.extend(f"Malformed OIMS header in {file_path}: {problem}" for problem in problems)
+    return list(urls), errors
+
+#*! <%GTREE 2.4 function to fetch schema URLs concurrently%>
+def resolve_schema_urls(urls, max_concurrency=default_max_concurrency, cache=schema_cache):
+    """Fetch the distinct URLs concurrently through the schema cache.
+
+    GitHub page URLs are mapped to their raw URL first, so a schema given both ways is fetched once.
+    Returns a dictionary mapping each URL to (data, error message), as returned by the cache.
+    """
+    fetch_urls = {url: raw_github_url(url) for url in urls}
+    distinct_urls = list(dict.fromkeys(fetch_urls.values()))
+    if not distinct_urls:
+        return {}
+
+    import requests  # imported here so that listing files does not pay for importing requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(distinct_urls))) as executor:
+            results = dict(zip(distinct_urls, executor.map(lambda url: cache.get(url, session=session), distinct_urls)))
+            return {url: results[fetch_url] for url, fetch_url in fetch_urls.items()}
+    finally:
+        session.close()
+
+#*! <%GTREE 2.5 function to list the metadata files of a corpus%>
+def collect_metadata_files(patterns):
+    """Return the JSON files given by files, directories (searched recursively) and globs."""
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = glob.glob(os.path.join(pattern, '**', '*.json'), recursive=True)
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        files.update(os.path.normpath(candidate) for candidate in candidates if os.path.isfile(candidate))
+    return sorted(files)
+
+
+#*! <%GTREE 3 main definition%>
+def main():
+    parser = argparse.ArgumentParser(description='Fetch all underlying schemas referenced by OIMS metadata files into the schema cache.')
+    parser.add_argument('--metadata_files', nargs='+', required=True, help='OIMS metadata files, directories or globs.')
+    parser.add_argument('--max_concurrency', type=int, default=default_max_concurrency, help='Maximum number of simultaneous requests.')
+    parser.add_argument('--schema_cache_dir', help='Directory of the on-disk schema cache (default is ~/.OIMS_cache/schemas).')
+    parser.add_argument('--offline', action='store_true', help='Only use cached schemas, never access the network.')
+    args = parser.parse_args()
+
+    if args.schema_cache_dir: schema_cache.cache_dir = args.schema_cache_dir
+    schema_cache.offline = args.offline
+
+    urls, errors = collect_corpus_schema_urls(collect_metadata_files(args.metadata_files))
+    for url, (data, err) in resolve_schema_urls(urls, args.max_concurrency).items():
+        if err:
+            errors.append(err)
+        else:
+            print(f"resolved {url}")
+    if errors:
+        print("\n".join(errors))
+
+if __name__ == "__main__":
+    main()
+
+#*============================   End Of File   ================================
@@ -16,26 +16,10 @@ Tool to convert OIMS metadata file to to snake case
 #<%/REGION File header%>
 #*! <%GTREE 1 initialization%>
 #*! <%GTREE 1.1 import libraries%>
-import json
 import re
 import argparse
-#*! <%GTREE 1.2 Check command line arguments for settings file path%>
-#
-parser = argparse.ArgumentParser(description='Script to process data.')
-parser.add_argument('--old_file_path', required=True, help='Path to the file where attributes need to be converted to snake-case')
-parser.add_argument('--new_file_path', help='Path to the converted file')
-parser.add_argument('--conversion_dict_path', default='conversion_dict.json', help='Path to conversion dictionary')
-
-args = parser.parse_args()
-
-# Check if new_file_path is provided, otherwise set it to old_file_path
-if args.new_file_path is None:
-    args.new_file_path = args.old_file_path
-
-old_file_path = args.old_file_path
-new_file_path = args.new_file_path
-conversion_dict_path = args.conversion_dict_path
 
+import OIMS_json_io
 #*! <%GTREE 2 functions%>
 
 def to_snake_case(s):
@@ -133,25 +117,49 @@ def check_consistency(data, conversion_dict):
 
     return inconsistencies
 
-# Reading the JSON file
-with open(old_file_path, 'r') as f:
-    data = json.load(f)
+#*! <%GTREE 3 convert a file%>
+def convert_file_to_snake_case(old_file_path, new_file_path=None, conversion_dict_path='conversion_dict.json', compact=False):
+    """Convert the attributes of an OIMS metadata file to snake_case and return the list of inconsistencies.
+
+    The converted file is written to new_file_path (default: overwrite old_file_path) and the
+    conversion dictionary to conversion_dict_path, both without whitespace when compact is set.
+    """
+    # Check if new_file_path is provided, otherwise set it to old_file_path
+    if new_file_path is None:
+        new_file_path = old_file_path
+
+    # Reading the JSON file
+    data = OIMS_json_io.load_json_file(old_file_path)
 
-converted_data, conversion_dict = convert_keys_recursive(data)
+    converted_data, conversion_dict = convert_keys_recursive(data)
+
+    inconsistencies = check_consistency(converted_data, conversion_dict)
+
+    # Saving the modified data back to the JSON file
+    OIMS_json_io.dump_json_file(converted_data, new_file_path, compact=compact)
+
+    # If you want to save the conversion dictionary:
+    OIMS_json_io.dump_json_file(conversion_dict, conversion_dict_path, compact=compact)
+
+    return inconsistencies
 
-inconsistencies = check_consistency(converted_data, conversion_dict)
+#*! <%GTREE 4 main definition%>
+def main():
+    #*! <%GTREE 4.1 Check command line arguments for settings file path%>
+    parser = argparse.ArgumentParser(description='Script to process data.')
+    parser.add_argument('--old_file_path', required=True, help='Path to the file where attributes need to be converted to snake-case')
+    parser.add_argument('--new_file_path', help='Path to the converted file')
+    parser.add_argument('--conversion_dict_path', default='conversion_dict.json', help='Path to conversion dictionary')
+    parser.add_argument('--compact_output', action='store_true', help='Write the JSON files without indentation and whitespace')
 
-# Logging inconsistencies
-for msg in inconsistencies:
-    print(msg)
+    args = parser.parse_args()
 
-# Saving the modified data back to the JSON file
-with open(new_file_path, 'w') as f:
-    json.dump(converted_data, f, indent=4)
+    #*! <%GTREE 4.2 convert and log inconsistencies%>
+    for msg in convert_file_to_snake_case(args.old_file_path, args.new_file_path, args.conversion_dict_path, args.compact_output):
+        print(msg)
 
-# If you want to save the conversion dictionary:
-with open(conversion_dict_path, 'w') as f:
-    json.dump(conversion_dict, f, indent=4)
+if __name__ == "__main__":
+    main()
 
 
 #============================   End Of File   ================================
\ No newline at end of file
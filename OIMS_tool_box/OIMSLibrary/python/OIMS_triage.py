@@ -0,0 +1,89 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_triage.py
+__version__ = "1.0.0"
+# Remarks   :
+"""
+*! <%GTREE 0 documentation of the corpus triage%>
+*! <%GTREE 0.1 Introduction%>
+Header-only triage of a corpus of OIMS files.
+
+Each file is read only up to its OIMS_header (triage_oims_structure in OIMS_schema_consistency_test.py),
+which checks the OIMS structure and reads the metadata version and the schema versions of the content
+objects. Files can then be routed to the validators for their schema versions without parsing any
+content: a large corpus is triaged in seconds.
+
+*! <%GTREE 0.2 output%>
+One JSON line per file with file, result, metadata_version, schema_versions and, with --scan_content,
+content_objects; followed on the terminal by the number of files per content object and schema version.
+
+*! <%GTREE 0.3  command line parameters%>
+metadata_files     :  OIMS metadata files, directories or globs to triage
+scan_content       :  flag: also list the OIMS_content_object identifiers found in OIMS_content
+                      (the content is scanned but not decoded)
+output             :  JSON Lines file for the per-file results [optional, default is OIMS_triage.jsonl]
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import argparse
+import json
+import time
+
+from OIMS_schema_consistency_test import triage_oims_structure
+from OIMS_schema_resolver import collect_metadata_files
+
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.1 function to triage a list of files%>
+def triage_files(file_paths, scan_content=False):
+    """Yield the triage of every file, without the header itself."""
+    for file_path in file_paths:
+        triage = triage_oims_structure(file_path, scan_content)
+        del triage['header']
+        yield triage
+
+#*! <%GTREE 2.2 function to group files by content object and schema version%>
+def route_by_schema_version(triages):
+    """Return {(content object, schema name, schema version): [files]} for the structurally valid files."""
+    routes = {}
+    for triage in triages:
+        if triage['result'] != "OIMS file is valid.":
+            continue
+        for content_object, schema_properties in triage['schema_versions'].items():
+            for schema_property in schema_properties or [{'schema_name': None, 'schema_version': None}]:
+                route = (content_object, schema_property['schema_name'], schema_property['schema_version'])
+                routes.setdefault(route, []).append(triage['file'])
+    return routes
+
+
+#*! <%GTREE 3 main definition%>
+def main():
+    parser = argparse.ArgumentParser(description='Header-only triage of OIMS metadata files.')
+    parser.add_argument('--metadata_files', nargs='+', required=True, help='OIMS metadata files, directories or globs.')
+    parser.add_argument('--scan_content', action='store_true', help='Also list the content object identifiers in OIMS_content.')
+    parser.add_argument('--output', default='OIMS_triage.jsonl', help='JSON Lines file for the per-file results.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    triages = []
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        for triage in triage_files(collect_metadata_files(args.metadata_files), args.scan_content):
+            output_file.write(json.dumps(triage) + "\n")
+            triages.append(triage)
+
+    invalid = sum(1 for triage in triages if triage['result'] != "OIMS file is valid.")
+    print(f"{len(triages)} files triaged in {time.perf_counter() - start:.2f} s, {invalid} with structure errors. "
+          f"Results written to '{args.output}'.")
+    for (content_object, schema_name, schema_version), files in sorted(route_by_schema_version(triages).items(), key=str):
+        print(f"  {content_object} / {schema_name} {schema_version}: {len(files)} files")
+
+if __name__ == "__main__":
+    main()
+
+#*============================   End Of File   ================================
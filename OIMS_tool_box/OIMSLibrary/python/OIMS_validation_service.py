@@ -0,0 +1,214 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_validation_service.py
+__version__ = "1.1.1"
+# Remarks   : bounded caches; metadata to be validated is not cached
+"""
+*! <%GTREE 0 documentation of the local validation service%>
+*! <%GTREE 0.1 Introduction%>
+Long-running local HTTP service for OIMS validation.
+
+Starting a validation tool costs interpreter start-up, imports, schema downloads and schema
+compilation for every file. The service pays those once: schemas from URLs stay parsed in memory
+until the TTL of the schema cache expires, local schemas and metametadata files stay parsed in the
+document cache until they change on disk and compiled validators stay in the validator registry,
+so each request only pays for the validation itself.
+
+The memory caches and the compiled validators are bounded (least recently used entries are
+evicted). The metadata files to be validated are parsed for each request and never cached, in memory
+or in the on-disk schema cache, so neither grows with the number of files the service has validated.
+
+*! <%GTREE 0.2 endpoints%>
+All requests and responses are JSON.
+
+POST /validate      validate OIMS metadata against the OIMS structure schema and an underlying schema
+    {"metadata": {...} | "metadata_path": "...",
+     "schema_path": "...", "schema_name": "...",
+     "OIMS_structure_schema_path": "..."}            [optional, default is the foresight initiative GitHub repo]
+    -> {"valid": true|false, "errors": [...]}
+
+POST /consistency   run the consistency checks of OIMS_schema_consistency_test.py
+    {"schema_to_test_path": "...", "OIMS_basic_path": "...", "OIMS_content_object": "...",
+     "OIMS_content_object_schema_path": "...", "OIMS_to_python_type_mapping_path": "...",
+     "streaming": false}
+    -> {"valid": true|false, "issues": [...], "warnings": [...]}   issues as in OIMS_issues.Issue.to_dict()
+
+GET  /stats         counters of the validator registry
+
+*! <%GTREE 0.3  command line parameters%>
+host               :  interface to listen on [optional, default is 127.0.0.1]
+port               :  port to listen on [optional, default is 8765]
+offline            :  flag: only use cached schemas, never access the network
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import argparse
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from OIMS_document_cache import document_cache
+from OIMS_schema_cache import schema_cache
+from OIMS_validator_registry import validator_registry
+import OIMS_schema_consistency_test
+import OIMS_schema_consistency_test_simple
+import OIMS_json_io
+
+#*! <%GTREE 1.2 defaults%>
+default_host = '127.0.0.1'
+default_port = 8765
+default_max_url_schemas = 32
+
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.1 functions to load schemas and metadata%>
+_url_schemas = OrderedDict()  # url: (time loaded, schema), least recently used first
+_url_schemas_lock = threading.Lock()
+
+def _is_url(location):
+    return urllib.parse.urlparse(location).scheme in ('http', 'https')
+
+def _load_local_file(location, load):
+    try:
+        return load(location), None
+    except FileNotFoundError:
+        return None, f"File not found: {location}. Please check the file path."
+    except (OSError, ValueError) as e:
+        return None, f"Error parsing JSON file {location}: {e}"
+
+#*! <%GTREE 2.1.1 function to load a schema from a path or URL, kept warm between requests%>
+def load_schema(location):
+    """Return (schema, error) for a local path, a URL or 'GitHub_foresight_initiative_OIMS'.
+
+    A schema from a URL is kept parsed in memory until the TTL of the schema cache expires; a local
+    schema is kept in the document cache until it changes on disk.
+    """
+    if location == 'GitHub_foresight_initiative_OIMS':
+        location = OIMS_schema_consistency_test_simple.oims_structure_url
+    if not _is_url(location):
+        return _load_local_file(location, document_cache.load)
+    with _url_schemas_lock:
+        cached = _url_schemas.get(location)
+        if cached is not None and time.time() - cached[0] < schema_cache.ttl:
+            _url_schemas.move_to_end(location)
+            return cached[1], None
+    schema, err = schema_cache.get(location)
+    if not err:
+        with _url_schemas_lock:
+            _url_schemas[location] = (time.time(), schema)
+            _url_schemas.move_to_end(location)
+            while len(_url_schemas) > default_max_url_schemas:
+                _url_schemas.popitem(last=False)
+    return schema, err
+
+#*! <%GTREE 2.1.2 function to load the metadata to be validated, without caching it%>
+def load_metadata(location):
+    """Return (metadata, error) for a local path or a URL; the metadata is not kept in any cache."""
+    if _is_url(location):
+        return schema_cache.fetch(location)
+    return _load_local_file(location, OIMS_json_io.load_json_file)
+
+#*! <%GTREE 2.2 request handlers%>
+#*! <%GTREE 2.2.1 validate metadata against the structure schema and an underlying schema%>
+def handle_validate(request):
+    errors = []
+    if "metadata" in request:
+        oims_metadata = request["metadata"]
+    else:
+        oims_metadata, err = load_metadata(request["metadata_path"])
+        if err: errors.append(err)
+
+    oims_structure_schema, err = load_schema(request.get("OIMS_structure_schema_path", 'GitHub_foresight_initiative_OIMS'))
+    if err: errors.append(err)
+    schema, err = load_schema(request["schema_path"])
+    if err: errors.append(err)
+
+    if not errors:
+        errors = OIMS_schema_consistency_test_simple.validate_metadata(
+            oims_metadata, oims_structure_schema, schema, request.get("schema_name", request["schema_path"]))
+    return {"valid": not errors, "errors": errors}
+
+#*! <%GTREE 2.2.2 consistency check against the OIMS base schema and the metametadata%>
+def handle_consistency(request):
+    issues, warning_issues = OIMS_schema_consistency_test.check_oims_consistency(
+        request["schema_to_test_path"],
+        request["OIMS_basic_path"],
+        request["OIMS_content_object"],
+        request["OIMS_content_object_schema_path"],
+        request.get("OIMS_to_python_type_mapping_path"),
+        request.get("streaming", False))
+    return {"valid": not issues, "issues": issues.to_list(), "warnings": warning_issues.to_list()}
+
+post_handlers = {
+    '/validate': handle_validate,
+    '/consistency': handle_consistency,
+}
+
+
+#*! <%GTREE 3 class definitions%>
+#*! <%GTREE 3.1 HTTP request handler%>
+class ValidationRequestHandler(BaseHTTPRequestHandler):
+
+    def _send_json(self, status, body):
+        content = OIMS_json_io.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, validator_registry.stats())
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        handler = post_handlers.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = OIMS_json_io.loads(self.rfile.read(length))
+        except ValueError as e:
+            self._send_json(400, {"error": f"request is not valid JSON: {e}"})
+            return
+        try:
+            self._send_json(200, handler(request))
+        except KeyError as e:
+            self._send_json(400, {"error": f"missing request field {e}"})
+        except Exception as e:
+            self._send_json(500, {"error": f"An error occurred: {e}"})
+
+
+#*! <%GTREE 4 main definition%>
+def main():
+    parser = argparse.ArgumentParser(description='Local HTTP service that keeps OIMS schemas and validators warm in memory.')
+    parser.add_argument('--host', default=default_host, help='Interface to listen on.')
+    parser.add_argument('--port', type=int, default=default_port, help='Port to listen on.')
+    parser.add_argument('--offline', action='store_true', help='Only use cached schemas, never access the network.')
+    args = parser.parse_args()
+
+    schema_cache.offline = args.offline
+    server = ThreadingHTTPServer((args.host, args.port), ValidationRequestHandler)
+    print(f"OIMS validation service listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
+
+#*============================   End Of File   ================================
@@ -0,0 +1,215 @@
+#<%REGION File header%>
+#=============================================================================
+# File      : OIMS_validator_registry.py
+__version__ = "1.1.2"
+# Remarks   : the content hash is computed once per schema object; the vocabulary sets belong to
+#             the compiled validator and are dropped with it
+"""
+*! <%GTREE 0 documentation of the compiled validator registry%>
+*! <%GTREE 0.1 Introduction%>
+Shared registry of compiled JSON Schema validators for the OIMS tool-box.
+
+jsonschema.validate(data, schema) checks the schema against its meta-schema and builds a new
+validator object on every call. When many OIMS metadata files are validated against the same
+OIMS structure schema and the same underlying schema that work is repeated for every file.
+
+The registry keys validators on a hash of the schema content, so a schema is checked and
+compiled once and the validator is reused for every later call in the same process. The
+max_hashed_schemas most recently used validators are kept, so a long-running process that sees
+ever new schemas, such as the validation service, does not grow without bound. The hash is
+computed once per schema object and remembered for the max_hashed_schemas most recently used
+objects, so a call with a schema that was seen before costs a dictionary lookup; schemas must
+therefore not be modified after they were passed to the registry. Callers that know the content
+already, such as the URL of a fixed schema, can pass their own key instead. Worker
+processes forked from a process with a warm registry inherit it. Optionally the hashes of
+schemas that passed the meta-schema check are recorded in a directory, so later processes
+skip that check as well.
+
+Controlled vocabularies become enum keywords with up to thousands of codes, and jsonschema checks
+enum membership by comparing the instance with every code. The validators of the registry check a
+string against an enum of min_vocabulary_set_size or more codes in a frozenset instead, built once
+per enum list and shared by all validations with that validator; other instances and failures go
+through the standard enum check, so results and messages are unchanged. The frozensets are kept by
+the compiled validator, so they are evicted from the registry together with it.
+
+*! <%GTREE 0.2 usage%>
+from OIMS_validator_registry import validator_registry
+validator_registry.validate(data, schema)      # same behaviour as jsonschema.validate
+validator_registry.validate(data, schema, key) # with a key that identifies the schema content
+validator_registry.stats()                     # {'hits': .., 'misses': .., ...}
+
+*! <%GTREE 0.99  notes%>
+optimized for viewing in GTREE. GTREE can be obtained free of charge through:
+https://www.medictcare.nl/gamstools/
+"""
+#=============================================================================
+#<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import jsonschema
+
+from OIMS_schema_compaction import inline_shared_subschemas
+
+#*! <%GTREE 1.2 defaults%>
+min_vocabulary_set_size = 16
+max_hashed_schemas = 256
+
+#*! <%GTREE 2 function definitions%>
+#*! <%GTREE 2.1 function to compute the content hash of a schema%>
+def schema_content_hash(schema):
+    """Return a sha256 hex digest of the canonical JSON serialization of a schema."""
+    canonical = json.dumps(schema, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+#*! <%GTREE 2.2 function for set based enum checks%>
+def with_vocabulary_sets(validator_class):
+    """Return validator_class extended with an enum keyword that looks strings up in a frozenset.
+
+    A string equals an enum member in JSON Schema only when the member is the same string, so set
+    membership gives the same result as the linear check; a string that is not found is passed to
+    the standard enum check for the usual error. Each call returns a new class with its own
+    frozensets, built once per enum list, so they live as long as the validators of that class.
+    """
+    standard_enum = validator_class.VALIDATORS['enum']
+    # id(enum list): (enum list, frozenset); the entry keeps the list alive, so its id is not reused
+    vocabulary_sets = {}
+
+    def enum(validator, enums, instance, schema):
+        if isinstance(instance, str) and isinstance(enums, list) and len(enums) >= min_vocabulary_set_size:
+            entry = vocabulary_sets.get(id(enums))
+            if entry is None or entry[0] is not enums:
+                entry = vocabulary_sets[id(enums)] = (enums, frozenset(each for each in enums if isinstance(each, str)))
+            if instance in entry[1]:
+                return
+        yield from standard_enum(validator, enums, instance, schema)
+
+    return jsonschema.validators.extend(validator_class, {'enum': enum})
+
+
+#*! <%GTREE 3 class definitions%>
+#*! <%GTREE 3.1 validator registry%>
+class ValidatorRegistry:
+    """Cache of compiled validators keyed by schema content hash.
+
+    Schemas without a $schema keyword are compiled as Draft 2020-12. Schemas that declare
+    another draft are compiled with the validator class of that draft, as jsonschema.validate
+    would do.
+    """
+
+    def __init__(self, default_validator_class=jsonschema.Draft202012Validator, checked_schema_dir=None):
+        self.default_validator_class = default_validator_class
+        self.checked_schema_dir = checked_schema_dir
+        self._validators = OrderedDict()  # content hash: validator, least recently used first
+        # id(schema): (schema, content hash); the entry keeps the schema alive, so its id is not reused
+        self._schema_hashes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.schema_checks = 0
+        self.schema_checks_skipped = 0
+
+    #*! <%GTREE 3.1.1 record of schemas that passed the meta-schema check%>
+    def _checked_marker(self, key):
+        return os.path.join(self.checked_schema_dir, key + ".checked")
+
+    def _is_checked(self, key):
+        return self.checked_schema_dir is not None and os.path.exists(self._checked_marker(key))
+
+    def _mark_checked(self, key):
+        if self.checked_schema_dir is None:
+            return
+        try:
+            os.makedirs(self.checked_schema_dir, exist_ok=True)
+            with open(self._checked_marker(key), 'w', encoding='utf-8') as marker:
+                marker.write(key)
+        except OSError:
+            # the marker only saves time in a later process, failing to write it is harmless
+            pass
+
+    #*! <%GTREE 3.1.2 content hash of a schema object, computed once%>
+    def schema_key(self, schema):
+        """Return schema_content_hash(schema), serializing each schema object only the first time."""
+        with self._lock:
+            entry = self._schema_hashes.get(id(schema))
+            if entry is not None and entry[0] is schema:
+                self._schema_hashes.move_to_end(id(schema))
+                return entry[1]
+        key = schema_content_hash(schema)
+        with self._lock:
+            self._schema_hashes[id(schema)] = (schema, key)
+            self._schema_hashes.move_to_end(id(schema))
+            while len(self._schema_hashes) > max_hashed_schemas:
+                self._schema_hashes.popitem(last=False)
+        return key
+
+    #*! <%GTREE 3.1.3 get or build the validator of a schema%>
+    def get_validator(self, schema, key=None):
+        """Return the compiled validator for a schema, building it on the first request.
+
+        key identifies the schema content; by default it is the content hash of the schema.
+        Raises jsonschema.exceptions.SchemaError if the schema is not valid against its meta-schema.
+        """
+        if key is None:
+            key = self.schema_key(schema)
+        with self._lock:
+            validator = self._validators.get(key)
+            if validator is not None:
+                self._validators.move_to_end(key)
+                self.hits += 1
+                return validator
+
+        validator_class = jsonschema.validators.validator_for(schema, default=self.default_validator_class)
+        if self._is_checked(key):
+            self.schema_checks_skipped += 1
+        else:
+            validator_class.check_schema(schema)
+            self.schema_checks += 1
+            self._mark_checked(key)
+        validator = with_vocabulary_sets(validator_class)(inline_shared_subschemas(schema))
+
+        with self._lock:
+            self.misses += 1
+            validator = self._validators.setdefault(key, validator)
+            self._validators.move_to_end(key)
+            while len(self._validators) > max_hashed_schemas:
+                self._validators.popitem(last=False)
+            return validator
+
+    #*! <%GTREE 3.1.4 validate data against a schema%>
+    def validate(self, data, schema, key=None):
+        """Validate data against a schema with the same errors as jsonschema.validate."""
+        validator = self.get_validator(schema, key)
+        error = jsonschema.exceptions.best_match(validator.iter_errors(data))
+        if error is not None:
+            raise error
+
+    #*! <%GTREE 3.1.5 counters%>
+    def stats(self):
+        """Return the cache counters as a dictionary."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'cached_validators': len(self._validators),
+                'schema_checks': self.schema_checks,
+                'schema_checks_skipped': self.schema_checks_skipped,
+            }
+
+    def clear(self):
+        """Drop all compiled validators and reset the counters."""
+        with self._lock:
+            self._validators.clear()
+            self._schema_hashes.clear()
+            self.hits = self.misses = self.schema_checks = self.schema_checks_skipped = 0
+
+
+#*! <%GTREE 4 module level registry shared by the tools%>
+validator_registry = ValidatorRegistry()
+
+#*============================   End Of File   ================================
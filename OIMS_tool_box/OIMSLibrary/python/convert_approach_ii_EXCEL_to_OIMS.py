@@ -35,17 +35,8 @@ an excel sheet with metadata
 #*! <%GTREE 1.1 import libraries%>
 import argparse
 import pandas as pd
-import json
-
-#*! <%GTREE 1.2 Check command line arguments %>
-# Parse command-line arguments
-parser = argparse.ArgumentParser(description='Convert Excel to JSON for OIMS.')
-parser.add_argument('--path_to_excel_file', type=str, required=True, help='Path to the input Excel file')
-parser.add_argument('--path_to_json_file', type=str, required=True, help='Path to the output JSON file')
-parser.add_argument('--OIMS_header_info_sheetname', type=str, required=True, help='The sheet name for OIMS header information')
-parser.add_argument('--OIMS_content_info_sheetname', type=str, required=True, help='The sheet name for OIMS content information')
-args = parser.parse_args()
 
+import OIMS_json_io
 
 #*! <%GTREE 2 define functions%>
 #*! <%GTREE 2.1 get nested dictionary%>
@@ -118,7 +109,7 @@ def remove_none_values(d):
 
 
 #*! <%GTREE 2.4 main process converting excel template to a json file%>
-def excel_to_json(excel_path, json_path, header_sheet_name, content_sheet_name):
+def excel_to_json(excel_path, json_path, header_sheet_name, content_sheet_name, compact=False):
     # Read the sheets from the Excel file
     header_df = pd.read_excel(excel_path, sheet_name=header_sheet_name)
     content_df = pd.read_excel(excel_path, sheet_name=content_sheet_name)
@@ -148,12 +139,24 @@ def excel_to_json(excel_path, json_path, header_sheet_name, content_sheet_name):
     }
 
     # Save to JSON
-    with open(json_path, 'w', encoding='utf-8') as json_file:
-        json.dump(json_data, json_file, ensure_ascii=False, indent=4)
-
-#*! <%GTREE 3 Call the function with the provided command line arguments%>
-#
-#*! <%GTREE 3 run the process%>
-excel_to_json(args.path_to_excel_file, args.path_to_json_file, args.OIMS_header_info_sheetname, args.OIMS_content_info_sheetname)
+    OIMS_json_io.dump_json_file(json_data, json_path, compact=compact, ensure_ascii=False)
+
+#*! <%GTREE 3 main definition%>
+def main():
+    #*! <%GTREE 3.1 Check command line arguments %>
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description='Convert Excel to JSON for OIMS.')
+    parser.add_argument('--path_to_excel_file', type=str, required=True, help='Path to the input Excel file')
+    parser.add_argument('--path_to_json_file', type=str, required=True, help='Path to the output JSON file')
+    parser.add_argument('--OIMS_header_info_sheetname', type=str, required=True, help='The sheet name for OIMS header information')
+    parser.add_argument('--OIMS_content_info_sheetname', type=str, required=True, help='The sheet name for OIMS content information')
+    parser.add_argument('--compact_output', action='store_true', help='Write the JSON file without indentation and whitespace')
+    args = parser.parse_args()
+
+    #*! <%GTREE 3.2 run the process%>
+    excel_to_json(args.path_to_excel_file, args.path_to_json_file, args.OIMS_header_info_sheetname, args.OIMS_content_info_sheetname, args.compact_output)
+
+if __name__ == "__main__":
+    main()
 
 #*============================   End Of File   ================================
\ No newline at end of file
@@ -0,0 +1,513 @@
+#*<%REGION File header%>
+#*=============================================================================
+#* File      : convert_dataverse_bulk_to_OIMS.py
+#* Version   : 1.1
+#* Remarks   : the header declares the underlying schema under metadata_schema, with the URL of
+#*             schemas/OIMS_base.json
+"""
+*! <%GTREE 0 tool documentation%>
+This tool is part of the toolbox that has been designed to convert the foresight initiative dataset metadata
+template in EXCEL into an OIMS-compatible json metadata file.
+
+The way it has been designed is to be as generic as possible to allow other templates
+that contain metadata to be converted to OIMS
+
+This module converts the metadata of many datasets of a dataverse instance into OIMS metadata files,
+one Descriptive_Metadata_DataSet document per dataset. The OIMS_header of a document declares
+schemas/OIMS_base.json of this repository as its underlying schema, under metadata_schema as the
+consistency check (OIMS_schema_consistency_test.py) and the schema resolver expect.
+*! <%GTREE 0.1 technical information%>
+language: python
+version: 1.1.0
+
+*! <%GTREE 0.2 input%>
+dataverse dataset metadata as
+- JSON files, one dataset per file, given as files, directories (searched recursively for *.json) or globs
+- JSON-Lines dumps (*.jsonl, *.ndjson), one dataset per line
+A dataset is the response of the dataverse native API ({"status": "OK", "data": {...}}) or the
+dataset object itself; exports with a datasetVersion instead of a latestVersion are accepted.
+
+*! <%GTREE 0.3 field mapping%>
+The fields are mapped with a mapping file in the format of template_to_OIMS_mapping_v_1_2.json:
+{"mapping": [{"from": ..., "to": ..., "requirement_level": ..., "prefix_string": ..., "suffix_string": ...}]}
+from               :  dataset.<key>.<key>...            a value of the dataset object, e.g. dataset.persistentUrl
+                      <block>.<field>[.<subfield>...]   the value of a field of a metadata block, e.g.
+                                                        citation.title or citation.author.authorName;
+                                                        the subfields of a multiple compound field give a list
+to                 :  dotted path in the OIMS document; integers index lists
+requirement_level  :  a dataset without a value for a required field is not converted
+prefix_string      :  text put before the value, or before every value of a list
+suffix_string      :  text put after the value, or after every value of a list
+value_map          :  optional replacement of values, e.g. {"doi": "DOI"}
+The default mapping of a structure version is json/dataverse_to_OIMS_mapping_<version>.json.
+
+The mapping is compiled once per process: the paths are split into keys, and the fields of the
+metadata blocks of a dataset are indexed once, so every rule costs a few dictionary lookups per
+dataset.
+
+*! <%GTREE 0.4 parallel conversion%>
+The datasets are sent in batches to a pool of worker processes that parse, map and write them; the
+results are reported as the batches complete, in any order. The number of batches in flight is
+bounded, so a dump of any size is read as the workers progress.
+
+The workers write each document to a temporary file in the output directory, which is renamed to its
+final name as the result arrives. A second dataset with the same name in one run, such as the same
+version of a dataset in two dumps, is reported and not written; files of earlier runs are replaced.
+
+*! <%GTREE 0.5  command line parameters%>
+input_paths                            :  files, directories, globs and JSON-Lines dumps of dataverse metadata
+output_dir                             :  directory of the OIMS files, named after the persistent identifier and version
+                                          of the dataset, e.g. doi_10.7910_DVN_ABC123_v2.0.json
+dataverse_descriptive_dataset_vers     :  version of the structure of the dataverse metadata, selects the default mapping
+             valid values :    cimmyt2023
+mapping_fp                             :  path to a mapping file, instead of the default one
+do_clean                               :  harvard_dataverse: quote bare property names before parsing
+workers                                :  number of worker processes (0 is the number of cores)
+batch_size                             :  number of datasets per batch
+compact_output                         :  write the JSON files without indentation and whitespace
+"""
+#*=============================================================================
+#*<%/REGION File header%>
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
+import argparse
+import io
+import os
+import re
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import OIMS_json_io
+from OIMS_schema_resolver import collect_metadata_files
+from convert_dataverse_to_OIMS import RepairingReader
+
+#*! <%GTREE 1.2 defaults%>
+mapper_tool_name = "convert_dataverse_bulk_to_OIMS.py"
+mapper_tool_version = "1.1.0"
+mapper_tool_url = "https://github.com/ForesightInitiative/OIMS/tools/OIMS_tool_box"
+# the underlying schema of the documents: schemas/OIMS_base.json of this repository
+base_schema_url = "https://raw.githubusercontent.com/GideonKruseman/OIMStest/main/schemas/OIMS_base.json"
+base_schema_version = "2.3.0.0"
+dataverse_structure_versions = ('cimmyt2023',)
+default_mapping_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'json')
+json_lines_extensions = ('.jsonl', '.ndjson')
+default_batch_size = 64
+# batches in flight per worker; bounds the memory used by a large dump
+_batches_per_worker = 4
+_unsafe_file_name = re.compile(r'[^A-Za-z0-9._-]+')
+_url_scheme = re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*://')
+
+#*! <%GTREE 2 define functions%>
+#*! <%GTREE 2.1 OIMS document%>
+def add_mapping_info(mapper_tool_name, mapper_tool_version, mapper_tool_url):
+    mapping_info_instance = {
+        "mapper_tool_name": mapper_tool_name,
+        "mapper_tool_version": mapper_tool_version,
+        "mapper_tool_url": mapper_tool_url
+    }
+    return mapping_info_instance
+
+def initiate_OIMS_dataset_document():
+    """Return a new OIMS document with one Descriptive_Metadata_DataSet content item."""
+    return {
+        "OIMS": {
+            "OIMS_header": {
+                "mapping_info": [add_mapping_info(mapper_tool_name, mapper_tool_version, mapper_tool_url)],
+                "metadata_schema": [
+                    {
+                        "OIMS_content_object": "Descriptive_Metadata_DataSet",
+                        "schema_properties": [
+                            {
+                                "schema_name": "OIMS_base",
+                                "schema_description": "OIMS selfdescribing metadata schema",
+                                "schema_type": "selfdescribing metadata schema",
+                                "schema_version": base_schema_version,
+                                "schema_url": base_schema_url,
+                                "OIMS_content_object": "MetadataMetadata"
+                            }
+                        ]
+                    }
+                ]
+            },
+            "OIMS_content": [
+                {
+                    "OIMS_content_object": "Descriptive_Metadata_DataSet",
+                    "OIMS_content_object_properties": {
+                        "Persistent_Entity_ID": [{}],
+                        "Metadata": {}
+                    }
+                }
+            ]
+        }
+    }
+
+#*! <%GTREE 2.2 field mapping%>
+#*! <%GTREE 2.2.1 load the mapping%>
+def mapping_file_path(structure_version):
+    return os.path.normpath(os.path.join(default_mapping_dir, f"dataverse_to_OIMS_mapping_{structure_version}.json"))
+
+def load_mapping(mapping_fp):
+    """Load and compile the mapping file and return (CompiledMapping, err)."""
+    try:
+        return CompiledMapping(OIMS_json_io.load_json_file(mapping_fp)), None
+    except FileNotFoundError:
+        return None, f"Mapping file '{mapping_fp}' not found."
+    except ValueError as e:
+        return None, f"Mapping file '{mapping_fp}' is not valid: {e}"
+
+#*! <%GTREE 2.2.2 values of a dataset%>
+def _dataset_record(data):
+    """Return the dataset object of a native API response, export or dataset object."""
+    if isinstance(data, dict) and isinstance(data.get('data'), dict) and 'status' in data:
+        data = data['data']
+    if not isinstance(data, dict):
+        raise ValueError("the dataset metadata is not a JSON object")
+    if 'latestVersion' not in data and isinstance(data.get('datasetVersion'), dict):
+        data = dict(data, latestVersion=data['datasetVersion'])
+    return data
+
+def _index_fields(dataset):
+    """Return {(metadata block, typeName): value} of the fields of the latest version of dataset."""
+    fields = {}
+    version = dataset.get('latestVersion')
+    blocks = version.get('metadataBlocks') if isinstance(version, dict) else None
+    if isinstance(blocks, dict):
+        for block_name, block in blocks.items():
+            for field in block.get('fields', ()) if isinstance(block, dict) else ():
+                if isinstance(field, dict) and 'typeName' in field:
+                    fields[(block_name, field['typeName'])] = field.get('value')
+    return fields
+
+def _subfield_value(value, subfield):
+    # a compound field is {subfield: {"typeName": ..., "value": ...}}, or a list of them when multiple;
+    # the values of a list stay at the position of their entry, so author names and affiliations line up
+    if isinstance(value, list):
+        values = [_subfield_value(entry, subfield) if isinstance(entry, dict) else None for entry in value]
+        return values if any(element is not None for element in values) else None
+    if isinstance(value, dict) and isinstance(value.get(subfield), dict):
+        return value[subfield].get('value')
+    return None
+
+def _is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+#*! <%GTREE 2.2.3 compile the rules%>
+def _compile_source(path):
+    """Return a function (dataset, fields) -> value for a from path."""
+    keys = path.split('.')
+    if keys[0] == 'dataset':
+        keys = keys[1:]
+        def get_dataset_value(dataset, fields):
+            value = dataset
+            for key in keys:
+                if not isinstance(value, dict):
+                    return None
+                value = value.get(key)
+            return value
+        return get_dataset_value
+    if len(keys) < 2:
+        raise ValueError(f"'{path}' is neither dataset.<key> nor <metadata block>.<field>")
+    field_key, subfields = (keys[0], keys[1]), keys[2:]
+    def get_field_value(dataset, fields):
+        value = fields.get(field_key)
+        for subfield in subfields:
+            value = _subfield_value(value, subfield)
+        return value
+    return get_field_value
+
+def _compile_target(path):
+    return tuple(int(key) if key.isdigit() else key for key in path.split('.'))
+
+def _set_value(document, keys, value):
+    node = document
+    for key, next_key in zip(keys, keys[1:]):
+        new = [] if isinstance(next_key, int) else {}
+        if isinstance(key, int):
+            while len(node) <= key:
+                node.append(new)
+                new = [] if isinstance(next_key, int) else {}
+            node = node[key]
+        else:
+            node = node.setdefault(key, new)
+    if isinstance(keys[-1], int):
+        while len(node) <= keys[-1]:
+            node.append(None)
+    node[keys[-1]] = value
+
+def _existing_child(node, key):
+    if isinstance(node, dict) and isinstance(key, str):
+        return node.get(key)
+    if isinstance(node, list) and isinstance(key, int) and key < len(node):
+        return node[key]
+    return None
+
+def _check_targets(targets):
+    """Raise ValueError when the to paths of (rule number, keys) can not all be set in one document.
+
+    Paths conflict when one rule sets a value where another rule puts a container (a and a.b), when
+    a key and a list index are used at the same place (a.b and a.0), or when a path does not fit the
+    structure of the new OIMS document, such as a key inside the mapping_info list.
+    """
+    containers = {}  # path prefix: (list or dict, rule number)
+    values = {}  # full path: rule number
+    for number, keys in targets:
+        if isinstance(keys[0], int):
+            raise ValueError(f"the to path of rule {number} starts with a list index")
+        node = initiate_OIMS_dataset_document()
+        for depth, (key, next_key) in enumerate(zip(keys, keys[1:])):
+            prefix = keys[:depth + 1]
+            kind = list if isinstance(next_key, int) else dict
+            if prefix in values:
+                raise ValueError(f"rule {number} writes inside the value set by rule {values[prefix]}")
+            other_kind, other = containers.setdefault(prefix, (kind, number))
+            if other_kind is not kind:
+                raise ValueError(f"rules {other} and {number} use both a key and a list index at the same place")
+            node = _existing_child(node, key)
+            if node is not None and not isinstance(node, kind):
+                raise ValueError(f"rule {number} does not fit the structure of the OIMS document")
+        if keys in containers:
+            raise ValueError(f"rule {number} replaces the value rule {containers[keys][1]} writes inside")
+        values.setdefault(keys, number)
+
+class CompiledMapping:
+    """Field mapping from dataverse dataset metadata to an OIMS document, compiled once.
+
+    convert(data) returns (OIMS document, err); a dataset without a value for a required field gives
+    (None, err) with the missing fields.
+    """
+
+    def __init__(self, mapping):
+        if not isinstance(mapping, dict) or not isinstance(mapping.get('mapping'), list):
+            raise ValueError("expected an object with a 'mapping' list")
+        self.mapping = mapping
+        self.rules = []
+        targets = []
+        for number, rule in enumerate(mapping['mapping']):
+            if not isinstance(rule, dict):
+                raise ValueError(f"rule {number} is not an object")
+            source, target = rule.get('from'), rule.get('to')
+            if not isinstance(source, str) or not isinstance(target, str) or not source or not target:
+                raise ValueError(f"rule {number} needs a 'from' and a 'to' path")
+            if not isinstance(rule.get('value_map') or {}, dict):
+                raise ValueError(f"the value_map of rule {number} is not an object")
+            targets.append((number, _compile_target(target)))
+            self.rules.append((
+                source,
+                _compile_source(source),
+                targets[-1][1],
+                rule.get('requirement_level') == 'required',
+                rule.get('prefix_string') or '',
+                rule.get('suffix_string') or '',
+                rule.get('value_map') or None,
+            ))
+        _check_targets(targets)
+
+    def _format(self, value, prefix, suffix, value_map):
+        if isinstance(value, list):
+            return [self._format(element, prefix, suffix, value_map) for element in value]
+        if value_map is not None and isinstance(value, str):
+            value = value_map.get(value, value)
+        if prefix or suffix:
+            value = f"{prefix}{value}{suffix}"
+        return value
+
+    def convert(self, data):
+        try:
+            dataset = _dataset_record(data)
+        except ValueError as e:
+            return None, str(e)
+        fields = _index_fields(dataset)
+        document = initiate_OIMS_dataset_document()
+        missing = []
+        for source, get, target, required, prefix, suffix, value_map in self.rules:
+            value = get(dataset, fields)
+            if _is_empty(value):
+                if required:
+                    missing.append(source)
+                continue
+            _set_value(document, target, self._format(value, prefix, suffix, value_map))
+        if missing:
+            return None, f"missing required field(s) {', '.join(dict.fromkeys(missing))}"
+        return document, None
+
+#*! <%GTREE 2.3 input datasets%>
+def iter_dataset_sources(input_paths):
+    """Yield (source, output name, JSON text or None) for every dataset; None is read from the file source."""
+    file_patterns = []
+    for input_path in input_paths:
+        if input_path.lower().endswith(json_lines_extensions) and os.path.isfile(input_path):
+            name = os.path.splitext(os.path.basename(input_path))[0]
+            with open(input_path, 'rb') as dump:
+                for line_number, line in enumerate(dump, 1):
+                    if line.strip():
+                        yield f"{input_path}:{line_number}", f"{name}_{line_number}", line
+        else:
+            file_patterns.append(input_path)
+    if file_patterns:
+        for file_path in collect_metadata_files(file_patterns):
+            yield file_path, os.path.splitext(os.path.basename(file_path))[0], None
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def output_file_name(dataset, fallback_name):
+    """Return the file name of the OIMS document of dataset, made safe for file systems.
+
+    The name is the persistent identifier (protocol, authority and identifier, or else the persistent
+    URL without its scheme) followed by the version number, so datasets of different authorities and
+    versions of one dataset get different names.
+    """
+    name = None
+    if dataset.get('identifier'):
+        name = ':'.join(str(part) for part in (dataset.get('protocol'), dataset.get('authority')) if part)
+        name = f"{name}/{dataset['identifier']}" if name else str(dataset['identifier'])
+    elif dataset.get('persistentUrl'):
+        name = _url_scheme.sub('', str(dataset['persistentUrl']))
+    if name is None:
+        name = fallback_name
+    version = dataset.get('latestVersion')
+    if isinstance(version, dict) and version.get('versionNumber') is not None:
+        name += f"_v{version['versionNumber']}.{version.get('versionMinorNumber') or 0}"
+    name = _unsafe_file_name.sub('_', name).strip('._')
+    return f"{name or '_'}.json"
+
+#*! <%GTREE 2.4 conversion in worker processes%>
+_worker_state = {}
+
+def _init_convert_worker(mapping, output_dir, do_clean, compact_output):
+    _worker_state['mapping'] = CompiledMapping(mapping)
+    _worker_state['output_dir'] = output_dir
+    _worker_state['do_clean'] = do_clean
+    _worker_state['compact_output'] = compact_output
+
+def _convert_dataset(source, name, text):
+    if text is None:
+        try:
+            with open(source, 'rb') as file:
+                text = file.read()
+        except OSError as e:
+            return None, None, f"'{source}' could not be read: {e}"
+    if _worker_state['do_clean'] == 'harvard_dataverse':
+        text = b''.join(iter(RepairingReader(io.BytesIO(text)).read, b''))
+    try:
+        data = OIMS_json_io.loads(text)
+    except ValueError as e:
+        return None, None, f"'{source}' is not valid JSON: {e}"
+    document, err = _worker_state['mapping'].convert(data)
+    if err:
+        return None, None, f"'{source}': {err}"
+    output_path = os.path.join(_worker_state['output_dir'], output_file_name(_dataset_record(data), name))
+    # the parent renames the temporary file, so a name used twice in a run is never overwritten
+    try:
+        handle, temp_path = tempfile.mkstemp(suffix='.tmp', prefix='.', dir=_worker_state['output_dir'])
+        os.close(handle)
+    except OSError as e:
+        return None, None, f"'{output_path}' could not be written: {e}"
+    try:
+        OIMS_json_io.dump_json_file(document, temp_path, compact=_worker_state['compact_output'], ensure_ascii=False)
+    except Exception as e:
+        os.remove(temp_path)
+        return None, None, f"'{output_path}' could not be written: {e}"
+    return output_path, temp_path, None
+
+def _convert_batch(batch):
+    results = []
+    for source, name, text in batch:
+        try:
+            results.append((source,) + _convert_dataset(source, name, text))
+        except Exception as e:
+            # an unexpected failure is reported with its dataset instead of ending the whole run
+            results.append((source, None, None, f"'{source}': the conversion failed: {e!r}"))
+    return results
+
+def _place_outputs(results, written):
+    """Rename the temporary files of results to their names and yield (source, output path, err).
+
+    written maps the output paths of this run to their source; a path written before is an error.
+    """
+    for source, output_path, temp_path, err in results:
+        if temp_path is not None:
+            if output_path in written:
+                os.remove(temp_path)
+                err = f"'{source}': the dataset was already converted to '{output_path}' from '{written[output_path]}'"
+            else:
+                try:
+                    os.replace(temp_path, output_path)
+                    written[output_path] = source
+                except OSError as e:
+                    os.remove(temp_path)
+                    err = f"'{output_path}' could not be written: {e}"
+        yield source, None if err else output_path, err
+
+def convert_dataverse_datasets(input_paths, output_dir, mapping, do_clean='no', workers=1,
+                               batch_size=default_batch_size, compact_output=False):
+    """Convert every dataset of input_paths and yield (source, output path, err) as the conversions complete.
+
+    mapping is the content of a mapping file; it is compiled once per process. With workers > 1 the
+    batches are converted in worker processes and the results come in the order they complete.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    batches = _batches(iter_dataset_sources(input_paths), batch_size)
+    initargs = (mapping, output_dir, do_clean, compact_output)
+    written = {}
+    if workers == 1:
+        _init_convert_worker(*initargs)
+        for batch in batches:
+            yield from _place_outputs(_convert_batch(batch), written)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_convert_worker, initargs=initargs) as executor:
+        pending = set()
+        for batch in batches:
+            pending.add(executor.submit(_convert_batch, batch))
+            if len(pending) >= workers * _batches_per_worker:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from _place_outputs(future.result(), written)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from _place_outputs(future.result(), written)
+
+#*! <%GTREE 3 run code%>
+def main():
+    parser = argparse.ArgumentParser(description="Convert the metadata of many dataverse datasets into OIMS metadata files.")
+    parser.add_argument("--input_paths", required=True, nargs='+', help="Files, directories, globs and JSON-Lines dumps (*.jsonl) of dataverse dataset metadata.")
+    parser.add_argument("--output_dir", required=True, help="Directory of the OIMS metadata files.")
+    parser.add_argument("--dataverse_descriptive_dataset_vers", default='cimmyt2023', choices=dataverse_structure_versions, help="version of the structure of the json file of dataverse metadata")
+    parser.add_argument("--mapping_fp", help="path to the mapping file (default is json/dataverse_to_OIMS_mapping_<version>.json)")
+    parser.add_argument("--do_clean", default='no', choices=['no', 'harvard_dataverse'], help="should the data be cleaned: valid values: no|harvard_dataverse")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 is the number of cores)")
+    parser.add_argument("--batch_size", type=int, default=default_batch_size, help="Number of datasets per batch")
+    parser.add_argument("--compact_output", action="store_true", help="Write the JSON files without indentation and whitespace")
+    args = parser.parse_args()
+
+    mapping_fp = args.mapping_fp or mapping_file_path(args.dataverse_descriptive_dataset_vers)
+    compiled_mapping, err = load_mapping(mapping_fp)
+    if err:
+        print(err)
+        exit(1)
+
+    converted = failed = 0
+    for source, output_path, err in convert_dataverse_datasets(args.input_paths, args.output_dir, compiled_mapping.mapping,
+                                                               args.do_clean, args.workers or os.cpu_count() or 1,
+                                                               max(1, args.batch_size), args.compact_output):
+        if err:
+            failed += 1
+            print(err)
+        else:
+            converted += 1
+    print(f"{converted} datasets converted to OIMS in '{args.output_dir}', {failed} failed.")
+    if failed:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
+
+#*============================   End Of File   ================================
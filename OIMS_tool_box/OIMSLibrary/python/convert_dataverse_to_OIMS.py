@@ -2,11 +2,11 @@
 #*=============================================================================
 #* File      : convert_dataverse_to_OIMS.py
 #* Author    : Gideon Kruseman <g.kruseman@cgiar.org>
-#* Version   : 1.0
+#* Version   : 1.1.1
 #* Date      : 10/31/2023 7:12:01 PM
 #* Changed   :
 #* Changed by:
-#* Remarks   :
+#* Remarks   : bare property names are quoted in one streaming pass, outside string values only
 """
 *! <%GTREE 0 tool documentation%>
 This tool is part of the toolbox that has been designed to convert the foresight initiative dataset metadata
@@ -18,43 +18,158 @@ that contain metadata to be converted to OIMS
 This module parses the json metadata file of a dataset from a dataverse instance
 *! <%GTREE 0.1 technical information%>
 language: python
-version: 1.0.0
+version: 1.1.1
 data: October 2023
 author: Gideon Kruseman <g.kruseman@cgiar.org>
 
 *! <%GTREE 0.2 input%>
 a dataverse metadata file in json format
+
+*! <%GTREE 0.3 cleaning%>
+Exports of the Harvard dataverse can have property names without quotes ({name: "value"}).
+RepairingReader quotes them in one pass over chunks of the file: string literals are copied as they
+are, so text in values such as "a, b: c" is never changed, and a name is only quoted after { or ,
+and before a colon. The cleaned file is written to a temporary file and checked to be valid JSON in
+the same pass (reindent_stream in OIMS_json_io.py); only a valid result replaces the input file.
+Time is linear in the size of the file and memory use does not depend on it.
+
+*! <%GTREE 0.4  command line parameters%>
+input_filepath     :  path to the JSON file with dataverse metadata; it is cleaned in place
+do_clean           :  no: only check that the file is valid JSON
+                      harvard_dataverse: quote the bare property names
 """
 #*=============================================================================
 #*<%/REGION File header%>
-import re
-import json
+#*! <%GTREE 1 initialization%>
+#*! <%GTREE 1.1 import libraries%>
 import argparse
+import io
+import os
+import re
+
+from OIMS_json_io import reindent_stream, replace_file
+
+#*! <%GTREE 1.2 defaults and tokens%>
+default_chunk_size = 1 << 20
+# complete string literals; splitting on them leaves the text outside strings at the even indexes
+_string_literal = re.compile(rb'("[^"\\]*(?:\\.[^"\\]*)*")', re.DOTALL)
+# a bare property name after { or , and followed by a colon, in text outside strings
+_bare_property_name = re.compile(rb'([{,][ \t\r\n]*)([A-Za-z_][A-Za-z0-9_]*)(?=[ \t\r\n]*:)')
+# the colon of a property name this close to the end of a chunk may be in the next one
+_token_margin = 1024
+
+#*! <%GTREE 2 define functions%>
+#*! <%GTREE 2.1 reader that quotes bare property names%>
+class RepairingReader:
+    """Binary reader over source that returns its contents with the bare property names quoted.
+
+    The contents are repaired in one pass over chunks of chunk_size bytes: string literals are matched
+    whole and copied as they are, so text inside strings such as "a, b: c" is never changed. A name
+    outside strings is quoted when the previous character that is not whitespace is { or , and a colon
+    follows it. read() returns the next repaired chunk, whatever size is asked, and b'' at the end.
+    Memory use depends on the chunk size and the longest string, not on the size of the file.
+    """
+
+    def __init__(self, source, chunk_size=default_chunk_size):
+        self.quoted = 0  # number of property names quoted so far
+        self._chunks = self._repaired_chunks(source, chunk_size)
+
+    def read(self, size=-1):
+        return next(self._chunks, b'')
+
+    def _repaired_chunks(self, source, chunk_size):
+        buffer = b''
+        eof = False
+        while True:
+            parts = _string_literal.split(buffer)
+            if not eof:
+                # keep back the end of the buffer from the last comma before the margin, or from the start
+                # of a string that is not closed yet, so a property name is seen with its { or , and colon
+                tail_start = len(buffer) - len(parts[-1])
+                tail_end = buffer.find(b'"', tail_start)
+                tail_end = min(len(buffer) if tail_end < 0 else tail_end, len(buffer) - _token_margin)
+                cut = max(buffer.rfind(b',', tail_start, max(tail_start, tail_end)), tail_start)
+                parts[-1] = parts[-1][:cut - tail_start]
+            for index in range(0, len(parts), 2):
+                parts[index], quoted = _bare_property_name.subn(rb'\1"\2"', parts[index])
+                self.quoted += quoted
+            repaired = b''.join(parts)
+            if repaired:
+                yield repaired
+            if eof:
+                return
+            chunk = source.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[cut:] + chunk
 
 def quote_properties(input_str):
-    # Use regex to identify unquoted property names and add quotes
-    cleaned_str = re.sub(r'(?<=\{|, )([a-zA-Z_][a-zA-Z_0-9]*)(?=\s*:)', r'"\1"', input_str)
-    return cleaned_str
+    # Quote the unquoted property names, outside string values
+    reader = RepairingReader(io.BytesIO(input_str.encode('utf-8')))
+    return b''.join(iter(reader.read, b'')).decode('utf-8')
+
+#*! <%GTREE 2.2 function to repair a file in place%>
+class _CopyingReader:
+    """Binary reader that writes everything read from source to copy."""
+
+    def __init__(self, source, copy):
+        self.source = source
+        self.copy = copy
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        self.copy.write(data)
+        return data
+
+def repair_json_file(input_filepath, chunk_size=default_chunk_size):
+    """Quote the bare property names of a JSON file in place and return (number quoted, err).
 
+    The repaired text is written to a temporary file and checked to be valid JSON in the same pass;
+    only then does it replace the input file, which is otherwise left as it was.
+    """
+    def write(target):
+        with open(input_filepath, 'rb') as source, open(os.devnull, 'wb') as null:
+            reader = RepairingReader(source, chunk_size)
+            # checking the grammar while copying keeps memory use independent of the file size
+            reindent_stream(_CopyingReader(reader, target), null, chunk_size=chunk_size)
+        result['quoted'] = reader.quoted
+        return reader.quoted > 0
+    result = {'quoted': 0}
+    try:
+        replace_file(input_filepath, write)
+    except FileNotFoundError:
+        return None, f"File '{input_filepath}' not found."
+    except ValueError as e:
+        return None, f"The cleaned JSON in '{input_filepath}' is not valid: {e}"
+    return result['quoted'], None
+
+def check_json_file(input_filepath, chunk_size=default_chunk_size):
+    """Return None when the file is valid JSON, otherwise the error message."""
+    try:
+        with open(input_filepath, 'rb') as source, open(os.devnull, 'wb') as null:
+            reindent_stream(source, null, chunk_size=chunk_size)
+    except FileNotFoundError:
+        return f"File '{input_filepath}' not found."
+    except ValueError as e:
+        return f"'{input_filepath}' is not valid JSON: {e}"
+    return None
+
+#*! <%GTREE 3 run code%>
 def main():
     parser = argparse.ArgumentParser(description="Clean up JSON file with unquoted properties.")
     parser.add_argument("--input_filepath", required=True, help="Path to the JSON file with dataverse metadata.")
     parser.add_argument("--do_clean", required=True, choices=['no', 'harvard_dataverse'], help="should the data be cleaned: valid values: no|harvard_dataverse")
     args = parser.parse_args()
 
-    with open(args.input_filepath, 'r') as f:
-        data = f.read()
-
-    cleaned_data = quote_properties(data)
-
-    # Optional: Load to verify that the cleaned JSON is valid
-    json.loads(cleaned_data)
-
-    # Overwrite the file with the cleaned JSON data
-    with open(args.input, 'w') as f:
-        f.write(cleaned_data)
+    if args.do_clean == 'no':
+        err = check_json_file(args.input_filepath)
+        print(err or f"'{args.input_filepath}' is valid JSON, it was not changed.")
+        return
 
-    print(f"Cleaned JSON saved to {args.input}")
+    quoted, err = repair_json_file(args.input_filepath)
+    if err:
+        print(err)
+        exit(1)
+    print(f"Cleaned JSON saved to {args.input_filepath} ({quoted} property names quoted)")
 
 if __name__ == "__main__":
     main()
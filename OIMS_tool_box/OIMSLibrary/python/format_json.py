@@ -2,11 +2,14 @@
 #*=============================================================================
 #* File      : format_json.py
 #* Author    : Gideon Kruseman <g.kruseman@cgiar.org>
-#* Version   : 1.0
+#* Version   : 1.3
 #* Date      : 10/23/2023 9:41:58 AM
 #* Changed   :
 #* Changed by:
-#* Remarks   :
+#* Remarks   : batch mode over files, directories and globs; files are replaced atomically;
+#*             large files are re-indented as a token stream; files already in canonical form are
+#*             not written, and are skipped by later runs through a manifest (OIMS_format_manifest.py);
+#*             streamed and parsed files are formatted the same
 #
 """
 *! <%GTREE 0 tool documentation%>
@@ -14,9 +17,47 @@ This python code is intended to read a json file and make sure all the indentati
 
 *! <%GTREE 0.1 technical information%>
 language: python
-version: 1.0.0
+version: 1.3.0
 data: October 2023
 author: Gideon Kruseman <g.kruseman@cgiar.org>
+
+*! <%GTREE 0.2 batch mode and safe replacement%>
+--json_file_path takes any number of files, directories (all *.json files below them) and globs.
+Files are formatted in parallel worker processes with --workers.
+
+The formatted JSON is written to a temporary file next to the original, which then replaces the
+original in one rename (os.replace). When formatting fails or the process is interrupted, the
+original file is left as it was.
+
+*! <%GTREE 0.3 streaming%>
+Files of at least --stream_threshold MB are not parsed into Python objects: reindent_stream() of
+OIMS_json_io.py reads them in chunks, checks the JSON grammar token by token and writes every token
+with the new indentation, so memory use does not depend on the size of the file. Strings and numbers
+are written as for the parsed smaller files (non-ASCII characters escaped, numbers in the notation
+of the codec), so the result does not depend on --stream_threshold. The only difference is an object
+with a duplicate key: parsing keeps the last value, streaming all of them. With --stream_threshold 0
+every file is streamed.
+
+*! <%GTREE 0.4 canonical form and incremental runs%>
+The canonical form of a file is the formatted JSON with the given indent and, with --sort_keys, the
+keys of every object sorted. Sorting keeps the GTREE comment keys ("\\" and "//") at the top of
+their object and never reorders arrays, so the GTREE outline of a file is preserved. Streaming does
+not reorder keys, so with --sort_keys every file is parsed.
+
+A file that is already in canonical form is not written, so its modification time is kept. Every
+file in canonical form is recorded in a manifest with its size, modification time and content hash.
+A later run with the same options skips files whose size and modification time are unchanged
+without reading them, and files whose content hash is unchanged without parsing them, so the time of
+a run is proportional to the number of changed files.
+
+*! <%GTREE 0.5  command line parameters%>
+json_file_path     :  JSON files, directories or globs to format
+indent             :  number of spaces for indentation [optional, default is 4]
+workers            :  number of worker processes, 0 is the number of cores [optional, default is 1]
+stream_threshold   :  size in MB from which files are streamed [optional, default is 100]
+sort_keys          :  flag: sort the keys of every object, GTREE comment keys first
+manifest           :  manifest file [optional, default is ~/.OIMS_cache/format_json_manifest.json]
+no_manifest        :  flag: read every file, without using or updating the manifest
 """
 #
 #*=============================================================================
@@ -24,39 +65,197 @@ author: Gideon Kruseman <g.kruseman@cgiar.org>
 #*! <%GTREE 1 initialization%>
 #*! <%GTREE 1.1 import libraries%>
 import argparse
-import json
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import OIMS_json_io
+from OIMS_json_io import default_chunk_size, reindent_stream, replace_file
+from OIMS_format_manifest import FormatManifest, default_manifest_path
+from OIMS_schema_resolver import collect_metadata_files
+
+#*! <%GTREE 1.2 defaults%>
+default_indent = 4
+default_stream_threshold_mb = 100
+# keys of the GTREE comments, which stay at the top of their object
+gtree_comment_keys = ('\\', '//')
 
 #*! <%GTREE 2 define functions%>
-#*! <%GTREE 2.1 format json functions%>
-def format_json(json_file_path, indent=4):
-    try:
-        # Read the JSON file
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
+#*! <%GTREE 2.1 function to put a file in canonical form%>
+def canonical_form(data, sort_keys=False):
+    """Return data with the keys of every object in canonical order.
+
+    With sort_keys the GTREE comment keys ("\\" and "//") stay first, in their order, followed by the
+    other keys in sorted order; without it data is returned as it is. Arrays, including the GTREE
+    comment arrays, keep their order.
+    """
+    if not sort_keys:
+        return data
+    if isinstance(data, dict):
+        keys = [key for key in data if key in gtree_comment_keys]
+        keys += sorted(key for key in data if key not in gtree_comment_keys)
+        return {key: canonical_form(data[key], sort_keys) for key in keys}
+    if isinstance(data, list):
+        return [canonical_form(value, sort_keys) for value in data]
+    return data
+
+class _HashedFile:
+    """Binary file wrapper that computes the SHA-256 hash of what is read from or written to it."""
+
+    def __init__(self, file):
+        self.file = file
+        self.hash = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.hash.update(data)
+        return data
 
-        # Write the formatted JSON back to the file
-        with open(json_file_path, 'w') as file:
-            json.dump(data, file, indent=indent)
+    def write(self, data):
+        self.hash.update(data)
+        return self.file.write(data)
 
-        print(f"JSON file '{json_file_path}' has been formatted with an indentation of {indent} spaces.")
+def _file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        hashed_file = _HashedFile(file)
+        while hashed_file.read(default_chunk_size):
+            pass
+    return hashed_file.hash.hexdigest()
+
+#*! <%GTREE 2.2 format json functions%>
+def reformat_json_file(json_file_path, indent=default_indent, stream_threshold_mb=default_stream_threshold_mb,
+                       sort_keys=False, known_sha256=None):
+    """Put one JSON file in canonical form and return (status, message, SHA-256 hash of the result).
+
+    status is 'formatted', 'unchanged' when the file already was in canonical form (it is not written,
+    so its modification time is kept) or 'failed'. A file whose contents have the hash known_sha256 is
+    known to be in canonical form and is not parsed.
+    """
+    unchanged_message = f"JSON file '{json_file_path}' is already formatted with an indentation of {indent} spaces."
+    try:
+        if os.path.getsize(json_file_path) >= stream_threshold_mb * 1e6 and not sort_keys:
+            if known_sha256 is not None and _file_hash(json_file_path) == known_sha256:
+                return 'unchanged', unchanged_message, known_sha256
+            hashes = {}
+            def write(target):
+                # the source is closed before it is replaced, which Windows requires
+                with open(json_file_path, 'rb') as source:
+                    source, target = _HashedFile(source), _HashedFile(target)
+                    reindent_stream(source, target, indent, canonical=True)
+                hashes['input'], hashes['output'] = source.hash.hexdigest(), target.hash.hexdigest()
+                return hashes['input'] != hashes['output']
+            changed = replace_file(json_file_path, write)
+            sha256 = hashes['output']
+        else:
+            # Read the JSON file
+            with open(json_file_path, 'rb') as json_file:
+                content = json_file.read()
+            sha256 = hashlib.sha256(content).hexdigest()
+            if sha256 == known_sha256:
+                return 'unchanged', unchanged_message, sha256
+            data = OIMS_json_io.loads(content)
+            # Write the formatted JSON to a temporary file that replaces the original, unless it is the same
+            text = OIMS_json_io.codec.dumps(canonical_form(data, sort_keys), indent)
+            changed = text != content
+            if changed:
+                def write(target):
+                    target.write(text)
+                    return True
+                replace_file(json_file_path, write)
+                sha256 = hashlib.sha256(text).hexdigest()
+        if not changed:
+            return 'unchanged', unchanged_message, sha256
+        return 'formatted', f"JSON file '{json_file_path}' has been formatted with an indentation of {indent} spaces.", sha256
     except FileNotFoundError:
-        print(f"File '{json_file_path}' not found.")
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {str(e)}")
+        return 'failed', f"File '{json_file_path}' not found.", None
+    except ValueError as e:
+        # json.JSONDecodeError, UnicodeDecodeError and the grammar errors of reindent_stream
+        return 'failed', f"Error decoding JSON in '{json_file_path}': {str(e)}", None
 
-#*! <%GTREE 3 run code%>
+def format_json(json_file_path, indent=default_indent, stream_threshold_mb=default_stream_threshold_mb, sort_keys=False):
+    status, message, _ = reformat_json_file(json_file_path, indent, stream_threshold_mb, sort_keys)
+    print(message)
+    return status != 'failed'
 
-if __name__ == "__main__":
+def _format_job(job):
+    return reformat_json_file(*job)
+
+#*! <%GTREE 2.3 function to format many files%>
+def format_json_files(file_paths, indent=default_indent, workers=1, stream_threshold_mb=default_stream_threshold_mb,
+                      sort_keys=False, manifest=None):
+    """Format every file and yield (file path, status, message); with workers > 1 in worker processes.
+
+    With a FormatManifest, files recorded as canonical with the same options and not modified since
+    are skipped without being read (status 'skipped'), and the manifest is updated and saved.
+    """
+    options = {'indent': indent, 'sort_keys': sort_keys, 'codec': OIMS_json_io.codec.name}
+    jobs = []
+    try:
+        for file_path in file_paths:
+            if manifest is not None and manifest.is_unchanged(file_path, options):
+                yield file_path, 'skipped', f"JSON file '{file_path}' is unchanged since it was formatted."
+            else:
+                known_sha256 = manifest.known_hash(file_path, options) if manifest is not None else None
+                jobs.append((file_path, indent, stream_threshold_mb, sort_keys, known_sha256))
+        if workers == 1 or len(jobs) < 2:
+            results = map(_format_job, jobs)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(_format_job, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+        try:
+            for job, (status, message, sha256) in zip(jobs, results):
+                if manifest is not None:
+                    if status == 'failed':
+                        manifest.forget(job[0])
+                    else:
+                        manifest.record(job[0], options, sha256)
+                yield job[0], status, message
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    finally:
+        if manifest is not None:
+            manifest.save()
+
+#*! <%GTREE 3 run code%>
+def main():
     #*! <%GTREE 3.1  read command line arguments%>
-    parser = argparse.ArgumentParser(description="Format a JSON file with proper indentation.")
-    parser.add_argument("--json_file_path", required=True, help="Path to the JSON file.")
-    parser.add_argument("--indent", type=int, default=4, help="Number of spaces for indentation (default is 4).")
+    parser = argparse.ArgumentParser(description="Format JSON files with proper indentation.")
+    parser.add_argument("--json_file_path", required=True, nargs="+", help="JSON files, directories or globs.")
+    parser.add_argument("--indent", type=int, default=default_indent, help="Number of spaces for indentation (default is 4).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 is the number of cores).")
+    parser.add_argument("--stream_threshold", type=float, default=default_stream_threshold_mb,
+                        help="Size in MB from which files are re-indented as a token stream (default is 100).")
+    parser.add_argument("--sort_keys", action="store_true",
+                        help="Sort the keys of every object; the GTREE comment keys stay first.")
+    parser.add_argument("--manifest", default=default_manifest_path, help="Manifest of the files in canonical form.")
+    parser.add_argument("--no_manifest", action="store_true", help="Read every file, without using or updating the manifest.")
 
     args = parser.parse_args()
 
-    #*! <%GTREE 3.2  for,at json%>
-    format_json(args.json_file_path, args.indent)
+    #*! <%GTREE 3.2  format json%>
+    # paths without wildcards that do not exist are passed on, so they are reported as not found
+    missing = [path for path in args.json_file_path if not glob.has_magic(path) and not os.path.exists(path)]
+    file_paths = collect_metadata_files(args.json_file_path) + missing
+    if not file_paths:
+        print(f"No JSON files found in {' '.join(args.json_file_path)}.")
+        return
+    manifest = None if args.no_manifest else FormatManifest(args.manifest)
+    counts = dict.fromkeys(('formatted', 'unchanged', 'skipped', 'failed'), 0)
+    for file_path, status, message in format_json_files(file_paths, args.indent, args.workers or os.cpu_count() or 1,
+                                                        args.stream_threshold, args.sort_keys, manifest):
+        if status != 'skipped' or len(file_paths) == 1:
+            print(message)
+        counts[status] += 1
+    if len(file_paths) > 1:
+        print(f"{len(file_paths)} files: {counts['formatted']} formatted, {counts['unchanged']} already formatted, "
+              f"{counts['skipped']} unchanged since the last run, {counts['failed']} failed.")
+
+if __name__ == "__main__":
+    main()
 
 
 
-#*============================   End Of File   ================================
\ No newline at end of file
+#*============================   End Of File   ================================
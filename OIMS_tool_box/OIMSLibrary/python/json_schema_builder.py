@@ -2,11 +2,16 @@
 #=============================================================================
 # File      : json_schema_builder.py
 # Author    : Gideon Kruseman <g.kruseman@cgiar.org>
-# Version   : 1.0
+# Version   : 1.2.1
 # Date      : 10/23/2023 3:01:10 PM
 # Changed   :
 # Changed by:
-# Remarks   :
+# Remarks   : the write is skipped when the content object, the builder version and the output are
+#             unchanged (OIMS_schema_build_cache.py), the JSON file is always checked against the
+#             schema; --no_build_cache always rebuilds.
+#             The written schemas are compacted (OIMS_schema_compaction.py); --inline_subschemas
+#             writes them as generated
+#             --OIMS_metametadata_file_path is optional and deprecated, it is not read
 # using this script would need to have the following packages installed:
 #       json
 #       jsonschema
@@ -25,14 +30,22 @@ import json
 import jsonschema
 import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+import OIMS_json_io
+from OIMS_schema_compaction import compact_schema
+from OIMS_schema_build_cache import SchemaBuildCache, build_key, default_cache_dir as default_build_cache_dir
+from OIMS_validator_registry import schema_content_hash, validator_registry
+
+# Version of the schema generation; a new version invalidates the build cache
+schema_builder_version = "1.2"
 
 def load_json_file(file_path, default=None):
     """Load a JSON file from a specified path. Return the default if not found."""
     if file_path is None:
         return default
     try:
-        with open(file_path, "r") as f:
-            return json.load(f)
+        return OIMS_json_io.load_json_file(file_path)
     except FileNotFoundError:
         if default is not None:
             return default
@@ -48,8 +61,7 @@ def load_json_file(file_path, default=None):
 # Function to load metametadata from a separate file
 def load_metametadata(file_path):
     try:
-        with open(file_path, "r") as meta_file:
-            metametadata = json.load(meta_file)
+        metametadata = OIMS_json_io.load_json_file(file_path)
         return metametadata
     except FileNotFoundError:
         print(f"Metametadata file '{file_path}' not found.")
@@ -58,19 +70,115 @@ def load_metametadata(file_path):
         print(f"Error decoding metametadata JSON: {e}")
         return {}
 
-def generate_schema(json_data, metametadata_file, oims_content_object):
-    # Load metametadata from the separate file
-    metametadata = load_metametadata(metametadata_file)
+def find_content_object(json_data, oims_content_object):
+    """Return the item in "OIMS_content" that matches the specified "OIMS_content_object", or None."""
+    for item in json_data["OIMS"]["OIMS_content"]:
+        if item.get("OIMS_content_object") == oims_content_object:
+            return item
+    return None
+
+def build_attribute_schema(metadata_obj):
+    """Return the property entry of the schema for one attribute record of the metametadata."""
+    attribute_name = metadata_obj.get("attribute_name")
 
-    # Use the default schema as a base
-    json_schema = default_schema()
+    # Create a nested dictionary to store attribute metadata
+    attribute_metadata = {}
+
+    # Add individual metadata properties to the attribute_metadata dictionary
 
-    # Find the item in "OIMS_content" that matches the specified "OIMS_content_object"
-    selected_item = None
+    attribute_metadata["description"] = metadata_obj.get("attribute_description")
+
+    if metadata_obj.get("multiple"):
+        # Handle the case when "multiple" is true
+        attribute_metadata["type"] = "array"
+
+        if metadata_obj.get("data_type") == "compound_object":
+            if metadata_obj.get("data_type_class") == "compound":
+                attribute_metadata["items"] = {
+                "type": "object",
+                "properties": {}
+                }
+                if metadata_obj.get("attribute_value_elements"):
+                    # Create properties for attribute value elements
+                    for value_element in metadata_obj.get("attribute_value_elements"):
+                        attribute_metadata["items"]["properties"][value_element] = {"type": "string"}
+                else:
+                    # Raise an error if it doesn't meet the dependency
+                    raise ValueError(f"evaluating {attribute_name} of data_type_class: {metadata_obj.get('data_type_class')} expecting values for 'attribute_value_elements'")
+            else:
+                # Raise an error if it doesn't meet the dependency
+                raise ValueError(f"evaluating {attribute_name} Invalid combination of data_type: {metadata_obj.get('data_type')} and data_type_class: {metadata_obj.get('data_type_class')}")
+
+        elif metadata_obj.get("data_type") == "boolean":
+            attribute_metadata["items"] = {
+                "type": "boolean"
+            }
+        elif metadata_obj.get("data_type") == "integer" or metadata_obj.get("data_type") == "float":
+            attribute_metadata["items"] = {
+                "type": "number"
+            }
+        elif metadata_obj.get("controlled_vocabulary"):
+            attribute_metadata["items"] = {
+                "type": "string"
+            }
+        else :
+            attribute_metadata["items"] = {
+                "type": "string"
+            }
+
+    else:
+        if metadata_obj.get("data_type") == "compound_object":
+            if metadata_obj.get("data_type_class") == "compound":
+                attribute_metadata["type"] = "object"
+                attribute_metadata["properties"] = {}
+                if metadata_obj.get("attribute_value_elements"):
+                    # Create properties for attribute value elements
+                    for value_element in metadata_obj.get("attribute_value_elements"):
+                        attribute_metadata["properties"][value_element] = {"type": "string"}
+                else:
+                    # Raise an error if it doesn't meet the dependency
+                    raise ValueError(f"evaluating {attribute_name} of data_type_class: {metadata_obj.get('data_type_class')} expecting values for 'attribute_value_elements'")
+
+            else:
+                # Raise an error if it doesn't meet the dependency
+                raise ValueError(f"Invalid combination of data_type: {metadata_obj.get('data_type')} and data_type_class: {metadata_obj.get('data_type_class')}")
+
+
+        elif metadata_obj.get("data_type") == "boolean":
+            attribute_metadata["type"] = "boolean"
+        elif metadata_obj.get("data_type") == "integer" or metadata_obj.get("data_type") == "float":
+            attribute_metadata["type"] = "number"
+        elif metadata_obj.get("controlled_vocabulary"):
+            attribute_metadata["type"] = "string"
+        else :
+            attribute_metadata["type"] = "string"
+
+    if metadata_obj.get("controlled_vocabulary"):
+        # Create an "enum" property and populate it with vocabulary_element_name values
+        attribute_metadata["enum"] = [element.get("vocabulary_element_name") for element in metadata_obj.get("controlled_vocabulary", [])]
+
+    return attribute_metadata
+
+def index_content_objects(json_data):
+    """Return {OIMS_content_object: item} for the items in "OIMS_content"; the first item of a name wins."""
+    content_objects = {}
     for item in json_data["OIMS"]["OIMS_content"]:
-        if item.get("OIMS_content_object") == oims_content_object:
-            selected_item = item
-            break
+        content_objects.setdefault(item.get("OIMS_content_object"), item)
+    return content_objects
+
+def generate_schema(json_data, metametadata_file, oims_content_object, attribute_cache=None):
+    """Generate the schema for one OIMS_content_object.
+
+    attribute_cache, if given, maps the content hash of an attribute record to its property entry.
+    Entries found there are reused; afterwards it holds the entries of this build only.
+    The schema is built from the content item alone; metametadata_file is not read.
+    """
+    return build_content_object_schema(find_content_object(json_data, oims_content_object), attribute_cache)
+
+def build_content_object_schema(selected_item, attribute_cache=None):
+    """Generate the schema from the OIMS_content item of a content object; None gives the default schema."""
+    # Use the default schema as a base
+    json_schema = default_schema()
 
     if selected_item:
         # Access the "metadata" list from the nested structure
@@ -81,87 +189,21 @@ def generate_schema(json_data, metametadata_file, oims_content_object):
 
         # Initialize the required properties dictionary
         required_metadata = []
+        used_attributes = {}
         # Iterate over each metadata object in the list
         for metadata_obj in metadata_list:
             # Extract the attribute name from the metadata object
             attribute_name = metadata_obj.get("attribute_name")
 
             if attribute_name:
-                # Create a nested dictionary to store attribute metadata
-                attribute_metadata = {}
-
-                # Add individual metadata properties to the attribute_metadata dictionary
-
-                attribute_metadata["description"] = metadata_obj.get("attribute_description")
-
-                if metadata_obj.get("multiple"):
-                    # Handle the case when "multiple" is true
-                    attribute_metadata["type"] = "array"
-
-                    if metadata_obj.get("data_type") == "compound_object":
-                        if metadata_obj.get("data_type_class") == "compound":
-                            attribute_metadata["items"] = {
-                            "type": "object",
-                            "properties": {}
-                            }
-                            if metadata_obj.get("attribute_value_elements"):
-                                # Create properties for attribute value elements
-                                for value_element in metadata_obj.get("attribute_value_elements"):
-                                    attribute_metadata["items"]["properties"][value_element] = {"type": "string"}
-                            else:
-                                # Raise an error if it doesn't meet the dependency
-                                raise ValueError(f"evaluating {attribute_name} of data_type_class: {metadata_obj.get('data_type_class')} expecting values for 'attribute_value_elements'")
-                        else:
-                            # Raise an error if it doesn't meet the dependency
-                            raise ValueError(f"evaluating {attribute_name} Invalid combination of data_type: {metadata_obj.get('data_type')} and data_type_class: {metadata_obj.get('data_type_class')}")
-
-                    elif metadata_obj.get("data_type") == "boolean":
-                        attribute_metadata["items"] = {
-                            "type": "boolean"
-                        }
-                    elif metadata_obj.get("data_type") == "integer" or metadata_obj.get("data_type") == "float":
-                        attribute_metadata["items"] = {
-                            "type": "number"
-                        }
-                    elif metadata_obj.get("controlled_vocabulary"):
-                        attribute_metadata["items"] = {
-                            "type": "string"
-                        }
-                    else :
-                        attribute_metadata["items"] = {
-                            "type": "string"
-                        }
-
+                if attribute_cache is None:
+                    attribute_metadata = build_attribute_schema(metadata_obj)
                 else:
-                    if metadata_obj.get("data_type") == "compound_object":
-                        if metadata_obj.get("data_type_class") == "compound":
-                            attribute_metadata["type"] = "object"
-                            attribute_metadata["properties"] = {}
-                            if metadata_obj.get("attribute_value_elements"):
-                                # Create properties for attribute value elements
-                                for value_element in metadata_obj.get("attribute_value_elements"):
-                                    attribute_metadata["properties"][value_element] = {"type": "string"}
-                            else:
-                                # Raise an error if it doesn't meet the dependency
-                                raise ValueError(f"evaluating {attribute_name} of data_type_class: {metadata_obj.get('data_type_class')} expecting values for 'attribute_value_elements'")
-
-                        else:
-                            # Raise an error if it doesn't meet the dependency
-                            raise ValueError(f"Invalid combination of data_type: {metadata_obj.get('data_type')} and data_type_class: {metadata_obj.get('data_type_class')}")
-
-
-                    elif metadata_obj.get("data_type") == "boolean":
-                        attribute_metadata["type"] = "boolean"
-                    elif metadata_obj.get("data_type") == "integer" or metadata_obj.get("data_type") == "float":
-                        attribute_metadata["type"] = "number"
-                    elif metadata_obj.get("controlled_vocabulary"):
-                        attribute_metadata["type"] = "string"
-                    else :
-                        attribute_metadata["type"] = "string"
-
-                if metadata_obj.get("controlled_vocabulary"):
-                    # Create an "enum" property and populate it with vocabulary_element_name values
-                    attribute_metadata["enum"] = [element.get("vocabulary_element_name") for element in metadata_obj.get("controlled_vocabulary", [])]
+                    attribute_hash = schema_content_hash(metadata_obj)
+                    attribute_metadata = attribute_cache.get(attribute_hash)
+                    if attribute_metadata is None:
+                        attribute_metadata = build_attribute_schema(metadata_obj)
+                    used_attributes[attribute_hash] = attribute_metadata
 
                 if metadata_obj.get("requirement_level") == "required":
                     # Set the property as required in the metadata schema
@@ -173,6 +215,10 @@ def generate_schema(json_data, metametadata_file, oims_content_object):
         json_schema["properties"]["OIMS"]["properties"]["OIMS_content"]["items"]["properties"]["OIMS_content_object_properties"]["items"]["properties"]["metadata"]["items"]["properties"] = metadata_properties
         json_schema["properties"]["OIMS"]["properties"]["OIMS_content"]["items"]["properties"]["OIMS_content_object_properties"]["items"]["properties"]["metadata"]["items"]["required"] = required_metadata
 
+        if attribute_cache is not None:
+            attribute_cache.clear()
+            attribute_cache.update(used_attributes)
+
     # Return the generated schema
     return json_schema
 
@@ -343,18 +389,104 @@ def default_schema():
     }
     return json_schema
 
-def validate_against_schema(data, schema, schema_name):
-    """Validate data against a provided schema."""
+def check_against_schema(data, schema, schema_name):
+    """Validate data against a provided schema and return (valid, message)."""
     try:
-        jsonschema.validate(data, schema)
-        print(f"JSON data is valid against the {schema_name}.")
+        validator_registry.validate(data, schema)
+        return True, f"JSON data is valid against the {schema_name}."
     except jsonschema.exceptions.ValidationError as e:
-        print(f"JSON data is not valid against the {schema_name}: {e}")
-        exit(1)
+        return False, f"JSON data is not valid against the {schema_name}: {e}"
     except jsonschema.exceptions.SchemaError as e:
-        print(f"Error in the schema itself: {e}")
+        return False, f"Error in the schema itself: {e}"
+
+def validate_against_schema(data, schema, schema_name):
+    """Validate data against a provided schema."""
+    valid, message = check_against_schema(data, schema, schema_name)
+    print(message)
+    if not valid:
         exit(1)
 
+def schema_output_path(json_file_path, oims_content_object=None):
+    """Return <base>.schema.json, or <base>_<OIMS_content_object>.schema.json when building several content objects."""
+    base = os.path.splitext(json_file_path)[0]
+    if oims_content_object is None:
+        return base + ".schema.json"
+    return f"{base}_{oims_content_object}.schema.json"
+
+def build_schema_file(json_data, oims_content_object, content_item, output_file_path, compact_output=False, build_cache=None,
+                      inline_subschemas=False):
+    """Generate, write and check the schema of one content object and return (valid, messages).
+
+    The schema is compacted with compact_schema() unless inline_subschemas is set. When build_cache records
+    an identical build of an unchanged output file, the schema is assembled from the cached attribute
+    entries and not written again. json_data is always checked against the schema: the build key only
+    covers the content item, and the check reads all of json_data.
+    """
+    key = build_key(content_item, oims_content_object, schema_builder_version,
+                    {"compact_output": compact_output, "inline_subschemas": inline_subschemas})
+    up_to_date = build_cache is not None and build_cache.is_current(output_file_path, key)
+
+    attribute_cache = build_cache.attribute_schemas(output_file_path, schema_builder_version) if build_cache is not None else {}
+    try:
+        schema = build_content_object_schema(content_item, attribute_cache)
+    except ValueError as e:
+        return False, [f"{oims_content_object}: {e}"]
+
+    if up_to_date:
+        messages = [f"JSON schema '{output_file_path}' is up to date"]
+    else:
+        written_schema = schema if inline_subschemas else compact_schema(schema)
+        # Write the generated schema to a JSON file
+        try:
+            OIMS_json_io.dump_json_file(written_schema, output_file_path, indent=2, compact=compact_output)
+        except IOError as e:
+            return False, [f"File writing error: {e}"]
+        messages = [f"JSON schema has been written to '{output_file_path}'"]
+
+    # the compacted schema accepts the same data, the generated one validates without resolving $refs
+    valid, message = check_against_schema(json_data, schema, f"generated schema for {oims_content_object}")
+    messages.append(message)
+    if valid and build_cache is not None and not up_to_date:
+        build_cache.store(output_file_path, key, schema_builder_version, attribute_cache)
+    return valid, messages
+
+# Build several content objects, optionally in worker processes
+_worker_state = {}
+
+def _init_build_worker(json_data, compact_output, build_cache_dir, inline_subschemas=False):
+    _worker_state['json_data'] = json_data
+    _worker_state['content_objects'] = index_content_objects(json_data)
+    _worker_state['compact_output'] = compact_output
+    _worker_state['build_cache'] = SchemaBuildCache(build_cache_dir) if build_cache_dir else None
+    _worker_state['inline_subschemas'] = inline_subschemas
+
+def _build_worker_schema(job):
+    oims_content_object, output_file_path = job
+    return build_schema_file(_worker_state['json_data'], oims_content_object,
+                             _worker_state['content_objects'].get(oims_content_object), output_file_path,
+                             _worker_state['compact_output'], _worker_state['build_cache'],
+                             _worker_state['inline_subschemas'])
+
+def build_schema_files(json_data, jobs, compact_output=False, build_cache_dir=None, workers=1, inline_subschemas=False):
+    """Build the schema of every (OIMS_content_object, output file path) job and yield (job, valid, messages).
+
+    The JSON data is indexed once per process; with workers > 1 the builds are spread over worker processes.
+    """
+    if workers == 1 or len(jobs) < 2:
+        _init_build_worker(json_data, compact_output, build_cache_dir, inline_subschemas)
+        results = map(_build_worker_schema, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_build_worker,
+                                       initargs=(json_data, compact_output, build_cache_dir, inline_subschemas))
+        results = executor.map(_build_worker_schema, jobs)
+    try:
+        for job, (valid, messages) in zip(jobs, results):
+            yield job, valid, messages
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
 
 def main():
     # Create an argument parser
@@ -363,39 +495,58 @@ def main():
     # Add an argument for the JSON file path
     parser.add_argument("--json_file_path", required=True, help="Path to the JSON file")
     parser.add_argument("--json_schema_file_path", required=False, help="Path to a higher level JSON schema file")
-    parser.add_argument("--OIMS_metametadata_file_path", required=True, help="Path to the underlying metametadata file")
-    parser.add_argument("--OIMS_content_object", required=True, help="OIMS")
+    parser.add_argument("--OIMS_metametadata_file_path", required=False,
+                        help="Deprecated and ignored, the schema is built from the content object")
+    parser.add_argument("--OIMS_content_object", required=True, nargs="+",
+                        help="One or more OIMS_content_object names, or 'all' for every content object in the JSON file. "
+                             "With more than one the schemas are written to <name>_<OIMS_content_object>.schema.json")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 is the number of cores)")
+    parser.add_argument("--compact_output", action="store_true", help="Write the schema without indentation and whitespace")
+    parser.add_argument("--inline_subschemas", action="store_true",
+                        help="Keep repeated enum and properties inline and the empty if/then/else of the default schema")
+    parser.add_argument("--build_cache_dir", default=default_build_cache_dir, help="Directory of the build cache")
+    parser.add_argument("--no_build_cache", action="store_true", help="Always generate and write the schema")
 
     # Parse the command-line arguments
     args = parser.parse_args()
+    if args.OIMS_metametadata_file_path is not None:
+        print("Note: --OIMS_metametadata_file_path is deprecated and ignored, the schema is built from the content object")
 
     json_data = load_json_file(args.json_file_path)
     json_schema = load_json_file(args.json_schema_file_path, default=default_schema()) if args.json_schema_file_path else default_schema()
-    metametadata_file = args.OIMS_metametadata_file_path
-    OIMS_content_object = args.OIMS_content_object
 
-    # Derive the output file path
-    output_file_path = os.path.splitext(args.json_file_path)[0] + ".schema.json"
+    content_objects = index_content_objects(json_data)
+    if args.OIMS_content_object == ["all"]:
+        OIMS_content_objects = [name for name in content_objects if name]
+    else:
+        OIMS_content_objects = list(dict.fromkeys(args.OIMS_content_object))
+    for name in OIMS_content_objects:
+        if name not in content_objects:
+            print(f"Warning: OIMS_content_object '{name}' not found in '{args.json_file_path}', the default schema is written")
+
+    # Derive the output file paths
+    if len(OIMS_content_objects) == 1 and args.OIMS_content_object != ["all"]:
+        jobs = [(OIMS_content_objects[0], schema_output_path(args.json_file_path))]
+    else:
+        jobs = [(name, schema_output_path(args.json_file_path, name)) for name in OIMS_content_objects]
 
     validate_against_schema(json_data, json_schema, "higher level schema")
 
-    schema = generate_schema(json_data, metametadata_file, OIMS_content_object)
-
-    # Write the generated schema to a JSON file
-    try:
-        with open(output_file_path, "w") as output_file:
-            json.dump(schema, output_file, indent=2)
-    except IOError as e:
-        print(f"File writing error: {e}")
+    build_cache_dir = None if args.no_build_cache else args.build_cache_dir
+    failed = 0
+    for job, valid, messages in build_schema_files(json_data, jobs, args.compact_output, build_cache_dir,
+                                                   args.workers or os.cpu_count() or 1, args.inline_subschemas):
+        for message in messages:
+            print(message)
+        failed += not valid
+    if failed:
+        if len(jobs) > 1:
+            print(f"{failed} of {len(jobs)} schemas failed")
         exit(1)
 
-    print(f"JSON schema has been written to '{output_file_path}'")
-
-    validate_against_schema(json_data, schema, "generated schema")
-
 
 # Generate the JSON schema
 if __name__ == "__main__":
     main()
 
-#*============================   End Of File   ================================
\ No newline at end of file
+#*============================   End Of File   ================================
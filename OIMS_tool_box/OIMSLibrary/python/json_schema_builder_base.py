@@ -1,13 +1,24 @@
-
-
-
 import json
 import jsonschema
 import argparse
 import os
+import random
+
+import OIMS_json_io
+
+# Sampling of array elements for the inference of the items schema:
+#   all        every element
+#   first_n    the first sample_size elements
+#   reservoir  a uniform random sample of sample_size elements
+sampling_strategies = ("all", "first_n", "reservoir")
+default_sampling = "all"
+default_sample_size = 1000
+_type_order = ("null", "boolean", "integer", "number", "string", "array", "object")
+# interned shapes of the JSON scalars, in the order SchemaInference interns them
+_scalar_shapes = {type(None): 0, bool: 1, int: 2, float: 3, str: 4}
 
 # Function to generate JSON schema from JSON data
-def generate_json_schema(json_data):
+def generate_json_schema(json_data, sampling=default_sampling, sample_size=default_sample_size, seed=None):
     schema = {
         "$schema": "http://json-schema.org/draft-07/schema#",
         "type": "object",
@@ -15,94 +26,259 @@ def generate_json_schema(json_data):
         "required": []
     }
 
+    inference = SchemaInference(sampling, sample_size, random.Random(seed))
     for key, value in json_data.items():
-        schema["properties"][key] = infer_schema(value)
+        schema["properties"][key] = inference.infer(value)
         schema["required"].append(key)
 
     return schema
 
-def infer_schema(data):
-    if isinstance(data, dict):
-        properties = {}
-        required = []
-        for key, value in data.items():
-            properties[key] = infer_schema(value)
-            required.append(key)
-        return {
-            "type": "object",
-            "properties": properties,
-            "required": required
-        }
-    elif isinstance(data, list):
-        if len(data) == 0:
-            return {
-                "type": "array"
-            }
+def sample_elements(data, sampling=default_sampling, sample_size=default_sample_size, rng=random):
+    """Return the elements of an array that the items schema is inferred from, in their original order."""
+    if sampling == "all" or len(data) <= sample_size:
+        return data
+    if sampling == "first_n":
+        return data[:sample_size]
+    if sampling == "reservoir":
+        return reservoir_sample(data, sample_size, rng)
+    raise ValueError(f"Unknown sampling strategy '{sampling}', expected one of {', '.join(sampling_strategies)}")
+
+def reservoir_sample(elements, sample_size, rng=random):
+    """Return a uniform random sample of sample_size elements of an iterable, in their original order.
+
+    A list is sampled by index in O(sample_size); other iterables are read once with reservoir sampling.
+    """
+    if isinstance(elements, list):
+        return [elements[index] for index in sorted(rng.sample(range(len(elements)), sample_size))]
+    reservoir = []
+    for number, element in enumerate(elements):
+        if number < sample_size:
+            reservoir.append((number, element))
         else:
-            items_schema = infer_schema(data[0])
-            return {
-                "type": "array",
-                "items": items_schema
-            }
-    elif isinstance(data, int):
-        return {
-            "type": "integer"
-        }
-    elif isinstance(data, float):
-        return {
-            "type": "number"
-        }
-    elif isinstance(data, str):
-        return {
-            "type": "string"
-        }
-    elif isinstance(data, bool):
-        return {
-            "type": "boolean"
-        }
-    elif data is None:
-        return {
-            "type": "null"
-        }
-    else:
+            slot = rng.randrange(number + 1)
+            if slot < sample_size:
+                reservoir[slot] = (number, element)
+    return [element for number, element in sorted(reservoir, key=lambda entry: entry[0])]
+
+def merge_schemas(first, second):
+    """Return a schema that accepts everything either inferred schema accepts.
+
+    Types are united, object properties are united with the schemas of common properties merged,
+    required is the intersection, and the items schemas of arrays are merged. The merge walks both
+    schemas with an explicit stack, so deep schemas do not hit the recursion limit; the inputs are not
+    modified.
+    """
+    result = {}
+    pending = [(first, second, result, "schema")]
+    while pending:
+        first, second, target, target_key = pending.pop()
+        if first is second:
+            target[target_key] = first
+            continue
+        if not first or not second:
+            # a schema without type accepts anything
+            target[target_key] = {}
+            continue
+        first_types = _types(first)
+        second_types = _types(second)
+        types = [name for name in _type_order if name in first_types or name in second_types]
+        if "number" in types and "integer" in types:
+            types.remove("integer")
+        merged = {"type": types[0] if len(types) == 1 else types}
+        target[target_key] = merged
+
+        if "object" in first_types and "object" in second_types:
+            properties = dict(first.get("properties", {}))
+            for key, value in second.get("properties", {}).items():
+                if key in properties:
+                    pending.append((properties[key], value, properties, key))
+                properties[key] = value
+            second_required = set(second.get("required", []))
+            merged["properties"] = properties
+            merged["required"] = [key for key in first.get("required", []) if key in second_required]
+        elif "object" in types:
+            source = first if "object" in first_types else second
+            merged["properties"] = source.get("properties", {})
+            merged["required"] = source.get("required", [])
+
+        if "items" in first and "items" in second:
+            merged["items"] = None
+            pending.append((first["items"], second["items"], merged, "items"))
+        elif "items" in first or "items" in second:
+            merged["items"] = first.get("items", second.get("items"))
+    return result["schema"]
+
+def _types(schema):
+    schema_type = schema.get("type")
+    return set(schema_type) if isinstance(schema_type, list) else {schema_type}
+
+class SchemaInference:
+    """Schema inference that infers every distinct shape of subtree once.
+
+    The shape of a subtree is its structure without its values: the type of a scalar, the keys and
+    the shapes of the values of an object, and the distinct shapes of the (sampled) elements of an
+    array. Shapes are interned as integers, bottom-up, so the fingerprint of a subtree is computed from
+    the fingerprints of its children in constant time per child, and its schema is built only the
+    first time the shape occurs. Repeated records, such as the contact objects of a list of datasets,
+    then cost one dictionary lookup each, and an array whose elements have k distinct shapes needs
+    k - 1 merges instead of one per element.
+
+    The document is walked with an explicit stack, so depth is not limited by the recursion limit.
+    Schemas of repeated shapes are shared objects in the result; copy the result before modifying it.
+    """
+
+    def __init__(self, sampling=default_sampling, sample_size=default_sample_size, rng=random):
+        if sampling not in sampling_strategies:
+            raise ValueError(f"Unknown sampling strategy '{sampling}', expected one of {', '.join(sampling_strategies)}")
+        self.sampling = sampling
+        self.sample_size = sample_size
+        self.rng = rng
+        self._shape_ids = {}
+        self.schemas = []
+        for name in ("null", "boolean", "integer", "number", "string"):
+            self._intern((name,), {"type": name})
+        self._any_shape = self._intern(("any",), {})
+
+    def _intern(self, fingerprint, schema):
+        self._shape_ids[fingerprint] = len(self.schemas)
+        self.schemas.append(schema)
+        return len(self.schemas) - 1
+
+    def _scalar_shape(self, data):
+        shape = _scalar_shapes.get(type(data))
+        if shape is not None:
+            return shape
+        # subclasses; bool is a subclass of int, so it is tested first
+        if isinstance(data, bool):
+            return 1
+        if isinstance(data, int):
+            return 2
+        if isinstance(data, float):
+            return 3
+        if isinstance(data, str):
+            return 4
+        if data is None:
+            return 0
+        if isinstance(data, (dict, list)):
+            return None
         # If the data type is not recognized, simply treat it as "any"
-        return {}
-
-# Create an argument parser
-parser = argparse.ArgumentParser(description="Generate JSON schema from a JSON file")
-
-# Add an argument for the JSON file path
-parser.add_argument("--json_file_path", required=True, help="Path to the JSON file")
-
-# Parse the command-line arguments
-args = parser.parse_args()
-
-# Read the JSON file specified in the command-line argument
-try:
-    with open(args.json_file_path, "r") as json_file:
-        json_data = json.load(json_file)
-except FileNotFoundError:
-    print(f"Error: File '{args.json_file_path}' not found.")
-    exit(1)
-except json.JSONDecodeError as e:
-    print(f"Error decoding JSON: {e}")
-    exit(1)
-
-# Generate the JSON schema
-schema = generate_json_schema(json_data)
-
-# Derive the output file path
-output_file_path = os.path.splitext(args.json_file_path)[0] + ".schema.json"
-
-# Write the generated schema to a JSON file
-with open(output_file_path, "w") as output_file_path:
-    json.dump(schema, output_file_path, indent=2)
-
-print(f"JSON schema has been written to '{output_file_path}'")
-
-# Optionally, you can validate your JSON data against the generated schema using jsonschema.validate()
-try:
-    jsonschema.validate(json_data, schema)
-    print("JSON data is valid against the schema.")
-except jsonschema.exceptions.ValidationError as e:
-    print(f"JSON data is not valid against the schema: {e}")
\ No newline at end of file
+        return self._any_shape
+
+    def _children(self, data):
+        if isinstance(data, dict):
+            return list(data.values())
+        return sample_elements(data, self.sampling, self.sample_size, self.rng)
+
+    def _object_shape(self, data, child_shapes):
+        fingerprint = ("object", tuple(data), tuple(child_shapes))
+        shape = self._shape_ids.get(fingerprint)
+        if shape is None:
+            schemas = self.schemas
+            shape = self._intern(fingerprint, {
+                "type": "object",
+                "properties": {key: schemas[child] for key, child in zip(data, child_shapes)},
+                "required": list(data)
+            })
+        return shape
+
+    def _array_shape(self, child_shapes):
+        # merging is idempotent, so only the distinct element shapes, in order of appearance, matter
+        fingerprint = ("array",) + tuple(dict.fromkeys(child_shapes))
+        shape = self._shape_ids.get(fingerprint)
+        if shape is None:
+            if len(fingerprint) == 1:
+                schema = {"type": "array"}
+            else:
+                items_schema = self.schemas[fingerprint[1]]
+                for child in fingerprint[2:]:
+                    items_schema = merge_schemas(items_schema, self.schemas[child])
+                schema = {"type": "array", "items": items_schema}
+            shape = self._intern(fingerprint, schema)
+        return shape
+
+    def shape(self, data):
+        """Return the interned shape of data; its schema is self.schemas[shape]."""
+        shape = self._scalar_shape(data)
+        if shape is not None:
+            return shape
+        scalar_shapes = _scalar_shapes
+        # frames of (node, iterator over its children, the shapes of the children done so far)
+        stack = [(data, iter(self._children(data)), [])]
+        while True:
+            node, children, child_shapes = stack[-1]
+            for child in children:
+                shape = scalar_shapes.get(type(child))
+                if shape is None:
+                    shape = self._scalar_shape(child)
+                    if shape is None:
+                        stack.append((child, iter(self._children(child)), []))
+                        break
+                child_shapes.append(shape)
+            else:
+                stack.pop()
+                if isinstance(node, dict):
+                    shape = self._object_shape(node, child_shapes)
+                else:
+                    shape = self._array_shape(child_shapes)
+                if not stack:
+                    return shape
+                stack[-1][2].append(shape)
+
+    def infer(self, data):
+        """Return the schema of data."""
+        return self.schemas[self.shape(data)]
+
+def infer_schema(data, sampling=default_sampling, sample_size=default_sample_size, rng=random):
+    return SchemaInference(sampling, sample_size, rng).infer(data)
+
+def main():
+    # Create an argument parser
+    parser = argparse.ArgumentParser(description="Generate JSON schema from a JSON file")
+
+    # Add an argument for the JSON file path
+    parser.add_argument("--json_file_path", required=True, help="Path to the JSON file")
+    parser.add_argument("--sampling", choices=sampling_strategies, default=default_sampling,
+                        help="Array elements the items schema is inferred from: all, the first sample_size, or a random sample of sample_size")
+    parser.add_argument("--sample_size", type=int, default=default_sample_size, help="Number of elements sampled per array")
+    parser.add_argument("--seed", type=int, help="Seed of the reservoir sample, for reproducible schemas")
+
+    # Parse the command-line arguments
+    args = parser.parse_args()
+
+    # Read the JSON file specified in the command-line argument
+    try:
+        json_data = OIMS_json_io.load_json_file(args.json_file_path)
+    except FileNotFoundError:
+        print(f"Error: File '{args.json_file_path}' not found.")
+        exit(1)
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON: {e}")
+        exit(1)
+    except RecursionError:
+        # the standard library parser stops at about 1000 levels of nesting (see OIMS_json_io.py)
+        print(f"Error decoding JSON: '{args.json_file_path}' is nested too deeply to be parsed.")
+        exit(1)
+
+    # Generate the JSON schema
+    schema = generate_json_schema(json_data, args.sampling, args.sample_size, args.seed)
+
+    # Derive the output file path
+    output_file_path = os.path.splitext(args.json_file_path)[0] + ".schema.json"
+
+    # Write the generated schema to a JSON file
+    OIMS_json_io.dump_json_file(schema, output_file_path, indent=2)
+
+    print(f"JSON schema has been written to '{output_file_path}'")
+
+    # Optionally, you can validate your JSON data against the generated schema using jsonschema.validate()
+    try:
+        jsonschema.validate(json_data, schema)
+        print("JSON data is valid against the schema.")
+    except jsonschema.exceptions.ValidationError as e:
+        print(f"JSON data is not valid against the schema: {e}")
+    except RecursionError:
+        # jsonschema validates recursively; the schema itself was written by the iterative encoder
+        print("JSON data is nested too deeply for jsonschema, the validation against the schema was skipped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Shared set-up of the tests of the OIMS python tools.
+
+The tools are scripts in the directory above, not a package, so that directory is put on the path.
+"""
+import os
+import sys
+
+import pytest
+
+python_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if python_dir not in sys.path:
+    sys.path.insert(0, python_dir)
+
+# the directories with the schemas and the JSON files of the repository
+repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(python_dir)))
+library_json_dir = os.path.join(os.path.dirname(python_dir), 'json')
+
+
+@pytest.fixture(params=['stdlib', 'orjson'])
+def codec(request, monkeypatch):
+    """Run the test with each JSON codec as the codec of OIMS_json_io."""
+    import OIMS_json_io
+    if request.param == 'orjson' and OIMS_json_io.orjson is None:
+        pytest.skip("orjson is not installed")
+    selected = OIMS_json_io.get_codec(request.param)
+    monkeypatch.setattr(OIMS_json_io, 'codec', selected)
+    return selected
+
+
+class DocumentServer:
+    """Local stand-in for a web server: serves documents by path with an ETag and answers 304 to a matching If-None-Match."""
+
+    def __init__(self):
+        self.documents = {}  # path: content
+        self.requests = []   # (path, If-None-Match header) of every request
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                etag_header = self.headers.get('If-None-Match')
+                server.requests.append((self.path, etag_header))
+                content = server.documents.get(self.path)
+                if content is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                etag = '"%x"' % (hash(content) & 0xffffffff)
+                if etag_header == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self._server.server_port}{path}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def document_server():
+    server = DocumentServer()
+    yield server
+    server.close()
+
+
+basic_schema_path = os.path.join(repo_dir, 'BasicSchemas', 'OIMS_base.json')
+
+
+def oims_test_document(content_object, records, name_first=True, schema_version='2.3.1.0'):
+    """Return an OIMS document with one content item holding records, described by the MetadataMetadata
+    content object of BasicSchemas/OIMS_base.json; with name_first=False OIMS_content_object follows its properties."""
+    properties = [{'metadata': records}]
+    item = {'OIMS_content_object': content_object, 'OIMS_content_object_properties': properties}
+    if not name_first:
+        item = {'OIMS_content_object_properties': properties, 'OIMS_content_object': content_object}
+    return {'OIMS': {
+        '\\': ['test document'],
+        'OIMS_header': {
+            'mapping_info': [{'mapper_tool_name': 'tests'}],
+            'metadata_schema': [{'OIMS_content_object': content_object, 'schema_properties': [{
+                'schema_name': 'OIMS_base', 'schema_version': schema_version,
+                'schema_url': 'https://github.com/ForesightInitiative/OIMS/blob/main/BasicSchemas/OIMS_base.json',
+                'OIMS_content_object': 'MetadataMetadata'}]}],
+            'file_descriptors': {'metadata_name': 'test', 'metadata_version': {'current_version': '1.0'}},
+        },
+        'OIMS_content': [item],
+    }}
+
+
+@pytest.fixture
+def attribute_records():
+    """Metadata records that are valid against the MetadataMetadata content object of the OIMS base."""
+    return [{'attribute_name': f'attribute_{number}', 'attribute_description': 'an attribute', 'data_type': 'text',
+             'requirement_level': 'optional', 'data_type_class': 'primitive', 'multiple': False}
+            for number in range(5)]
+
+
+@pytest.fixture
+def oims_document():
+    """Factory of OIMS test documents, see oims_test_document."""
+    return oims_test_document
@@ -0,0 +1,49 @@
+import JSON_schema_validator_4_OIMS as validator
+
+schema = {
+    'type': 'object',
+    'properties': {
+        'a': {'type': 'object', 'properties': {
+            'b': {'allOf': [{'type': 'string'}] * 12},
+            'bc': {'type': 'string'},
+        }},
+        'c': {'type': 'integer'},
+    },
+}
+
+
+def test_all_errors_are_collected_in_one_pass():
+    violations, suppressed = validator.collect_validation_errors({'a': {'b': 'x', 'bc': 1}, 'c': 'x'}, schema)
+    assert sorted(violation['json_path'] for violation in violations) == ['$.a.bc', '$.c']
+    assert suppressed == {}
+
+
+def test_errors_are_capped_per_path():
+    violations, suppressed = validator.collect_validation_errors({'a': {'b': 1}}, schema, max_errors_per_path=10)
+    assert len(violations) == 10
+    assert suppressed == {'$.a.b': 2}
+    messages = validator.format_validation_errors(violations, suppressed, 'test schema')
+    assert messages[-1] == '2 further errors at $.a.b not shown.'
+
+
+def test_errors_are_attributed_to_every_enclosing_part():
+    violations, _ = validator.collect_validation_errors({'a': {'bc': 1}, 'c': 'x'}, schema)
+    breakdown, unattributed = validator.attribute_errors_to_parts(violations, schema)
+    assert list(breakdown) == ['a', 'a/b', 'a/bc', 'c']
+    assert [len(breakdown[part]) for part in breakdown] == [1, 0, 1, 1]
+    assert unattributed == []
+
+
+def test_error_counts_per_part_include_the_capped_errors():
+    violations, suppressed = validator.collect_validation_errors({'a': {'b': 1, 'bc': 1}}, schema, max_errors_per_path=10)
+    breakdown, _ = validator.attribute_errors_to_parts(violations, schema)
+    assert validator.count_errors_per_part(breakdown, suppressed) == {'a': 13, 'a/b': 12, 'a/bc': 1, 'c': 0}
+
+
+def test_traverse_and_validate_compares_whole_path_segments():
+    data = {'a': {'b': 'x', 'bc': 1}}
+    assert validator.traverse_and_validate(data, schema, 'a/b') == (True, None)
+    assert validator.traverse_and_validate(data, schema, 'a/bc') == (False, "1 is not of type 'string'")
+    assert validator.traverse_and_validate(data, schema, 'a') == (False, "1 is not of type 'string'")
+    assert validator.traverse_and_validate(data, schema) == (False, "1 is not of type 'string'")
+    assert validator.traverse_and_validate({'a': {}}, schema) == (True, None)
@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+
+import OIMS_json_io
+import OIMS_schema_consistency_test as consistency
+from conftest import basic_schema_path
+from OIMS_document_cache import DocumentCache, document_cache
+
+
+def write(path, data):
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_preload_parses_changed_documents_once(tmp_path, max_workers):
+    cache = DocumentCache()
+    paths = [write(tmp_path / f'{i}.json', {'n': i}) for i in range(3)]
+    (tmp_path / 'broken.json').write_text('{')
+    errors = cache.preload(paths + [str(tmp_path / 'broken.json'), str(tmp_path / 'missing.json')], max_workers)
+    assert set(errors) == {str(tmp_path / 'broken.json'), str(tmp_path / 'missing.json')}
+    first = cache.load(paths[0])
+    assert first == {'n': 0}
+    assert cache.preload(paths, max_workers) == {}
+    assert cache.load(paths[0]) is first  # not parsed again
+
+    write(tmp_path / '0.json', {'n': 'changed'})
+    os.utime(paths[0], ns=(0, 0))
+    assert cache.preload(paths, max_workers) == {}
+    assert cache.load(paths[0]) == {'n': 'changed'}
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path):
+    cache = DocumentCache(max_entries=2)
+    paths = [write(tmp_path / f'{i}.json', {'n': i}) for i in range(3)]
+    documents = [cache.load(path) for path in paths[:2]]
+    cache.load(paths[0])
+    cache.load(paths[2])
+    assert cache.load(paths[0]) is documents[0]
+    assert cache.load(paths[1]) is not documents[1]
+
+
+def test_consistency_check_parses_the_tested_file_once(tmp_path, monkeypatch, oims_document, attribute_records):
+    tested = write(tmp_path / 'tested.json', oims_document('MetadataMetadata', attribute_records))
+    document_cache.clear()
+    parsed = []
+    load_json_file = OIMS_json_io.load_json_file
+
+    def counting_load(file_path):
+        parsed.append(os.path.basename(file_path))
+        return load_json_file(file_path)
+
+    monkeypatch.setattr('OIMS_json_io.load_json_file', counting_load)
+    for _ in range(2):
+        issues, _ = consistency.check_oims_consistency(tested, basic_schema_path, 'MetadataMetadata', basic_schema_path)
+        assert not issues
+    assert sorted(parsed) == ['OIMS_base.json', 'tested.json']
+    document_cache.clear()
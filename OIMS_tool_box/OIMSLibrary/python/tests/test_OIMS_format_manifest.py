@@ -0,0 +1,38 @@
+import os
+
+from OIMS_format_manifest import FormatManifest
+
+
+options = {'indent': 4, 'sort_keys': False, 'codec': 'stdlib'}
+
+
+def test_recorded_files_are_unchanged_until_modified(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text('{}')
+    manifest_path = str(tmp_path / 'manifest.json')
+    manifest = FormatManifest(manifest_path)
+    assert not manifest.is_unchanged(str(path), options)
+    manifest.record(str(path), options, 'hash')
+    manifest.save()
+
+    manifest = FormatManifest(manifest_path)
+    assert manifest.is_unchanged(str(path), options)
+    assert manifest.known_hash(str(path), options) == 'hash'
+    assert not manifest.is_unchanged(str(path), dict(options, indent=2))
+    assert manifest.known_hash(str(path), dict(options, sort_keys=True)) is None
+
+    os.utime(path, ns=(0, 0))
+    assert not manifest.is_unchanged(str(path), options)
+    assert manifest.known_hash(str(path), options) == 'hash'
+    manifest.forget(str(path))
+    assert manifest.known_hash(str(path), options) is None
+
+
+def test_an_unreadable_manifest_is_empty(tmp_path):
+    manifest_path = tmp_path / 'manifest.json'
+    for content in ('{"files": ', '[]'):
+        manifest_path.write_text(content)
+        assert FormatManifest(str(manifest_path)).files == {}
+    # nothing changed, nothing is written
+    FormatManifest(str(manifest_path)).save()
+    assert manifest_path.read_text() == '[]'
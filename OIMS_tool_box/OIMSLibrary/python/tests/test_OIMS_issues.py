@@ -0,0 +1,29 @@
+from OIMS_issues import IssueAggregator
+
+
+def test_repeated_issues_are_merged_with_a_count_and_examples():
+    issues = IssueAggregator(max_examples=2)
+    assert not issues
+    for record_number in range(5):
+        issues.add('unknown_field', "Error: Metadata field 'x' not found.", 'metadata[*].x', f'metadata[{record_number}].x')
+    issues.add('required_field_missing', "Error: Required field 'y' missing.")
+    assert len(issues) == 2
+    assert issues.occurrences == 6
+    [unknown, missing] = issues.to_list()
+    assert unknown['count'] == 5
+    assert unknown['examples'] == ['metadata[0].x', 'metadata[1].x']
+    assert issues.messages() == [
+        "Error: Metadata field 'x' not found. [metadata[*].x] (5 occurrences, e.g. at metadata[0].x, metadata[1].x)",
+        "Error: Required field 'y' missing.",
+    ]
+    assert issues.report_messages()[0][0] == 'error: unknown_field'
+    assert missing['severity'] == 'error'
+
+
+def test_different_paths_or_messages_are_distinct_issues():
+    issues = IssueAggregator('warning')
+    issues.add('data_type_mismatch', 'Expected str, found int.', 'metadata[*].a')
+    issues.add('data_type_mismatch', 'Expected str, found int.', 'metadata[*].b')
+    issues.add('data_type_mismatch', 'Expected str, found list.', 'metadata[*].a')
+    assert len(issues) == 3
+    assert [issue.severity for issue in issues] == ['warning'] * 3
@@ -0,0 +1,100 @@
+import io
+import json
+import math
+
+import pytest
+
+import OIMS_json_io
+import format_json
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf')])
+def test_non_finite_floats_are_written_as_by_the_standard_library(codec, value):
+    data = {'a': [1, {'b': value}], 'c': None}
+    text = codec.dumps(data, indent=4).decode('utf-8')
+    assert text == json.dumps(data, indent=4)
+    assert 'null' in text  # the None is still written as null
+
+
+def test_none_is_not_mistaken_for_a_non_finite_float(codec):
+    data = {'a': None, 'b': [None, 1.5]}
+    assert OIMS_json_io.dumps(data) == json.dumps(data, separators=(',', ':'))
+
+
+def test_nan_survives_format_json(codec, tmp_path):
+    path = tmp_path / 't.json'
+    path.write_text('{"a": NaN, "b": [Infinity, -Infinity, null]}')
+    status, _, _ = format_json.reformat_json_file(str(path))
+    assert status == 'formatted'
+    data = json.loads(path.read_text())
+    assert math.isnan(data['a'])
+    assert data['b'] == [float('inf'), float('-inf'), None]
+
+
+def test_load_and_dump_round_trip(codec, tmp_path):
+    data = {'\\': ['comment'], 'text': 'café \U0001f600', 'numbers': [0, -1, 2.5, 10 ** 20], 'nested': {'x': []}}
+    path = tmp_path / 'data.json'
+    OIMS_json_io.dump_json_file(data, str(path))
+    assert OIMS_json_io.load_json_file(str(path)) == data
+    assert path.read_text() == json.dumps(data, indent=4)
+
+
+def test_deeply_nested_documents_are_written(codec):
+    data = []
+    for _ in range(5000):
+        data = [data]
+    text = OIMS_json_io.dumps(data)
+    assert text == '[' * 5001 + ']' * 5001
+
+
+def test_empty_file_raises_decode_error(codec, tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        OIMS_json_io.load_json_file(str(path))
+
+
+stream_samples = [
+    '{"a": [1, -0, 1.50, 1E5, -2.5e-3, 123456789012345678901234567890], "b": {}, "c": [], "d": [true, false, null]}',
+    '{"text": "caf\\u00E9 \\/ \\"quoted\\" caf\u00e9 \U0001f600", "\u00e9": "\\ud83d\\ude00", "plain": "abc"}',
+    '[{"nested": [[{"deep": [1, 2, {"x": "y"}]}]]}, 3.0, NaN, -Infinity]',
+    '  "just a string"  ',
+]
+
+
+@pytest.mark.parametrize('text', stream_samples)
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+def test_canonical_stream_matches_dumps_of_the_parsed_document(codec, text, chunk_size):
+    source = io.BytesIO(text.encode('utf-8'))
+    target = io.BytesIO()
+    OIMS_json_io.reindent_stream(source, target, indent=3, chunk_size=chunk_size, canonical=True)
+    assert target.getvalue() == codec.dumps(codec.loads(text.encode('utf-8')), indent=3)
+
+
+def test_stream_copies_tokens_as_written_by_default():
+    target = io.BytesIO()
+    OIMS_json_io.reindent_stream(io.BytesIO(b'{"a":[1.50,"\\u00e9"]}'), target, indent=2)
+    assert target.getvalue() == b'{\n  "a": [\n    1.50,\n    "\\u00e9"\n  ]\n}'
+
+
+@pytest.mark.parametrize('text', ['{"a" 1}', '{"a": 1,}', '[1 2]', '{"a": [}', '{"a": 1}}', '{"a": 1', "{'a': 1}", '01'])
+def test_stream_rejects_invalid_json(text):
+    with pytest.raises(ValueError):
+        OIMS_json_io.reindent_stream(io.BytesIO(text.encode('utf-8')), io.BytesIO(), chunk_size=3)
+
+
+def test_replace_file_keeps_the_original_unless_write_succeeds(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_bytes(b'old')
+    assert not OIMS_json_io.replace_file(str(path), lambda target: target.write(b'same') and False)
+
+    def fail(target):
+        target.write(b'new')
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        OIMS_json_io.replace_file(str(path), fail)
+    assert path.read_bytes() == b'old'
+    assert OIMS_json_io.replace_file(str(path), lambda target: target.write(b'new') > 0)
+    assert path.read_bytes() == b'new'
+    assert [entry.name for entry in tmp_path.iterdir()] == ['data.json']
@@ -0,0 +1,115 @@
+import io
+import json
+
+import pytest
+
+from OIMS_json_stream import JsonStreamReader, iter_oims_events, read_oims_header
+
+document = {
+    'other': {'x': [1, 2, {'y': '}]"'}]},
+    'OIMS': {
+        'OIMS_header': {'metadata_schema': [], 'text': 'a, b: c'},
+        'OIMS_content': [
+            {'OIMS_content_object': 'first', 'OIMS_content_object_properties': [{'metadata': [{'a': 1}, {'b': [2.5, None]}]}]},
+            {'OIMS_content_object_properties': [{'metadata': [{'c': True}], 'x': 'y'}], 'OIMS_content_object': 'second'},
+            'not an object',
+        ],
+    },
+}
+
+
+class CountingFile(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.characters_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.characters_read += len(data)
+        return data
+
+
+@pytest.fixture
+def document_path(tmp_path):
+    path = tmp_path / 'document.json'
+    path.write_text(json.dumps(document, indent=2))
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+def test_events(document_path, chunk_size):
+    events = list(iter_oims_events(document_path, chunk_size))
+    assert events[0] == ('header', None, document['OIMS']['OIMS_header'])
+    records = [(location, value) for event, location, value in events if event == 'record']
+    assert records == [((0, 'first', 0, 0), {'a': 1}), ((0, 'first', 0, 1), {'b': [2.5, None]}),
+                       ((1, 'second', 0, 0), {'c': True})]
+    items = [value for event, _, value in events if event == 'content_item']
+    assert items[1] == {'OIMS_content_object_properties': [{'metadata': 1, 'x': 'y'}], 'OIMS_content_object': 'second'}
+    assert items[2] == 'not an object'
+    assert events[-1] == ('end', None, {'OIMS': True, 'OIMS_header': True, 'OIMS_content': True})
+
+
+def test_records_before_the_content_object_name_carry_the_name(tmp_path, oims_document, attribute_records):
+    path = tmp_path / 'late_name.json'
+    path.write_text(json.dumps(oims_document('dataset', attribute_records, name_first=False)))
+    records = [location for event, location, _ in iter_oims_events(str(path)) if event == 'record']
+    assert records == [(0, 'dataset', 0, number) for number in range(len(attribute_records))]
+
+
+@pytest.mark.parametrize('chunk_size', [3, 1 << 16])
+def test_read_oims_header(document_path, chunk_size):
+    head = read_oims_header(document_path, scan_content=True, chunk_size=chunk_size)
+    assert head['header'] == document['OIMS']['OIMS_header']
+    assert head['content_objects'] == ['first', 'second']
+    assert head['found'] == {'OIMS': True, 'OIMS_header': True, 'OIMS_content': True}
+
+
+def test_read_oims_header_stops_after_the_header(tmp_path):
+    path = tmp_path / 'large.json'
+    content = [{'OIMS_content_object': 'x', 'padding': 'p' * 1000} for _ in range(1000)]
+    path.write_text(json.dumps({'OIMS': {'OIMS_header': {'a': 1}, 'OIMS_content': content}}))
+    head = read_oims_header(str(path), chunk_size=64)
+    assert head['header'] == {'a': 1}
+    assert head['characters_read'] < 100
+
+
+def test_skip_value_does_not_decode():
+    reader = JsonStreamReader(io.StringIO('[{"a": "]}", "b": [1, {"c": "\\""}]}, 5]'), chunk_size=2)
+    indexes = []
+    for index in reader.iter_array():
+        indexes.append(index)
+        if index == 0:
+            reader.skip_value()
+        else:
+            assert reader.read_value() == 5
+    assert indexes == [0, 1]
+
+
+def test_a_syntax_error_fails_without_reading_the_rest():
+    text = '[1, x, ' + ', '.join(['2'] * 100000) + ']'
+    file = CountingFile(text)
+    reader = JsonStreamReader(file, chunk_size=64)
+    with pytest.raises(json.JSONDecodeError):
+        reader.read_value()
+    assert file.characters_read < 1000
+
+
+@pytest.mark.parametrize('text', ['[tr', '[1, 2.5e', '{"a": "abc', '{"a"'])
+def test_a_value_cut_off_at_the_end_of_the_file_is_an_error(text):
+    with pytest.raises(json.JSONDecodeError):
+        JsonStreamReader(io.StringIO(text), chunk_size=2).read_value()
+
+
+def test_values_cut_by_the_chunks_are_decoded():
+    values = [True, False, None, -1.5e-3, 'a "b" \\ c', {'x': [1, 2]}, 123456789012345678901234567890]
+    text = json.dumps(values)
+    for chunk_size in range(1, 12):
+        assert JsonStreamReader(io.StringIO(text), chunk_size=chunk_size).read_value() == values
+
+
+def test_values_longer_than_the_limit_are_an_error():
+    file = CountingFile('["' + 'x' * 100000)
+    with pytest.raises(json.JSONDecodeError, match='longer than 1000 characters'):
+        JsonStreamReader(file, chunk_size=100, max_value_size=1000).read_value()
+    assert file.characters_read < 5000
+    assert JsonStreamReader(io.StringIO('"' + 'x' * 900 + '"'), chunk_size=100, max_value_size=1000).read_value() == 'x' * 900
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import OIMS_report_backends
+from OIMS_report_backends import StreamingPdfReport, write_report
+
+python_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('module', ['JSON_schema_validator_4_OIMS', 'OIMS_schema_consistency_test_simple',
+                                    'OIMS_schema_consistency_test', 'OIMS_schema_cache'])
+def test_validators_import_neither_reportlab_nor_requests(module):
+    code = f"import sys, {module}; print(sorted(name for name in ('reportlab', 'requests') if name in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=python_dir, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
+
+
+def test_text_report(tmp_path):
+    path = write_report(iter(['first error', ('error: unknown_field', 'second error')]), 'text', str(tmp_path / 'r'),
+                        'Title', 'checked x', warnings=['a warning'])
+    assert path == str(tmp_path / 'r.txt')
+    assert open(path).read() == ("Title\n\nchecked x\n\nWarnings:\na warning\n\nErrors:\nfirst error\n\n"
+                                 "error: unknown_field:\nsecond error\n")
+    path = write_report([], 'text', str(tmp_path / 'ok'), 'Title', warnings=['a warning'])
+    assert open(path).read().endswith(f"a warning\n\n{OIMS_report_backends.success_message}\n")
+
+
+def test_json_and_junit_reports(tmp_path):
+    report = json.load(open(write_report(['an error'], 'json', str(tmp_path / 'r'), 'Title', warnings=['w'])))
+    assert report['valid'] is False
+    assert report['errors'] == [{'category': 'Errors', 'message': 'an error'}]
+    assert report['warnings'] == [{'category': 'Warnings', 'message': 'w'}]
+
+    suite = ET.parse(write_report(['one\ndetails', 'two'], 'junit', str(tmp_path / 'r'), 'Title')).getroot()
+    assert (suite.get('tests'), suite.get('failures')) == ('2', '2')
+    assert [failure.get('message') for failure in suite.iter('failure')] == ['one', 'two']
+    passed = ET.parse(write_report([], 'junit', str(tmp_path / 'ok'), 'Title')).getroot()
+    assert passed.get('failures') == '0' and len(list(passed.iter('testcase'))) == 1
+
+
+def test_no_report_and_unknown_formats(tmp_path):
+    assert write_report(['an error'], 'none', str(tmp_path / 'r'), 'Title') is None
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(ValueError, match="Unknown report format 'html'"):
+        write_report([], 'html', str(tmp_path / 'r'), 'Title')
+
+
+
+def test_pdf_report_draws_a_bounded_number_of_messages(tmp_path):
+    pytest.importorskip('reportlab')
+    path = str(tmp_path / 'r.pdf')
+    with StreamingPdfReport(path, 'Title', 'checked x', max_messages_per_category=5, max_lines_per_message=2) as report:
+        for number in range(200):
+            report.add(f"error {number} " + 'word ' * 400, 'error: unknown_field')
+        report.add('a warning', 'Warnings')
+    assert report.category_counts == {'error: unknown_field': 200, 'Warnings': 1}
+    with open(path, 'rb') as pdf_file:
+        assert pdf_file.read(4) == b'%PDF'
+
+    limit = OIMS_report_backends.default_max_messages_per_category
+    at_limit, beyond = str(tmp_path / 'at_limit.pdf'), str(tmp_path / 'beyond.pdf')
+    OIMS_report_backends.write_pdf_report((f'error {number}' for number in range(limit)), 'Title', '', at_limit)
+    OIMS_report_backends.write_pdf_report((f'error {number}' for number in range(20 * limit)), 'Title', '', beyond)
+    # the messages beyond the limit are counted in the summary, not drawn
+    assert abs(os.path.getsize(beyond) - os.path.getsize(at_limit)) < 100
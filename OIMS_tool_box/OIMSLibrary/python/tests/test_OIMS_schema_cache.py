@@ -0,0 +1,72 @@
+import os
+
+from OIMS_schema_cache import SchemaCache
+
+
+schema = b'{"type": "object"}'
+
+
+def test_etag_revalidation_after_the_ttl(tmp_path, document_server):
+    document_server.documents['/schema.json'] = schema
+    url = document_server.url('/schema.json')
+    cache = SchemaCache(str(tmp_path), ttl=3600)
+    assert cache.get(url) == ({'type': 'object'}, None)
+    assert cache.get(url) == ({'type': 'object'}, None)
+    assert len(document_server.requests) == 1  # within the TTL
+
+    expired = SchemaCache(str(tmp_path), ttl=0)
+    assert expired.get(url) == ({'type': 'object'}, None)
+    [_, (_, etag)] = document_server.requests
+    assert etag is not None  # answered with 304
+
+    document_server.documents['/schema.json'] = b'{"type": "array"}'
+    assert expired.get(url) == ({'type': 'array'}, None)
+    assert cache.get(url) == ({'type': 'array'}, None)
+    assert len(document_server.requests) == 3
+
+
+def test_offline_mode_uses_only_the_cache(tmp_path, document_server):
+    document_server.documents['/schema.json'] = schema
+    url = document_server.url('/schema.json')
+    SchemaCache(str(tmp_path)).get(url)
+    offline = SchemaCache(str(tmp_path), ttl=0, offline=True)
+    assert offline.get(url) == ({'type': 'object'}, None)
+    data, err = offline.get(document_server.url('/other.json'))
+    assert data is None and 'offline mode is on' in err
+    assert len(document_server.requests) == 1
+
+
+def test_seeded_documents_do_not_expire(tmp_path, document_server):
+    seeds = tmp_path / 'seeds'
+    seeds.mkdir()
+    (seeds / 'schema.json').write_bytes(schema)
+    (seeds / 'broken.json').write_bytes(b'{')
+    cache = SchemaCache(str(tmp_path / 'cache'), ttl=0)
+    base_url = document_server.url('/')
+    assert cache.seed_from_directory(str(seeds), base_url) == [base_url + 'schema.json']
+    assert cache.get(base_url + 'schema.json') == ({'type': 'object'}, None)
+    assert SchemaCache(str(tmp_path / 'cache'), ttl=0, offline=True).get(base_url + 'schema.json') == ({'type': 'object'}, None)
+    assert document_server.requests == []
+
+
+def test_unreadable_cached_documents_are_fetched_again(tmp_path, document_server):
+    document_server.documents['/schema.json'] = schema
+    url = document_server.url('/schema.json')
+    cache = SchemaCache(str(tmp_path))
+    content_hash = cache.store(url, schema, seeded=True)
+    with open(os.path.join(str(tmp_path), 'objects', content_hash + '.json'), 'wb') as object_file:
+        object_file.write(b'{"type": ')
+    assert cache.get(url) == ({'type': 'object'}, None)
+    assert document_server.requests == [('/schema.json', None)]
+    assert cache.get(url) == ({'type': 'object'}, None)
+    assert len(document_server.requests) == 1
+
+
+def test_unreachable_server_falls_back_to_the_cached_copy(tmp_path, document_server):
+    document_server.documents['/schema.json'] = schema
+    url = document_server.url('/schema.json')
+    SchemaCache(str(tmp_path)).get(url)
+    document_server.close()
+    assert SchemaCache(str(tmp_path), ttl=0, timeout=2).get(url) == ({'type': 'object'}, None)
+    data, err = SchemaCache(str(tmp_path), timeout=2).get(url + '?missing')
+    assert data is None and err.startswith('Failed to retrieve data')
@@ -0,0 +1,55 @@
+import json
+
+import jsonschema
+import pytest
+
+from OIMS_schema_compaction import compact_schema, drop_empty_conditionals, inline_shared_subschemas
+
+
+vocabulary = [f'code{number}' for number in range(30)]
+schema = {
+    '$schema': 'https://json-schema.org/draft/2020-12/schema',
+    'type': 'object',
+    'properties': {
+        'a': {'type': 'string', 'enum': list(vocabulary)},
+        'b': {'type': 'array', 'items': {'type': 'string', 'enum': list(vocabulary)}},
+        'c': {'type': 'string', 'enum': ['x', 'y']},
+        'd': {'type': 'string', 'enum': ['x', 'y']},
+    },
+    'if': {}, 'then': {}, 'else': {'required': ['a']},
+}
+
+
+def test_repeated_keywords_are_shared_through_defs():
+    compacted = compact_schema(json.loads(json.dumps(schema)))
+    [name] = compacted['$defs']
+    assert compacted['$defs'][name] == {'enum': vocabulary}
+    assert compacted['properties']['a'] == {'type': 'string', '$ref': f'#/$defs/{name}'}
+    assert compacted['properties']['b']['items'] == {'type': 'string', '$ref': f'#/$defs/{name}'}
+    # small keywords stay inline, as a reference would not be shorter
+    assert compacted['properties']['c'] == {'type': 'string', 'enum': ['x', 'y']}
+    assert 'if' not in compacted and 'else' not in compacted
+    assert len(json.dumps(compacted)) < len(json.dumps(schema))
+
+
+@pytest.mark.parametrize('instance', [
+    {'a': 'code1', 'b': ['code2'], 'c': 'x'}, {'a': 'nope'}, {'b': ['code1', 'nope']}, {'c': 'z'}, {},
+])
+def test_compaction_does_not_change_what_is_accepted(instance):
+    compacted = compact_schema(json.loads(json.dumps(schema)))
+    expected = jsonschema.Draft202012Validator(drop_empty_conditionals(json.loads(json.dumps(schema)))).is_valid(instance)
+    assert jsonschema.Draft202012Validator(compacted).is_valid(instance) == expected
+    assert jsonschema.Draft202012Validator(inline_shared_subschemas(compacted)).is_valid(instance) == expected
+
+
+def test_inlining_restores_the_keywords():
+    compacted = compact_schema(json.loads(json.dumps(schema)))
+    inlined = inline_shared_subschemas(compacted)
+    assert inlined['properties']['a'] == schema['properties']['a']
+    # the occurrences share one object
+    assert inlined['properties']['a']['enum'] is inlined['properties']['b']['items']['enum']
+
+
+def test_empty_conditionals_with_content_are_kept():
+    kept = {'if': {'required': ['a']}, 'then': {}, 'else': {'required': ['b']}}
+    assert drop_empty_conditionals(dict(kept)) == kept
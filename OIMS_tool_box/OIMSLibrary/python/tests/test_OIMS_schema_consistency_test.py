@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from conftest import basic_schema_path
+from OIMS_issues import IssueAggregator
+from OIMS_schema_consistency_test import check_metadata_record, check_oims_consistency, triage_oims_structure, validate_oims_structure
+
+
+def check(path, streaming=False):
+    issues, warnings = check_oims_consistency(str(path), basic_schema_path, 'dataset', basic_schema_path,
+                                              streaming=streaming)
+    return issues.to_list(), warnings.to_list()
+
+
+@pytest.mark.parametrize('name_first', [True, False])
+@pytest.mark.parametrize('streaming', [False, True])
+def test_a_valid_file_has_no_issues(tmp_path, oims_document, attribute_records, name_first, streaming):
+    path = tmp_path / 'metadata.json'
+    path.write_text(json.dumps(oims_document('dataset', attribute_records, name_first)))
+    assert check(path, streaming)[0] == []
+
+
+@pytest.mark.parametrize('name_first', [True, False])
+def test_streaming_finds_the_same_issues(tmp_path, oims_document, attribute_records, name_first):
+    del attribute_records[1]['attribute_description']
+    attribute_records[2]['multiple'] = 'no'
+    attribute_records[3]['unknown'] = 1
+    path = tmp_path / 'metadata.json'
+    path.write_text(json.dumps(oims_document('dataset', attribute_records, name_first)))
+    issues = check(path)[0]
+    assert {issue['code'] for issue in issues} == {'data_type_mismatch', 'unknown_field'}
+    assert check(path, streaming=True)[0] == issues
+
+
+def test_missing_required_field_is_reported(tmp_path, oims_document, attribute_records):
+    for record in attribute_records:
+        del record['data_type']
+    path = tmp_path / 'metadata.json'
+    path.write_text(json.dumps(oims_document('dataset', attribute_records)))
+    for streaming in (False, True):
+        assert [issue['code'] for issue in check(path, streaming)[0]] == ['required_field_missing']
+
+
+def test_structure_errors(tmp_path):
+    path = tmp_path / 'x.json'
+    path.write_text('{"OIMS": {"OIMS_header": {}}}')
+    assert validate_oims_structure(str(path), data=json.loads(path.read_text())) == \
+        "Invalid file: 'OIMS_header' or 'OIMS_content' not found."
+    assert triage_oims_structure(str(path))['result'] == "Invalid file: 'OIMS_header' or 'OIMS_content' not found."
+    path.write_text('{"OIMS": ')
+    assert triage_oims_structure(str(path))['result'] == "Invalid file: File is not a valid JSON."
+
+
+def test_every_field_of_every_record_is_checked():
+    metametadata_index = {
+        'name': {'data_type': 'text', 'multiple': False, 'data_type_class': 'primitive'},
+        'parts': {'data_type': 'compound_object', 'multiple': True, 'data_type_class': 'compound'},
+    }
+    type_mapping = {'text': ['str'], 'compound_object': ['dict']}
+    issues = IssueAggregator()
+    # the unknown and mistyped fields are not the last fields of their records
+    check_metadata_record(0, {'unknown': 1, 'name': 'x'}, metametadata_index, type_mapping, issues)
+    check_metadata_record(1, {'name': 2, 'parts': [{}, 'x', {}]}, metametadata_index, type_mapping, issues)
+    assert [(issue['code'], issue['examples']) for issue in issues.to_list()] == [
+        ('unknown_field', ['metadata[0].unknown']),
+        ('data_type_mismatch', ['metadata[1].name']),
+        ('data_type_mismatch', ['metadata[1].parts[1]']),
+        ('not_compound', ['metadata[1].parts[1]']),
+    ]
+
+
+def test_the_first_definition_of_an_attribute_is_used(tmp_path, oims_document, attribute_records):
+    metametadata = json.loads(open(basic_schema_path).read())
+    [properties] = [item['OIMS_content_object_properties'] for item in metametadata['OIMS']['OIMS_content']
+                    if item['OIMS_content_object'] == 'MetadataMetadata']
+    attributes = properties[0]['metadata']
+    [multiple] = [attribute for attribute in attributes if attribute['attribute_name'] == 'multiple']
+    attributes.append(dict(multiple, data_type='text'))
+    metametadata_path = tmp_path / 'metametadata.json'
+    metametadata_path.write_text(json.dumps(metametadata))
+    path = tmp_path / 'metadata.json'
+    path.write_text(json.dumps(oims_document('dataset', attribute_records)))
+    issues, _ = check_oims_consistency(str(path), basic_schema_path, 'dataset', str(metametadata_path))
+    assert issues.to_list() == []
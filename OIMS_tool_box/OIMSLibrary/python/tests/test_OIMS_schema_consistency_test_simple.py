@@ -0,0 +1,76 @@
+import functools
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import OIMS_schema_consistency_test_simple as simple
+from OIMS_schema_cache import schema_cache
+from OIMS_validator_registry import validator_registry
+
+structure_schema = {'type': 'object', 'required': ['OIMS']}
+schema = {'type': 'object', 'properties': {'OIMS': {'type': 'object', 'required': ['OIMS_header']}}}
+
+
+@pytest.fixture
+def batch_dir(tmp_path):
+    (tmp_path / 'valid.json').write_text(json.dumps({'OIMS': {'OIMS_header': {}}}))
+    (tmp_path / 'invalid.json').write_text(json.dumps({'OIMS': {}}))
+    (tmp_path / 'broken.json').write_text('{"OIMS": ')
+    (tmp_path / 'latin1.json').write_bytes('{"OIMS": "caf\xe9"}'.encode('latin-1'))
+    return tmp_path
+
+
+@pytest.fixture
+def registry_settings(monkeypatch):
+    for name in ('checked_schema_dir',):
+        monkeypatch.setattr(validator_registry, name, getattr(validator_registry, name))
+    for name in ('cache_dir', 'ttl', 'offline'):
+        monkeypatch.setattr(schema_cache, name, getattr(schema_cache, name))
+
+
+def test_collect_batch_files_skips_generated_schemas(batch_dir):
+    (batch_dir / 'x.schema.json').write_text('{}')
+    manifest = batch_dir / 'manifest.txt'
+    manifest.write_text(f"# files\n{batch_dir / 'valid.json'}\n\n")
+    assert simple.collect_batch_files([str(batch_dir)]) == sorted(
+        str(batch_dir / name) for name in ('broken.json', 'invalid.json', 'latin1.json', 'valid.json'))
+    assert simple.collect_batch_files(batch_manifest=str(manifest)) == [str(batch_dir / 'valid.json')]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_an_unexpected_error_in_one_file_does_not_stop_the_batch(batch_dir, registry_settings, workers):
+    files = simple.collect_batch_files([str(batch_dir)]) + [str(batch_dir / 'missing.json')]
+    report_dir = batch_dir / 'reports'
+    results = simple.run_batch(files, structure_schema, schema, 'test schema', workers, str(report_dir), 'none')
+    by_name = {os.path.basename(result['file']): result for result in results}
+    assert set(by_name) == {'valid.json', 'invalid.json', 'broken.json', 'latin1.json', 'missing.json'}
+    assert by_name['valid.json']['valid']
+    assert not by_name['invalid.json']['valid']
+    assert 'Error parsing JSON file' in by_name['broken.json']['errors'][0]
+    assert 'UnicodeDecodeError' in by_name['latin1.json']['errors'][0]
+    assert 'File not found' in by_name['missing.json']['errors'][0]
+    with open(report_dir / 'per_file_results.jsonl', encoding='utf-8') as results_file:
+        assert len(results_file.readlines()) == 5
+
+
+def test_spawned_workers_receive_the_settings(batch_dir, registry_settings, monkeypatch):
+    checked_dir = batch_dir / 'checked'
+    validator_registry.checked_schema_dir = str(checked_dir)
+    schema_cache.offline = True
+    spawn_executor = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+    monkeypatch.setattr(simple, 'ProcessPoolExecutor', spawn_executor)
+    files = [str(batch_dir / 'valid.json'), str(batch_dir / 'invalid.json')]
+    results = simple.run_batch(files, structure_schema, schema, 'test schema', 2, str(batch_dir / 'reports'), 'none')
+    assert [result['valid'] for result in results] == [True, False]
+    # the workers compiled the validators and recorded the checked schemas in the directory set in the parent
+    assert len(os.listdir(checked_dir)) == 2
+
+
+def test_init_batch_worker_applies_the_settings(registry_settings, tmp_path):
+    settings = {'checked_schema_dir': str(tmp_path), 'schema_cache_dir': str(tmp_path / 'cache'),
+                'schema_cache_ttl': 5, 'offline': True}
+    simple._init_batch_worker(structure_schema, schema, 'test schema', settings)
+    assert simple.batch_worker_settings() == settings
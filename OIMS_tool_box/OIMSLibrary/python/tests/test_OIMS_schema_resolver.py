@@ -0,0 +1,51 @@
+import json
+
+from OIMS_schema_cache import SchemaCache
+from OIMS_schema_resolver import collect_corpus_schema_urls, collect_schema_urls, raw_github_url, resolve_schema_urls
+
+
+def url(name):
+    return f'https://example.org/{name}.json'
+
+
+def header(*names):
+    return {'mapping_info': [], 'file_descriptors': {}, 'metadata_schema': [
+        {'OIMS_content_object': 'dataset', 'schema_properties': [{'schema_url': url(name)} for name in names]}]}
+
+
+def test_github_page_urls_map_to_raw_urls():
+    assert (raw_github_url('https://github.com/owner/repo/blob/main/schemas/x.json')
+            == 'https://raw.githubusercontent.com/owner/repo/main/schemas/x.json')
+    assert raw_github_url('https://example.org/x.json') == 'https://example.org/x.json'
+
+
+def test_malformed_headers_are_reported():
+    problems = []
+    oims_data = {'OIMS': {'OIMS_header': {'metadata_schema': [{'schema_properties': [{'schema_url': url('a')}, {'schema_url': 'a.json'}, 3]}, 'x']}}}
+    assert collect_schema_urls(oims_data, problems) == [url('a')]
+    assert len(problems) == 2
+    assert collect_schema_urls({'type': 'object'}, problems) == []
+
+
+def test_corpus_files_are_read_up_to_the_header(tmp_path):
+    first = tmp_path / 'first.json'
+    # the content after the header is not even valid JSON: only the header is read
+    first.write_text('{"OIMS": {"OIMS_header": %s, "OIMS_content": [{"broken"' % json.dumps(header('a', 'b')))
+    second = tmp_path / 'second.json'
+    second.write_text(json.dumps({'OIMS': {'OIMS_content': [], 'OIMS_header': header('b', 'c')}}))
+    schema = tmp_path / 'schema.json'
+    schema.write_text(json.dumps({'type': 'object'}))
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{"OIMS": {"OIMS_header": {')
+    urls, errors = collect_corpus_schema_urls([str(first), str(second), str(schema), str(broken)])
+    assert urls == [url('a'), url('b'), url('c')]
+    assert len(errors) == 1 and errors[0].startswith(f'Could not read {broken}')
+
+
+def test_distinct_urls_are_fetched_once(tmp_path, document_server):
+    document_server.documents['/a.json'] = b'{"title": "a"}'
+    schema_url = document_server.url('/a.json')
+    results = resolve_schema_urls([schema_url, schema_url, document_server.url('/missing.json')], cache=SchemaCache(str(tmp_path)))
+    assert results[schema_url] == ({'title': 'a'}, None)
+    assert results[document_server.url('/missing.json')][0] is None
+    assert sorted(path for path, _ in document_server.requests) == ['/a.json', '/missing.json']
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from OIMS_schema_consistency_test import triage_oims_structure, validate_oims_structure
+from OIMS_triage import route_by_schema_version, triage_files
+
+
+@pytest.mark.parametrize('document', [
+    {'OIMS': {'OIMS_header': {'mapping_info': [], 'metadata_schema': [], 'file_descriptors': {}}, 'OIMS_content': []}},
+    {'OIMS': {'OIMS_content': [], 'OIMS_header': {'mapping_info': [], 'metadata_schema': []}}},
+    {'OIMS': {'OIMS_header': {}}},
+    {'other': {}},
+    [1, 2],
+])
+def test_triage_gives_the_result_of_the_full_structure_check(tmp_path, document):
+    path = tmp_path / 'metadata.json'
+    path.write_text(json.dumps(document))
+    expected = validate_oims_structure(str(path), data=document) if isinstance(document, dict) else None
+    result = triage_oims_structure(str(path))['result']
+    assert validate_oims_structure(str(path), header_only=True) == result
+    if expected is not None:
+        assert result == expected
+
+
+def test_triage_reads_only_the_header(tmp_path, oims_document, attribute_records):
+    document = oims_document('dataset', attribute_records)
+    text = json.dumps(document)
+    path = tmp_path / 'metadata.json'
+    # the content is cut off: a full parse fails, the triage never reads it
+    path.write_text(text[:text.index('"OIMS_content"')] + '"OIMS_content": [{"OIMS_content_object": "dataset", "broken')
+    triage = triage_oims_structure(str(path))
+    assert triage['result'] == "OIMS file is valid."
+    assert triage['metadata_version'] == '1.0'
+    assert triage['schema_versions'] == {'dataset': [{
+        'schema_name': 'OIMS_base', 'schema_version': '2.3.1.0',
+        'schema_url': 'https://github.com/ForesightInitiative/OIMS/blob/main/BasicSchemas/OIMS_base.json'}]}
+    assert triage['content_objects'] is None
+
+
+def test_triage_files_and_routes(tmp_path, oims_document, attribute_records):
+    paths = []
+    for name, version in (('a', '2.3.1.0'), ('b', '2.3.1.0'), ('c', '2.2.0.0')):
+        paths.append(str(tmp_path / f'{name}.json'))
+        with open(paths[-1], 'w') as metadata_file:
+            json.dump(oims_document('dataset', attribute_records, schema_version=version), metadata_file)
+    (tmp_path / 'broken.json').write_text('{"OIMS": ')
+    triages = list(triage_files(paths + [str(tmp_path / 'broken.json')], scan_content=True))
+    assert all('header' not in triage for triage in triages)
+    assert [triage['content_objects'] for triage in triages] == [['dataset']] * 3 + [None]
+    assert route_by_schema_version(triages) == {
+        ('dataset', 'OIMS_base', '2.3.1.0'): paths[:2],
+        ('dataset', 'OIMS_base', '2.2.0.0'): paths[2:],
+    }
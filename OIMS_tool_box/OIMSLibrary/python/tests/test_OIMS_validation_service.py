@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+import OIMS_validation_service as service
+from OIMS_schema_cache import schema_cache
+
+
+@pytest.fixture
+def empty_schema_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(schema_cache, 'cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.setattr(schema_cache, 'offline', False)
+    return tmp_path / 'cache'
+
+
+def test_url_metadata_is_not_stored_in_the_schema_cache(document_server, empty_schema_cache):
+    document_server.documents['/metadata.json'] = b'{"OIMS": {}}'
+    assert service.load_metadata(document_server.url('/metadata.json')) == ({'OIMS': {}}, None)
+    assert not os.path.exists(empty_schema_cache)
+    _, err = service.load_metadata(document_server.url('/missing.json'))
+    assert 'Status code: 404' in err
+
+
+def test_url_schemas_are_fetched_once(document_server, empty_schema_cache):
+    document_server.documents['/schema.json'] = b'{"type": "object"}'
+    url = document_server.url('/schema.json')
+    for _ in range(3):
+        assert service.load_schema(url) == ({'type': 'object'}, None)
+    assert len(document_server.requests) == 1
+
+
+def test_handle_validate(tmp_path):
+    structure_path = tmp_path / 'structure.json'
+    structure_path.write_text(json.dumps({'type': 'object', 'required': ['OIMS']}))
+    schema_path = tmp_path / 'schema.json'
+    schema_path.write_text(json.dumps({'type': 'object'}))
+    request = {'metadata': {'OIMS': {}}, 'schema_path': str(schema_path),
+               'OIMS_structure_schema_path': str(structure_path)}
+    assert service.handle_validate(request) == {'valid': True, 'errors': []}
+    response = service.handle_validate(dict(request, metadata={}))
+    assert not response['valid']
+    assert "'OIMS' is a required property" in response['errors'][0]
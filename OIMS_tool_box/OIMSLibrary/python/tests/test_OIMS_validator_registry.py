@@ -0,0 +1,84 @@
+import gc
+import weakref
+
+import jsonschema
+import pytest
+
+import OIMS_validator_registry
+from OIMS_validator_registry import ValidatorRegistry, schema_content_hash
+
+
+def test_validate_raises_the_same_error_as_jsonschema():
+    schema = {'type': 'object', 'properties': {'a': {'type': 'integer'}}, 'required': ['a']}
+    registry = ValidatorRegistry()
+    registry.validate({'a': 1}, schema)
+    with pytest.raises(jsonschema.exceptions.ValidationError) as raised:
+        registry.validate({'a': 'x'}, schema)
+    with pytest.raises(jsonschema.exceptions.ValidationError) as expected:
+        jsonschema.validate({'a': 'x'}, schema)
+    assert raised.value.message == expected.value.message
+
+
+def test_a_schema_is_compiled_once_per_content():
+    registry = ValidatorRegistry()
+    first = registry.get_validator({'type': 'string'})
+    assert registry.get_validator({'type': 'string'}) is first
+    assert registry.stats()['misses'] == 1
+    assert registry.stats()['hits'] == 1
+    assert registry.schema_key({'type': 'string'}) == schema_content_hash({'type': 'string'})
+
+
+def test_invalid_schema_raises_schema_error():
+    with pytest.raises(jsonschema.exceptions.SchemaError):
+        ValidatorRegistry().get_validator({'type': 12})
+
+
+def test_compiled_validators_are_bounded(monkeypatch):
+    monkeypatch.setattr(OIMS_validator_registry, 'max_hashed_schemas', 3)
+    registry = ValidatorRegistry()
+    schemas = [{'type': 'string', 'title': str(number)} for number in range(10)]
+    for schema in schemas:
+        registry.validate('x', schema)
+    assert registry.stats()['cached_validators'] == 3
+    # the most recently used validators are kept
+    registry.validate('x', schemas[-1])
+    assert registry.stats()['misses'] == 10
+    registry.validate('x', schemas[0])
+    assert registry.stats()['misses'] == 11
+
+
+def test_checked_schemas_are_recorded(tmp_path):
+    ValidatorRegistry(checked_schema_dir=str(tmp_path)).get_validator({'type': 'string'})
+    registry = ValidatorRegistry(checked_schema_dir=str(tmp_path))
+    registry.get_validator({'type': 'string'})
+    assert registry.stats()['schema_checks'] == 0
+    assert registry.stats()['schema_checks_skipped'] == 1
+
+
+def vocabulary_schema(size):
+    return {'type': 'array', 'items': {'enum': [f'code{number}' for number in range(size)]}}
+
+
+def test_vocabulary_checks_match_jsonschema():
+    schema = vocabulary_schema(OIMS_validator_registry.min_vocabulary_set_size * 2)
+    registry = ValidatorRegistry()
+    registry.validate(['code0', 'code31'], schema)
+    for instance in (['code32'], [0], ['code1', None]):
+        with pytest.raises(jsonschema.exceptions.ValidationError) as raised:
+            registry.validate(instance, schema)
+        with pytest.raises(jsonschema.exceptions.ValidationError) as expected:
+            jsonschema.validate(instance, schema)
+        assert raised.value.message == expected.value.message
+
+
+def test_vocabulary_sets_are_dropped_with_their_validator(monkeypatch):
+    monkeypatch.setattr(OIMS_validator_registry, 'max_hashed_schemas', 2)
+    registry = ValidatorRegistry()
+    schema = vocabulary_schema(100)
+    registry.validate(['code5'], schema)
+    validator_reference = weakref.ref(registry.get_validator(schema))
+    for size in (101, 102):
+        registry.validate(['code5'], vocabulary_schema(size))
+    gc.collect()
+    assert validator_reference() is None
+    assert not hasattr(OIMS_validator_registry, '_vocabulary_sets')
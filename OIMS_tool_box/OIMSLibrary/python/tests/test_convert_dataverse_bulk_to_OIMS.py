@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+from conftest import basic_schema_path, repo_dir
+import convert_dataverse_bulk_to_OIMS as bulk
+from OIMS_schema_consistency_test import check_oims_consistency, triage_oims_structure, validate_oims_structure
+from OIMS_schema_resolver import collect_schema_urls
+
+
+def dataset(identifier='DVN/X1', version=2, title='Maize trials'):
+    fields = [
+        {'typeName': 'author', 'multiple': True, 'typeClass': 'compound', 'value': [
+            {'authorName': {'typeName': 'authorName', 'value': 'Doe, J.'},
+             'authorAffiliation': {'typeName': 'authorAffiliation', 'value': 'CIMMYT'}},
+            {'authorName': {'typeName': 'authorName', 'value': 'Roe, R.'}}]},
+        {'typeName': 'subject', 'multiple': True, 'typeClass': 'controlledVocabulary', 'value': ['Agricultural Sciences']},
+    ]
+    if title is not None:
+        fields.insert(0, {'typeName': 'title', 'multiple': False, 'typeClass': 'primitive', 'value': title})
+    return {'status': 'OK', 'data': {
+        'identifier': identifier, 'protocol': 'doi', 'authority': '10.7910',
+        'persistentUrl': f'https://doi.org/10.7910/{identifier}', 'publisher': 'CIMMYT Research Data',
+        'latestVersion': {'versionNumber': version, 'versionMinorNumber': 0, 'license': {'name': 'CC0 1.0'},
+                          'metadataBlocks': {'citation': {'fields': fields}}},
+    }}
+
+
+@pytest.fixture
+def mapping():
+    compiled, err = bulk.load_mapping(bulk.mapping_file_path('cimmyt2023'))
+    assert err is None
+    return compiled.mapping
+
+
+def convert(inputs, output_dir, mapping, workers=1):
+    return sorted(bulk.convert_dataverse_datasets([str(path) for path in inputs], str(output_dir), mapping, workers=workers),
+                  key=lambda result: result[0])
+
+
+def test_converted_dataset_passes_the_consistency_check(tmp_path, mapping):
+    source = tmp_path / 'dataset.json'
+    source.write_text(json.dumps(dataset()))
+    [(_, output_path, err)] = convert([source], tmp_path / 'out', mapping)
+    assert err is None
+    assert os.path.basename(output_path) == 'doi_10.7910_DVN_X1_v2.0.json'
+    with open(output_path, encoding='utf-8') as output_file:
+        document = json.load(output_file)
+
+    assert validate_oims_structure(output_path, data=document) == "OIMS file is valid."
+    triage = triage_oims_structure(output_path)
+    assert triage['result'] == "OIMS file is valid."
+    [schema_property] = triage['schema_versions']['Descriptive_Metadata_DataSet']
+    assert schema_property['schema_url'] == bulk.base_schema_url
+    # the declared schema is a file of this repository
+    problems = []
+    [url] = collect_schema_urls(document, problems)
+    assert problems == []
+    assert os.path.isfile(os.path.join(repo_dir, url.split('/main/', 1)[1]))
+
+    # the header checks pass; the records of the content object have no metametadata in the repository
+    issues, _ = check_oims_consistency(output_path, basic_schema_path, 'Descriptive_Metadata_DataSet', basic_schema_path)
+    codes = {issue['code'] for issue in issues.to_list()}
+    assert not codes & {'invalid_structure', 'content_object_not_in_header', 'missing_schema_version',
+                        'content_object_not_in_metametadata'}
+
+    properties = document['OIMS']['OIMS_content'][0]['OIMS_content_object_properties']
+    assert properties['Persistent_Entity_ID'][0]['persistent_Entity_ID_SchemeName'] == 'DOI'
+    assert properties['Metadata']['author_name'] == ['Doe, J.', 'Roe, R.']
+    assert properties['Metadata']['author_affiliation'] == ['CIMMYT', None]
+    assert document['OIMS']['OIMS_header']['file_descriptors']['metadata_name'] == 'metadata of dataset titled: Maize trials'
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_bulk_conversion_reports_failures_and_duplicates(tmp_path, mapping, workers):
+    dump = tmp_path / 'dump.jsonl'
+    lines = [dataset('DVN/A'), dataset('DVN/B'), dataset('DVN/A'), dataset('DVN/C', title=None), dataset('DVN/A', version=3)]
+    dump.write_text('\n'.join(json.dumps(line) for line in lines) + '\n{"broken": \n')
+    results = convert([dump], tmp_path / 'out', mapping, workers)
+    errors = {source.rsplit(':', 1)[1]: err for source, _, err in results if err}
+    assert set(errors) == {'3', '4', '6'}
+    assert 'already converted' in errors['3']
+    assert 'missing required field(s) citation.title' in errors['4']
+    assert 'is not valid JSON' in errors['6']
+    assert sorted(os.listdir(tmp_path / 'out')) == [
+        'doi_10.7910_DVN_A_v2.0.json', 'doi_10.7910_DVN_A_v3.0.json', 'doi_10.7910_DVN_B_v2.0.json']
+
+
+@pytest.mark.parametrize('rules, message', [
+    ([{'from': 'dataset.a', 'to': 'OIMS.x'}, {'from': 'dataset.b', 'to': 'OIMS.x.y'}], 'writes inside the value'),
+    ([{'from': 'dataset.a', 'to': 'OIMS.x.0'}, {'from': 'dataset.b', 'to': 'OIMS.x.y'}], 'both a key and a list index'),
+    ([{'from': 'dataset.a', 'to': 'OIMS.OIMS_header.mapping_info.name'}], 'does not fit the structure'),
+    ([{'from': 'dataset.a', 'to': '0.x'}], 'starts with a list index'),
+    ([{'from': 'title', 'to': 'OIMS.x'}], 'neither dataset.<key> nor'),
+    ([{'from': 'dataset.a', 'to': 'OIMS.x', 'value_map': ['a']}], 'value_map of rule 0 is not an object'),
+])
+def test_conflicting_mapping_rules_are_rejected(rules, message):
+    with pytest.raises(ValueError, match=message):
+        bulk.CompiledMapping({'mapping': rules})
+
+
+def test_bare_property_names_are_repaired(tmp_path, mapping):
+    source = tmp_path / 'harvard.json'
+    source.write_text(json.dumps(dataset()).replace('"status"', 'status'))
+    [(_, _, err)] = convert([source], tmp_path / 'out', mapping)
+    assert 'is not valid JSON' in err
+    results = list(bulk.convert_dataverse_datasets([str(source)], str(tmp_path / 'out'), mapping, do_clean='harvard_dataverse'))
+    assert results[0][2] is None
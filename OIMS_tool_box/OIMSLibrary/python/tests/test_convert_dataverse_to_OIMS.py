@@ -0,0 +1,43 @@
+import io
+import json
+
+import pytest
+
+from convert_dataverse_to_OIMS import RepairingReader, check_json_file, quote_properties, repair_json_file
+
+
+def test_bare_property_names_are_quoted_outside_strings():
+    text = '{status: "OK", data: {note: "a, b: c {x: 1}", list: [{id: 1}, {id: 2}], "kept": "d"}}'
+    repaired = quote_properties(text)
+    assert json.loads(repaired) == {'status': 'OK', 'data': {
+        'note': 'a, b: c {x: 1}', 'list': [{'id': 1}, {'id': 2}], 'kept': 'd'}}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 64, 1 << 20])
+def test_chunk_boundaries_do_not_change_the_result(chunk_size):
+    text = ('{' + ', '.join(f'name_{number}: "value, with: {number} \\" quote"' for number in range(50)) + '}').encode()
+    reader = RepairingReader(io.BytesIO(text), chunk_size)
+    repaired = b''.join(iter(reader.read, b''))
+    assert reader.quoted == 50
+    assert json.loads(repaired) == {f'name_{number}': f'value, with: {number} " quote' for number in range(50)}
+
+
+def test_repair_json_file_in_place(tmp_path):
+    path = tmp_path / 'dataset.json'
+    path.write_text('{a: 1, "b": {c: [true]}}')
+    assert repair_json_file(str(path), chunk_size=4) == (2, None)
+    assert json.loads(path.read_text()) == {'a': 1, 'b': {'c': [True]}}
+    # a valid file is left alone
+    assert repair_json_file(str(path)) == (0, None)
+    assert check_json_file(str(path)) is None
+
+
+def test_an_invalid_result_leaves_the_file_as_it_was(tmp_path):
+    path = tmp_path / 'dataset.json'
+    path.write_text('{a: 1, b: [}')
+    quoted, err = repair_json_file(str(path))
+    assert quoted is None and 'is not valid' in err
+    assert path.read_text() == '{a: 1, b: [}'
+    assert 'is not valid JSON' in check_json_file(str(path))
+    assert list(tmp_path.iterdir()) == [path]
+    assert repair_json_file(str(tmp_path / 'missing.json'))[1].endswith('not found.')
@@ -0,0 +1,66 @@
+import json
+import os
+
+import pytest
+
+import format_json
+from OIMS_format_manifest import FormatManifest
+
+
+document = ('{"\\\\": ["GTREE comment"], "zeta": {"b": 1.50, "a": "caf\\u00E9"}, "alpha": [1E5, "\u00e9", {}],'
+            ' "//": ["second comment"], "big": 123456789012345678901234567890}')
+
+
+def format_with_threshold(tmp_path, name, stream_threshold_mb, sort_keys=False):
+    path = tmp_path / name
+    path.write_text(document, encoding='utf-8')
+    status, _, sha256 = format_json.reformat_json_file(str(path), 2, stream_threshold_mb, sort_keys)
+    assert status == 'formatted'
+    return path.read_bytes(), sha256
+
+
+def test_streamed_and_parsed_files_are_formatted_the_same(codec, tmp_path):
+    streamed, streamed_hash = format_with_threshold(tmp_path, 'streamed.json', 0)
+    parsed, parsed_hash = format_with_threshold(tmp_path, 'parsed.json', 100)
+    assert streamed == parsed
+    assert streamed_hash == parsed_hash
+    assert streamed.isascii()
+
+
+def test_sort_keys_keeps_the_gtree_comments_first(codec, tmp_path):
+    # with sort_keys every file is parsed, whatever its size
+    formatted, _ = format_with_threshold(tmp_path, 'sorted.json', 0, sort_keys=True)
+    assert list(json.loads(formatted)) == ['\\', '//', 'alpha', 'big', 'zeta']
+    assert list(json.loads(formatted)['zeta']) == ['a', 'b']
+
+
+def test_invalid_files_are_left_as_they_were(tmp_path):
+    path = tmp_path / 'broken.json'
+    path.write_text('{"a": [1, 2}')
+    for stream_threshold_mb in (0, 100):
+        status, message, _ = format_json.reformat_json_file(str(path), stream_threshold_mb=stream_threshold_mb)
+        assert status == 'failed' and 'Error decoding JSON' in message
+    assert path.read_text() == '{"a": [1, 2}'
+
+
+@pytest.mark.parametrize('stream_threshold_mb', [0, 100])
+def test_the_manifest_skips_files_formatted_before(tmp_path, stream_threshold_mb):
+    paths = [tmp_path / f'{number}.json' for number in range(3)]
+    for path in paths:
+        path.write_text('{"a": [1, 2]}')
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    def run(**options):
+        results = format_json.format_json_files([str(path) for path in paths], stream_threshold_mb=stream_threshold_mb,
+                                                manifest=FormatManifest(manifest_path), **options)
+        return [status for _, status, _ in sorted(results)]
+
+    assert run() == ['formatted'] * 3
+    assert run() == ['skipped'] * 3
+    # touched but the same content: the hash is known, so the file is not parsed or written
+    os.utime(paths[0], ns=(0, 0))
+    paths[1].write_text('{"b": 1}')
+    assert run() == ['unchanged', 'formatted', 'skipped']
+    assert os.stat(paths[0]).st_mtime_ns == 0
+    # other options are a new canonical form
+    assert run(indent=2) == ['formatted'] * 3
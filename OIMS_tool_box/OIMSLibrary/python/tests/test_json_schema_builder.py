@@ -0,0 +1,123 @@
+import copy
+import json
+import os
+
+import pytest
+
+import json_schema_builder
+from OIMS_schema_build_cache import SchemaBuildCache
+
+
+def metametadata(attributes):
+    return {'OIMS': {
+        '\\': ['test metametadata'],
+        'OIMS_header': {'mapping_info': [], 'metadata_schema': [], 'file_descriptors': {}},
+        'OIMS_content': [{
+            'OIMS_content_object': 'dataset',
+            'OIMS_content_object_properties': [{'metadata': attributes}],
+        }],
+    }}
+
+
+attributes = [
+    {'attribute_name': 'title', 'attribute_description': 'title', 'data_type': 'string', 'requirement_level': 'optional'},
+    {'attribute_name': 'year', 'attribute_description': 'year', 'data_type': 'integer', 'requirement_level': 'optional'},
+    {'attribute_name': 'keywords', 'attribute_description': 'keywords', 'data_type': 'string', 'multiple': True,
+     'controlled_vocabulary': [{'vocabulary_element_name': 'maize'}, {'vocabulary_element_name': 'wheat'}]},
+]
+
+
+def build(json_data, output_path, cache):
+    content_item = json_schema_builder.index_content_objects(json_data)['dataset']
+    return json_schema_builder.build_schema_file(json_data, 'dataset', content_item, str(output_path), build_cache=cache)
+
+
+def test_attribute_schemas():
+    schema = json_schema_builder.build_content_object_schema(metametadata(attributes)['OIMS']['OIMS_content'][0])
+    metadata_items = (schema['properties']['OIMS']['properties']['OIMS_content']['items']['properties']
+                      ['OIMS_content_object_properties']['items']['properties']['metadata']['items'])
+    assert metadata_items['properties']['year'] == {'description': 'year', 'type': 'number'}
+    assert metadata_items['properties']['keywords'] == {
+        'description': 'keywords', 'type': 'array', 'items': {'type': 'string'}, 'enum': ['maize', 'wheat']}
+
+
+def test_compound_attribute_without_elements_is_an_error(tmp_path):
+    bad = [{'attribute_name': 'x', 'data_type': 'compound_object', 'data_type_class': 'compound'}]
+    valid, messages = build(metametadata(bad), tmp_path / 'x.schema.json', None)
+    assert not valid
+    assert "expecting values for 'attribute_value_elements'" in messages[0]
+
+
+def test_an_unchanged_build_is_not_written_again(tmp_path):
+    cache = SchemaBuildCache(str(tmp_path / 'cache'))
+    output_path = tmp_path / 'x.schema.json'
+    assert build(metametadata(attributes), output_path, cache) == (True, [
+        f"JSON schema has been written to '{output_path}'",
+        "JSON data is valid against the generated schema for dataset."])
+    signature = os.stat(output_path).st_mtime_ns
+    valid, messages = build(metametadata(attributes), output_path, cache)
+    assert valid
+    assert messages[0] == f"JSON schema '{output_path}' is up to date"
+    assert os.stat(output_path).st_mtime_ns == signature
+
+
+def test_an_up_to_date_build_still_checks_the_json_file(tmp_path):
+    cache = SchemaBuildCache(str(tmp_path / 'cache'))
+    output_path = tmp_path / 'x.schema.json'
+    json_data = metametadata(attributes)
+    assert build(json_data, output_path, cache)[0]
+    # a change outside the content item does not change the build key, but breaks the check
+    changed = copy.deepcopy(json_data)
+    del changed['OIMS']['OIMS_header']['mapping_info']
+    valid, messages = build(changed, output_path, cache)
+    assert not valid
+    assert messages[0] == f"JSON schema '{output_path}' is up to date"
+    assert "'mapping_info' is a required property" in messages[1]
+
+
+def test_a_changed_attribute_rebuilds(tmp_path):
+    cache = SchemaBuildCache(str(tmp_path / 'cache'))
+    output_path = tmp_path / 'x.schema.json'
+    assert build(metametadata(attributes), output_path, cache)[0]
+    changed = copy.deepcopy(attributes)
+    changed[1]['attribute_description'] = 'year of publication'
+    valid, messages = build(metametadata(changed), output_path, cache)
+    assert valid
+    assert messages[0] == f"JSON schema has been written to '{output_path}'"
+
+
+def run_main(monkeypatch, capsys, *arguments):
+    monkeypatch.setattr('sys.argv', ['json_schema_builder.py', *arguments])
+    json_schema_builder.main()
+    return capsys.readouterr().out
+
+
+def test_metametadata_argument_is_optional_and_deprecated(tmp_path, monkeypatch, capsys):
+    json_file = tmp_path / 'x.json'
+    json_file.write_text(json.dumps(metametadata(attributes)))
+    common = ['--json_file_path', str(json_file), '--OIMS_content_object', 'dataset', '--no_build_cache']
+    assert 'deprecated' not in run_main(monkeypatch, capsys, *common)
+    assert os.path.isfile(tmp_path / 'x.schema.json')
+    output = run_main(monkeypatch, capsys, *common, '--OIMS_metametadata_file_path', str(tmp_path / 'missing.json'))
+    assert '--OIMS_metametadata_file_path is deprecated and ignored' in output
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_several_content_objects_are_built_in_one_run(tmp_path, monkeypatch, capsys, workers):
+    json_data = metametadata(attributes)
+    second = copy.deepcopy(json_data['OIMS']['OIMS_content'][0])
+    second['OIMS_content_object'] = 'variables'
+    second['OIMS_content_object_properties'][0]['metadata'] = attributes[:1]
+    json_data['OIMS']['OIMS_content'].append(second)
+    json_file = tmp_path / 'x.json'
+    json_file.write_text(json.dumps(json_data))
+    run_main(monkeypatch, capsys, '--json_file_path', str(json_file), '--OIMS_content_object', 'all',
+             '--workers', workers, '--build_cache_dir', str(tmp_path / 'cache'))
+    schemas = {name: json.loads((tmp_path / f'x_{name}.schema.json').read_text()) for name in ('dataset', 'variables')}
+    assert schemas['dataset'] != schemas['variables']
+    assert not (tmp_path / 'x.schema.json').exists()
+
+    output = run_main(monkeypatch, capsys, '--json_file_path', str(json_file), '--OIMS_content_object', 'variables',
+                      'missing', '--no_build_cache')
+    assert "OIMS_content_object 'missing' not found" in output
+    assert (tmp_path / 'x_missing.schema.json').exists()
@@ -0,0 +1,93 @@
+import random
+
+import jsonschema
+import pytest
+
+from json_schema_builder_base import generate_json_schema, infer_schema, merge_schemas, reservoir_sample, sample_elements
+
+
+def test_the_items_schema_merges_all_elements():
+    assert infer_schema([1, 2.5, True, None, 'x']) == {
+        'type': 'array', 'items': {'type': ['null', 'boolean', 'number', 'string']}}
+    assert infer_schema([{'a': 1, 'b': 'x'}, {'a': 2.0}]) == {'type': 'array', 'items': {
+        'type': 'object', 'properties': {'a': {'type': 'number'}, 'b': {'type': 'string'}}, 'required': ['a']}}
+    assert infer_schema([[1], ['x']]) == {'type': 'array', 'items': {'type': 'array', 'items': {'type': ['integer', 'string']}}}
+    assert infer_schema(True) == {'type': 'boolean'}
+
+
+def test_merge_schemas_does_not_modify_its_inputs():
+    first = {'type': 'object', 'properties': {'a': {'type': 'integer'}}, 'required': ['a']}
+    second = {'type': 'object', 'properties': {'a': {'type': 'string'}}, 'required': []}
+    assert merge_schemas(first, second) == {'type': 'object', 'properties': {'a': {'type': ['integer', 'string']}}, 'required': []}
+    assert first['properties']['a'] == {'type': 'integer'}
+    assert merge_schemas(first, {}) == {}
+
+
+@pytest.mark.parametrize('sampling', ['all', 'first_n', 'reservoir'])
+def test_sampling_strategies(sampling):
+    data = list(range(100))
+    sample = sample_elements(data, sampling, 10, random.Random(1))
+    assert len(sample) == (100 if sampling == 'all' else 10)
+    assert sample == sorted(sample)
+    assert sample_elements(data[:5], sampling, 10) == data[:5]
+    with pytest.raises(ValueError, match='Unknown sampling strategy'):
+        sample_elements(data, 'some', 10)
+
+
+def test_reservoir_sample_of_an_iterable_keeps_the_order():
+    sample = reservoir_sample(iter(range(1000)), 20, random.Random(3))
+    assert len(sample) == 20 and sample == sorted(sample) and len(set(sample)) == 20
+
+
+def test_sampled_inference_reads_only_the_sample():
+    data = [{'a': 1}] * 50 + [{'a': 'x'}]
+    assert infer_schema(data, 'first_n', 50)['items']['properties']['a'] == {'type': 'integer'}
+    assert infer_schema(data)['items']['properties']['a'] == {'type': ['integer', 'string']}
+
+
+def test_generated_schema_accepts_its_data():
+    data = {'records': [{'id': number, 'tags': ['x'] * (number % 3), 'score': number / 2} for number in range(20)],
+            'title': 'x', 'flag': False}
+    schema = generate_json_schema(data)
+    assert schema['required'] == ['records', 'title', 'flag']
+    jsonschema.validate(data, schema)
+
+
+def reference_schema(data):
+    """The schema of data by plain recursion over every element, as inferred before shapes were interned."""
+    if isinstance(data, dict):
+        return {'type': 'object', 'properties': {key: reference_schema(value) for key, value in data.items()},
+                'required': list(data)}
+    if isinstance(data, list):
+        schema = {'type': 'array'}
+        for element in data:
+            element_schema = reference_schema(element)
+            schema['items'] = merge_schemas(schema['items'], element_schema) if 'items' in schema else element_schema
+        return schema
+    return infer_schema(data)
+
+
+def random_document(rng, depth=0):
+    kind = rng.randrange(7 if depth < 4 else 5)
+    if kind == 5:
+        return [random_document(rng, depth + 1) for _ in range(rng.randrange(4))]
+    if kind == 6:
+        return {rng.choice('abc'): random_document(rng, depth + 1) for _ in range(rng.randrange(3))}
+    return [None, True, 3, 2.5, 'x'][kind]
+
+
+def test_interned_shapes_give_the_schema_of_plain_recursion():
+    rng = random.Random(7)
+    for _ in range(300):
+        document = random_document(rng)
+        assert infer_schema(document) == reference_schema(document)
+
+
+def test_deeply_nested_documents_are_inferred():
+    document = 'leaf'
+    for depth in range(5000):
+        document = [document] if depth % 2 else {'child': document}
+    schema = infer_schema(document)
+    for _ in range(2500):
+        schema = schema['items']['properties']['child']
+    assert schema == {'type': 'string'}